@@ -0,0 +1,456 @@
+"""
+IRIS inference service (HTTP).
+
+Memuat bundle `2tomato_decision_multilabel_model.joblib` dan
+`2tomato_forecast_model.joblib` SEKALI (versi `.compiled.joblib` dipakai jika
+ada, di-mmap), lalu melayani:
+
+  GET  /healthz
+  GET  /v1/stats
+  POST /v1/labels           {"row": {...}} | {"rows": [...]}          -> label threshold
+  POST /v1/decision         {"row": {...}} | {"rows": [...]}          -> label model + keputusan
+  POST /v1/forecast         {"history": [...]} | {"histories": [...]} -> soil_future + timeline
+  POST /v1/next-irrigation  {"history": [...]} | {"histories": [...]} -> jam ke threshold
+
+`row` = dict berisi kolom sensor training (meta "sensor_cols").
+`history` = W baris terakhir (W = meta "window"), tiap baris dict sensor atau
+list angka dengan urutan sensor_cols.
+
+Prediksi dijalankan di pool worker per model dengan micro-batching: request
+masuk antrian terbatas (QUEUE_SIZE); worker mengambil sampai BATCH_MAX baris
+atau menunggu BATCH_WAIT_MS sejak baris pertama, lalu memanggil predict()
+sekali untuk seluruh batch. Antrian penuh -> 503, timeout -> 504 (request
+yang timeout dibatalkan dan dilewati worker). Jika predict() batch gagal,
+tiap request di batch itu diprediksi ulang sendiri-sendiri sehingga hanya
+request yang buruk yang menerima error. Input tidak valid -> 400, error
+model -> 500.
+
+Konfigurasi (env): MODEL_DIR, PORT, BATCH_MAX, BATCH_WAIT_MS, QUEUE_SIZE,
+WORKERS, REQUEST_TIMEOUT_SEC.
+
+Benchmark: jalankan service, lalu dari mesin yang sama
+    python backend/bench.py --endpoint decision --concurrency 32 --duration 20
+    python backend/bench.py --endpoint forecast --concurrency 32 --duration 20
+bench.py mencetak throughput (req/s, baris/s), p50/p95/p99 latency dan
+jumlah 503/504. Naikkan BATCH_WAIT_MS untuk throughput lebih tinggi dengan
+latency lebih besar; turunkan untuk kebalikannya.
+"""
+import json
+import math
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+import joblib
+
+BACKEND_DIR = Path(__file__).resolve().parent
+# saat dijalankan dari repo (bukan image Docker), modul iris_* ada di root repo
+if not (BACKEND_DIR / "iris_labels.py").exists():
+    sys.path.insert(0, str(BACKEND_DIR.parent))
+
+from iris_forest import CompiledForest
+from iris_labels import (
+    decide_action_from_labels,
+    estimate_next_irrigation_hours,
+    future_decision_timeline,
+    rule_labels,
+)
+
+MODEL_DIR = Path(os.environ.get("MODEL_DIR", str(BACKEND_DIR)))
+PORT = int(os.environ.get("PORT", "8080"))
+BATCH_MAX = int(os.environ.get("BATCH_MAX", "64"))
+BATCH_WAIT_MS = float(os.environ.get("BATCH_WAIT_MS", "5"))
+QUEUE_SIZE = int(os.environ.get("QUEUE_SIZE", "1024"))
+WORKERS = int(os.environ.get("WORKERS", str(os.cpu_count() or 1)))
+REQUEST_TIMEOUT_SEC = float(os.environ.get("REQUEST_TIMEOUT_SEC", "5"))
+
+DECISION_NAME = "2tomato_decision_multilabel_model"
+FORECAST_NAME = "2tomato_forecast_model"
+IRRIGATION_THRESHOLD = 30.0
+
+
+# =========================
+# LOAD MODELS
+# =========================
+def load_bundle(name: str) -> tuple:
+    """Return (model, meta). Utamakan bundle terkompilasi (mmap)."""
+    compiled = MODEL_DIR / f"{name}.compiled.joblib"
+    if compiled.exists():
+        bundle = joblib.load(str(compiled), mmap_mode="r")
+        return CompiledForest(bundle["compiled"]), bundle
+
+    path = MODEL_DIR / f"{name}.joblib"
+    if not path.exists():
+        raise FileNotFoundError(f"Model tidak ditemukan: {compiled} / {path}")
+    bundle = joblib.load(str(path))
+    if isinstance(bundle, dict):
+        return bundle["model"], bundle
+    return bundle, {}
+
+
+# =========================
+# MICRO-BATCHING
+# =========================
+class Overloaded(Exception):
+    pass
+
+
+class LatencyStats:
+    def __init__(self, maxlen: int = 10000):
+        self._lock = threading.Lock()
+        self.latency_ms = deque(maxlen=maxlen)
+        self.batch_sizes = deque(maxlen=maxlen)
+        self.batches = 0
+        self.rows = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.fallbacks = 0
+
+    def record_batch(self, rows: int, latencies_ms: list):
+        with self._lock:
+            self.batches += 1
+            self.rows += rows
+            self.batch_sizes.append(rows)
+            self.latency_ms.extend(latencies_ms)
+
+    def record_rejected(self):
+        with self._lock:
+            self.rejected += 1
+
+    def record_cancelled(self):
+        with self._lock:
+            self.cancelled += 1
+
+    def record_fallback(self):
+        with self._lock:
+            self.fallbacks += 1
+
+    def summary(self) -> dict:
+        with self._lock:
+            lat = np.asarray(self.latency_ms, dtype=float)
+            sizes = np.asarray(self.batch_sizes, dtype=float)
+            out = {"batches": self.batches, "rows": self.rows, "rejected": self.rejected,
+                   "cancelled": self.cancelled, "fallbacks": self.fallbacks}
+        if len(lat):
+            out.update({
+                "p50_ms": float(np.percentile(lat, 50)),
+                "p95_ms": float(np.percentile(lat, 95)),
+                "p99_ms": float(np.percentile(lat, 99)),
+                "avg_batch": float(sizes.mean()),
+            })
+        return out
+
+
+class MicroBatcher:
+    """Antrian terbatas + worker thread yang menumpuk request jadi satu predict()."""
+
+    def __init__(self, name: str, predict_fn, max_batch: int, max_wait_ms: float, queue_size: int, workers: int):
+        self.name = name
+        self.predict_fn = predict_fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.q = queue.Queue(maxsize=queue_size)
+        self.stats = LatencyStats()
+        self.threads = [
+            threading.Thread(target=self._loop, name=f"{name}-worker-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for t in self.threads:
+            t.start()
+
+    def submit(self, X: np.ndarray) -> Future:
+        fut = Future()
+        try:
+            self.q.put_nowait((X, fut, time.perf_counter()))
+        except queue.Full:
+            self.stats.record_rejected()
+            raise Overloaded(f"antrian {self.name} penuh")
+        return fut
+
+    def predict(self, X: np.ndarray, timeout: float = REQUEST_TIMEOUT_SEC):
+        fut = self.submit(X)
+        try:
+            return fut.result(timeout=timeout)
+        except TimeoutError:
+            # masih di antrian -> worker akan melewatinya; sudah berjalan -> hasilnya dibuang
+            fut.cancel()
+            raise
+
+    def _next_batch(self) -> list:
+        """Blok sampai ada request hidup, lalu tumpuk sampai max_batch baris atau max_wait."""
+        items, rows, deadline = [], 0, None
+        while rows < self.max_batch:
+            if deadline is None:
+                item = self.q.get()
+            else:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.q.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            # request yang sudah timeout di predict() (future dibatalkan) tidak diprediksi
+            if not item[1].set_running_or_notify_cancel():
+                self.stats.record_cancelled()
+                continue
+            if deadline is None:
+                deadline = time.perf_counter() + self.max_wait
+            items.append(item)
+            rows += len(item[0])
+        return items
+
+    def _predict_items(self, items: list) -> list:
+        """Hasil predict per item (array atau Exception)."""
+        try:
+            pred = self.predict_fn(np.vstack([X for X, _, _ in items]))
+        except Exception as e:
+            if len(items) == 1:
+                return [e]
+            # satu request buruk tidak boleh menggagalkan request lain di batch yang sama
+            self.stats.record_fallback()
+            out = []
+            for X, _, _ in items:
+                try:
+                    out.append(self.predict_fn(X))
+                except Exception as e:
+                    out.append(e)
+            return out
+
+        out, off = [], 0
+        for X, _, _ in items:
+            out.append(pred[off:off + len(X)])
+            off += len(X)
+        return out
+
+    def _loop(self):
+        while True:
+            items = self._next_batch()
+            results = self._predict_items(items)
+            done = time.perf_counter()
+            for (_, fut, _), res in zip(items, results):
+                if isinstance(res, Exception):
+                    fut.set_exception(res)
+                else:
+                    fut.set_result(res)
+            self.stats.record_batch(sum(len(X) for X, _, _ in items), [1000.0 * (done - t) for _, _, t in items])
+
+
+# =========================
+# SERVICE
+# =========================
+class BadRequest(Exception):
+    pass
+
+
+def _float(value, what: str) -> float:
+    """Angka berhingga. NaN / inf ("nan", NaN JSON, 1e400) dan bool ditolak: model tidak menolaknya sendiri."""
+    if isinstance(value, bool):
+        raise BadRequest(f"{what} harus angka, bukan {value!r}.")
+    try:
+        v = float(value)
+    except (TypeError, ValueError):
+        raise BadRequest(f"{what} harus angka, bukan {value!r}.") from None
+    if not math.isfinite(v):
+        raise BadRequest(f"{what} harus angka berhingga, bukan {value!r}.")
+    return v
+
+
+class InferenceService:
+    def __init__(self):
+        self.decision_model, self.dec_meta = load_bundle(DECISION_NAME)
+        self.forecast_model, self.for_meta = load_bundle(FORECAST_NAME)
+
+        self.sensor_cols = list(self.dec_meta.get("sensor_cols") or self.for_meta.get("sensor_cols") or [])
+        if not self.sensor_cols:
+            raise ValueError("Meta model tidak punya 'sensor_cols'.")
+        self.label_cols = list(self.dec_meta.get("target_label_cols") or [])
+        self.window = int(self.for_meta.get("window", 36))
+        self.freq_minutes = int(self.for_meta.get("freq_minutes", 10))
+
+        args = dict(max_batch=BATCH_MAX, max_wait_ms=BATCH_WAIT_MS, queue_size=QUEUE_SIZE, workers=WORKERS)
+        self.decision_batcher = MicroBatcher("decision", self.decision_model.predict, **args)
+        self.forecast_batcher = MicroBatcher("forecast", self.forecast_model.predict, **args)
+
+    # ---------- parsing ----------
+    def _row_vector(self, row) -> list:
+        if isinstance(row, dict):
+            missing = [c for c in self.sensor_cols if c not in row]
+            if missing:
+                raise BadRequest(f"Fitur kurang: {missing}")
+            return [_float(row[c], c) for c in self.sensor_cols]
+        if isinstance(row, (list, tuple)) and len(row) == len(self.sensor_cols):
+            return [_float(v, c) for c, v in zip(self.sensor_cols, row)]
+        raise BadRequest(f"Baris harus dict {self.sensor_cols} atau list {len(self.sensor_cols)} angka.")
+
+    @staticmethod
+    def _many(body: dict, one: str, many: str) -> tuple:
+        if many in body:
+            items = body[many]
+            if not isinstance(items, list) or not items:
+                raise BadRequest(f"'{many}' harus list tidak kosong.")
+            return items, True
+        if one in body:
+            return [body[one]], False
+        raise BadRequest(f"Body butuh '{one}' atau '{many}'.")
+
+    def _rows_matrix(self, rows: list) -> np.ndarray:
+        return np.asarray([self._row_vector(r) for r in rows], dtype=np.float64)
+
+    def _history_matrix(self, histories: list) -> np.ndarray:
+        out = []
+        for h in histories:
+            if not isinstance(h, list) or len(h) != self.window:
+                raise BadRequest(f"history harus berisi tepat {self.window} baris.")
+            out.append(np.asarray([self._row_vector(r) for r in h], dtype=np.float64).reshape(-1))
+        return np.vstack(out)
+
+    def _labels_dict(self, pred_row) -> dict:
+        cols = self.label_cols or [f"label_{i}" for i in range(len(pred_row))]
+        return {str(c): str(v) for c, v in zip(cols, pred_row)}
+
+    # ---------- endpoints ----------
+    def labels(self, body: dict):
+        rows, batch = self._many(body, "row", "rows")
+        X = self._rows_matrix(rows)
+        out = [rule_labels(dict(zip(self.sensor_cols, x))) for x in X.tolist()]
+        return {"results": out} if batch else out[0]
+
+    def decision(self, body: dict):
+        rows, batch = self._many(body, "row", "rows")
+        X = self._rows_matrix(rows)
+        pred = self.decision_batcher.predict(X)
+        out = []
+        for x, pred_row in zip(X.tolist(), pred):
+            labels = self._labels_dict(np.atleast_1d(pred_row))
+            out.append({
+                "labels": labels,
+                "rule_labels": rule_labels(dict(zip(self.sensor_cols, x))),
+                "decision": decide_action_from_labels(labels),
+            })
+        return {"results": out} if batch else out[0]
+
+    def _forecast_rows(self, body: dict) -> tuple:
+        histories, batch = self._many(body, "history", "histories")
+        pred = self.forecast_batcher.predict(self._history_matrix(histories))
+        return np.atleast_2d(pred), batch
+
+    def forecast(self, body: dict):
+        threshold = _float(body.get("threshold", IRRIGATION_THRESHOLD), "threshold")
+        pred, batch = self._forecast_rows(body)
+        out = []
+        for y in pred:
+            soil_future = np.ravel(y).tolist()
+            out.append({
+                "soil_future": soil_future,
+                "timeline": future_decision_timeline(soil_future),
+                "next_irrig_hours": estimate_next_irrigation_hours(soil_future, threshold, self.freq_minutes),
+                "step_minutes": self.freq_minutes,
+            })
+        return {"results": out} if batch else out[0]
+
+    def next_irrigation(self, body: dict):
+        threshold = _float(body.get("threshold", IRRIGATION_THRESHOLD), "threshold")
+        pred, batch = self._forecast_rows(body)
+        out = [
+            {"next_irrig_hours": estimate_next_irrigation_hours(np.ravel(y), threshold, self.freq_minutes),
+             "threshold": threshold}
+            for y in pred
+        ]
+        return {"results": out} if batch else out[0]
+
+    def stats(self) -> dict:
+        return {"decision": self.decision_batcher.stats.summary(), "forecast": self.forecast_batcher.stats.summary()}
+
+
+def make_handler(service: InferenceService):
+    routes = {
+        "/v1/labels": service.labels,
+        "/v1/decision": service.decision,
+        "/v1/forecast": service.forecast,
+        "/v1/next-irrigation": service.next_irrigation,
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, code: int, payload):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _body(self) -> dict:
+            try:
+                n = int(self.headers.get("Content-Length", "0"))
+                body = json.loads(self.rfile.read(n) or b"{}")
+            except ValueError as e:
+                raise BadRequest(f"Body bukan JSON valid: {e}") from None
+            if not isinstance(body, dict):
+                raise BadRequest("Body harus JSON object.")
+            return body
+
+        def do_GET(self):
+            if self.path == "/healthz":
+                self._send(200, {"ok": True})
+            elif self.path == "/v1/stats":
+                self._send(200, service.stats())
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            fn = routes.get(self.path)
+            if fn is None:
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                self._send(200, fn(self._body()))
+            except BadRequest as e:
+                self._send(400, {"error": str(e)})
+            except Overloaded as e:
+                self._send(503, {"error": str(e)})
+            except TimeoutError:
+                self._send(504, {"error": "timeout"})
+            except Exception as e:
+                self._send(500, {"error": repr(e)})
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return Handler
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # backlog default (5) membuat koneksi baru saat burst kena SYN retry ~1 detik
+    request_queue_size = 1024
+
+
+def main():
+    t0 = time.perf_counter()
+    service = InferenceService()
+    print(f"Models loaded in {1000.0 * (time.perf_counter() - t0):.0f}ms from {MODEL_DIR}")
+    print(f"decision={type(service.decision_model).__name__} forecast={type(service.forecast_model).__name__}")
+    print(f"batch_max={BATCH_MAX} batch_wait_ms={BATCH_WAIT_MS} queue={QUEUE_SIZE} workers={WORKERS}")
+
+    server = Server(("0.0.0.0", PORT), make_handler(service))
+    print(f"Listening on :{PORT}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark throughput/latency backend/app.py dari client lokal.
+
+    python backend/bench.py --endpoint decision --concurrency 32 --duration 20
+    python backend/bench.py --endpoint forecast --batch 8
+
+Kolom sensor dan window diambil dari meta model di MODEL_DIR (sama dengan
+service); nilai sensor diacak dalam rentang wajar.
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import numpy as np
+import joblib
+
+BACKEND_DIR = Path(__file__).resolve().parent
+MODEL_DIR = Path(os.environ.get("MODEL_DIR", str(BACKEND_DIR)))
+
+# rentang acak per kolom sensor (kolom lain: 0..100)
+RANGES = {
+    "air_temperature_c": (10, 38),
+    "air_humidity_pct": (30, 95),
+    "soil_moisture_pct": (20, 90),
+    "light_intensity_lux": (0, 1200),
+    "uv_index": (0, 11),
+}
+
+
+def load_meta() -> tuple:
+    """(sensor_cols, window) dari bundle forecast/decision di MODEL_DIR."""
+    for name in ("2tomato_forecast_model", "2tomato_decision_multilabel_model"):
+        for suffix in (".compiled.joblib", ".joblib"):
+            path = MODEL_DIR / f"{name}{suffix}"
+            if path.exists():
+                bundle = joblib.load(str(path), mmap_mode="r")
+                if isinstance(bundle, dict) and bundle.get("sensor_cols"):
+                    return list(bundle["sensor_cols"]), int(bundle.get("window", 36))
+    raise FileNotFoundError(f"Meta model tidak ditemukan di {MODEL_DIR}")
+
+
+def random_row(cols: list) -> dict:
+    return {c: round(random.uniform(*RANGES.get(c, (0, 100))), 2) for c in cols}
+
+
+def make_body(endpoint: str, cols: list, window: int, batch: int) -> bytes:
+    if endpoint in ("labels", "decision"):
+        rows = [random_row(cols) for _ in range(batch)]
+        body = {"rows": rows} if batch > 1 else {"row": rows[0]}
+    else:
+        hists = [[random_row(cols) for _ in range(window)] for _ in range(batch)]
+        body = {"histories": hists} if batch > 1 else {"history": hists[0]}
+    return json.dumps(body).encode("utf-8")
+
+
+def worker(url: str, bodies: list, stop_at: float, out: dict, lock: threading.Lock):
+    lat, codes = [], {}
+    i = 0
+    while time.perf_counter() < stop_at:
+        req = urllib.request.Request(url, data=bodies[i % len(bodies)], headers={"Content-Type": "application/json"})
+        i += 1
+        t0 = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=30) as resp:
+                resp.read()
+                code = resp.status
+        except urllib.error.HTTPError as e:
+            code = e.code
+        except OSError:
+            code = -1
+        lat.append(1000.0 * (time.perf_counter() - t0))
+        codes[code] = codes.get(code, 0) + 1
+    with lock:
+        out["lat"].extend(lat)
+        for k, v in codes.items():
+            out["codes"][k] = out["codes"].get(k, 0) + v
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default="http://127.0.0.1:8080")
+    ap.add_argument("--endpoint", default="decision", choices=["labels", "decision", "forecast", "next-irrigation"])
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--duration", type=float, default=10.0)
+    ap.add_argument("--batch", type=int, default=1, help="baris per request")
+    args = ap.parse_args()
+
+    cols, window = load_meta()
+    bodies = [make_body(args.endpoint, cols, window, args.batch) for _ in range(32)]
+    url = f"{args.url.rstrip('/')}/v1/{args.endpoint}"
+
+    out = {"lat": [], "codes": {}}
+    lock = threading.Lock()
+    t0 = time.perf_counter()
+    stop_at = t0 + args.duration
+    threads = [
+        threading.Thread(target=worker, args=(url, bodies, stop_at, out, lock))
+        for _ in range(max(1, args.concurrency))
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    lat = np.asarray(out["lat"], dtype=float)
+    ok = out["codes"].get(200, 0)
+    print(f"endpoint={args.endpoint} concurrency={args.concurrency} batch={args.batch} duration={elapsed:.1f}s")
+    print(f"requests={len(lat)} ok={ok} 503={out['codes'].get(503, 0)} 504={out['codes'].get(504, 0)} other={len(lat) - ok - out['codes'].get(503, 0) - out['codes'].get(504, 0)}")
+    print(f"throughput={ok / elapsed:.1f} req/s ({ok * args.batch / elapsed:.1f} rows/s)")
+    if len(lat):
+        p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+        print(f"latency p50={p50:.1f}ms p95={p95:.1f}ms p99={p99:.1f}ms max={lat.max():.1f}ms")
+
+    try:
+        with urllib.request.urlopen(f"{args.url.rstrip('/')}/v1/stats", timeout=5) as resp:
+            print("server:", resp.read().decode("utf-8"))
+    except OSError:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+Backfill skor untuk telemetry historis: label, keputusan, forecast soil,
+timeline dan next_irrig_hours untuk SEMUA baris time-series sekaligus
+(hasil sama dengan SmartFarmingPredictor.predict_once baris per baris).
+
+- window forecast dibentuk sebagai view strided (tanpa copy) di atas array
+  sensor; tiap batch cukup satu copy kontigu lalu satu predict()
+- decide_action / future_decision_timeline / estimate_next_irrigation_hours
+  dijalankan sebagai operasi array (iris_labels *_array)
+- output ditulis bertahap per batch ke Parquet (butuh pyarrow), jadi memori
+  dibatasi `batch_rows`, bukan panjang data
+
+    python iris_backfill.py --input telemetry.csv --out scores.parquet \\
+        --model-dir export_models [--registry export_models/registry] [--labels rules]
+
+Baris ke-t memakai window baris t-W+1..t (reading terbaru ikut, seperti
+add_reading lalu predict_once). Baris dengan history < W mendapat forecast
+null. `--group-col` (mis. device_id) memisahkan window per device.
+"""
+import argparse
+import os
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import as_strided
+
+from iris_data import compact_frame
+from iris_forest import CompiledForest
+from iris_labels import (
+    TARGET_LABEL_COLS,
+    decide_action_array,
+    future_decision_array,
+    label_arrays,
+    next_irrigation_hours_array,
+)
+
+DECISION_NAME = "2tomato_decision_multilabel_model"
+FORECAST_NAME = "2tomato_forecast_model"
+IRRIGATION_THRESHOLD = 30.0
+BATCH_ROWS = 20_000
+
+
+def load_bundle(model_dir, name: str) -> tuple:
+    """(model, meta); bundle terkompilasi (mmap) diutamakan."""
+    model_dir = Path(model_dir)
+    compiled = model_dir / f"{name}.compiled.joblib"
+    if compiled.exists():
+        bundle = joblib.load(str(compiled), mmap_mode="r")
+        return CompiledForest(bundle["compiled"]), bundle
+    path = model_dir / f"{name}.joblib"
+    if not path.exists():
+        raise FileNotFoundError(f"Model tidak ditemukan: {compiled} / {path}")
+    bundle = joblib.load(str(path))
+    if isinstance(bundle, dict):
+        return bundle["model"], bundle
+    return bundle, {}
+
+
+def window_view(values: np.ndarray, window: int) -> np.ndarray:
+    """View read-only (n-window+1, window*n_feat): baris j = values[j:j+window] diratakan."""
+    n = len(values) - window + 1
+    if n <= 0:
+        return np.empty((0, window * values.shape[1]), dtype=values.dtype)
+    return as_strided(values, shape=(n, window * values.shape[1]),
+                      strides=(values.strides[0], values.strides[1]), writeable=False)
+
+
+class BackfillScorer:
+    def __init__(self, decision_model, dec_meta: dict, forecast_model, for_meta: dict,
+                 labels: str = "model", threshold: float = IRRIGATION_THRESHOLD, batch_rows: int = BATCH_ROWS):
+        if labels not in ("model", "rules"):
+            raise ValueError(f"labels tidak dikenal: {labels!r} (pakai 'model' atau 'rules')")
+        self.decision_model = decision_model
+        self.forecast_model = forecast_model
+        self.sensor_cols = list(dec_meta.get("sensor_cols") or for_meta.get("sensor_cols"))
+        self.label_cols = list(dec_meta.get("target_label_cols") or TARGET_LABEL_COLS)
+        self.window = int(for_meta["window"])
+        self.horizon = self._forecast_horizon(for_meta)
+        self.freq_minutes = int(for_meta.get("freq_minutes", 10))
+        self.labels = labels
+        self.threshold = float(threshold)
+        self.batch_rows = max(1, int(batch_rows))
+        self.rows = 0
+        self.batches = 0
+
+    @classmethod
+    def from_dir(cls, model_dir, **kwargs) -> "BackfillScorer":
+        decision, dec_meta = load_bundle(model_dir, DECISION_NAME)
+        forecast, for_meta = load_bundle(model_dir, FORECAST_NAME)
+        return cls(decision, dec_meta, forecast, for_meta, **kwargs)
+
+    def _forecast_horizon(self, for_meta: dict) -> int:
+        """H dari meta forecaster, atau dari shape output satu predict() (bundle lama tanpa "horizon")."""
+        h = for_meta.get("horizon")
+        if h is None:
+            try:
+                y = self.forecast_model.predict(np.zeros((1, self.window * len(self.sensor_cols))))
+                h = np.asarray(y).reshape(1, -1).shape[1]
+            except Exception as e:
+                raise ValueError(f"Horizon forecaster tidak bisa ditentukan (meta tanpa 'horizon'): {e!r}") from e
+        if int(h) < 1:
+            raise ValueError(f"Horizon forecaster tidak valid: {h!r}")
+        return int(h)
+
+    # ---------- scoring ----------
+    def _labels(self, X: np.ndarray) -> dict:
+        if self.labels == "rules":
+            return label_arrays({c: X[:, i] for i, c in enumerate(self.sensor_cols)})
+        pred = np.asarray(self.decision_model.predict(X))
+        if pred.ndim == 1:
+            pred = pred.reshape(-1, 1)
+        return {c: pred[:, i].astype(str).astype(object) for i, c in enumerate(self.label_cols[:pred.shape[1]])}
+
+    def _score_series(self, values: np.ndarray):
+        """Yield (start, end, labels, soil_future) per batch untuk satu deret (urut waktu)."""
+        windows = window_view(values, self.window)
+        w = self.window
+        for s in range(0, len(values), self.batch_rows):
+            e = min(s + self.batch_rows, len(values))
+            labels = self._labels(values[s:e])
+            # baris t punya window jika t >= W-1; window untuk t = windows[t-W+1]
+            f0 = max(s, w - 1)
+            soil = None
+            if f0 < e:
+                y = np.asarray(self.forecast_model.predict(np.ascontiguousarray(windows[f0 - w + 1:e - w + 1])),
+                               dtype=np.float64)
+                y = y.reshape(len(y), -1)
+                if y.shape[1] != self.horizon:
+                    raise ValueError(f"Output forecaster {y.shape[1]} langkah, horizon {self.horizon}.")
+                soil = np.full((e - s, y.shape[1]), np.nan)
+                soil[f0 - s:] = y
+            self.rows += e - s
+            self.batches += 1
+            yield s, e, labels, soil
+
+    def iter_batches(self, df: pd.DataFrame, group_col: str | None = None, ts_col: str | None = "timestamp"):
+        """
+        Yield dict kolom per batch: kolom identitas (timestamp, group), sensor,
+        label_*, decision, soil_future (n, H), has_forecast, timeline (n, H),
+        next_irrig_hours.
+        """
+        missing = [c for c in self.sensor_cols if c not in df.columns]
+        if missing:
+            raise ValueError(f"Kolom sensor tidak ada di data: {missing}")
+        groups = [(None, df)] if group_col is None else df.groupby(group_col, sort=True)
+        for key, g in groups:
+            if ts_col and ts_col in g.columns and not g[ts_col].is_monotonic_increasing:
+                g = g.sort_values(ts_col, kind="stable")
+            values = np.ascontiguousarray(g[self.sensor_cols].to_numpy(dtype=np.float64, na_value=np.nan))
+            for s, e, labels, soil in self._score_series(values):
+                out = {}
+                if group_col is not None:
+                    out[group_col] = np.full(e - s, key, dtype=object)
+                if ts_col and ts_col in g.columns:
+                    out[ts_col] = g[ts_col].to_numpy()[s:e]
+                for i, c in enumerate(self.sensor_cols):
+                    out[c] = values[s:e, i]
+                out.update(labels)
+                out["decision"] = decide_action_array(labels)
+                has = np.arange(s, e) >= self.window - 1
+                if soil is not None:
+                    out["soil_future"] = soil
+                    out["timeline"] = future_decision_array(soil)
+                    out["next_irrig_hours"] = np.where(
+                        has, next_irrigation_hours_array(soil, self.threshold, self.freq_minutes), np.nan)
+                else:
+                    out["soil_future"] = None
+                    out["timeline"] = None
+                    out["next_irrig_hours"] = np.full(e - s, np.nan)
+                out["has_forecast"] = has
+                yield out
+
+    def score_frame(self, df: pd.DataFrame, group_col: str | None = None, ts_col: str | None = "timestamp") -> pd.DataFrame:
+        """Semua batch digabung jadi satu DataFrame (soil_future/timeline sebagai list per baris)."""
+        frames = [batch_to_frame(b) for b in self.iter_batches(df, group_col, ts_col)]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def write_parquet(self, df: pd.DataFrame, path: str, group_col: str | None = None,
+                      ts_col: str | None = "timestamp") -> int:
+        """Tulis skor ke Parquet per batch (row group per batch). Return jumlah baris."""
+        import pyarrow.parquet as pq
+
+        tmp = f"{path}.tmp"
+        writer = None
+        rows = 0
+        try:
+            for b in self.iter_batches(df, group_col, ts_col):
+                table = batch_to_arrow(b, self.horizon)
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp, table.schema, compression="zstd")
+                writer.write_table(table)
+                rows += table.num_rows
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is not None:
+            os.replace(tmp, path)
+        return rows
+
+
+def _list_column(matrix, has):
+    if matrix is None:
+        return [None] * len(has)
+    return [list(r) if h else None for r, h in zip(matrix, has)]
+
+
+def batch_to_frame(batch: dict) -> pd.DataFrame:
+    data = {k: v for k, v in batch.items() if k not in ("soil_future", "timeline", "has_forecast")}
+    data["soil_future"] = _list_column(batch["soil_future"], batch["has_forecast"])
+    data["timeline"] = _list_column(batch["timeline"], batch["has_forecast"])
+    return pd.DataFrame(data)
+
+
+def batch_to_arrow(batch: dict, horizon: int):
+    """
+    Batch -> pyarrow.Table; soil_future / timeline sebagai fixed-size list
+    <horizon> (null jika tanpa forecast). `horizon` wajib agar batch tanpa
+    forecast sama sekali tetap punya schema yang sama dengan batch lain.
+    """
+    import pyarrow as pa
+
+    has = batch["has_forecast"]
+    n = len(has)
+    cols = {}
+    for k, v in batch.items():
+        if k in ("soil_future", "timeline", "has_forecast"):
+            continue
+        cols[k] = pa.array(v)
+    soil, timeline = batch["soil_future"], batch["timeline"]
+    h = int(horizon)
+    if h < 1:
+        raise ValueError(f"horizon harus >= 1, bukan {horizon!r}")
+    if soil is not None and soil.shape[1] != h:
+        raise ValueError(f"soil_future {soil.shape[1]} langkah, horizon {h}.")
+    mask = pa.array(~has)
+    if soil is None:
+        soil = np.zeros((n, h))
+        timeline = np.full((n, h), "", dtype=object)
+    cols["soil_future"] = pa.FixedSizeListArray.from_arrays(
+        # float64: sama persis dengan soil_future yang dipakai menghitung timeline / next_irrig_hours
+        pa.array(np.asarray(soil, dtype=np.float64).ravel()), h, mask=mask)
+    cols["timeline"] = pa.FixedSizeListArray.from_arrays(
+        pa.array(timeline.ravel(), type=pa.string()).dictionary_encode(), h, mask=mask)
+    cols["next_irrig_hours"] = pa.array(batch["next_irrig_hours"], mask=np.isnan(batch["next_irrig_hours"]))
+    return pa.table(cols)
+
+
+def load_input(path: str, ts_col: str | None = "timestamp") -> pd.DataFrame:
+    if path.endswith(".parquet"):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path)
+    # float tetap float64: sama dengan input predict_once
+    return compact_frame(df, ts_col, float_dtype=None)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Backfill label/keputusan/forecast telemetry historis ke Parquet.")
+    ap.add_argument("--input", required=True, help="CSV atau Parquet time-series (kolom sensor training)")
+    ap.add_argument("--out", required=True, help="file Parquet output")
+    ap.add_argument("--model-dir", default="export_models", help="folder bundle joblib model")
+    ap.add_argument("--registry", default=None, help="registry sc_registry: pakai versi terbaru (atau --version)")
+    ap.add_argument("--version", default="", help="versi registry yang dipakai")
+    ap.add_argument("--labels", default="model", choices=["model", "rules"],
+                    help="label dari model decision atau langsung dari tabel threshold iris_labels")
+    ap.add_argument("--threshold", type=float, default=IRRIGATION_THRESHOLD)
+    ap.add_argument("--group-col", default=None, help="kolom device (window tidak menyeberang device)")
+    ap.add_argument("--ts-col", default="timestamp")
+    ap.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    args = ap.parse_args()
+
+    model_dir = args.model_dir
+    if args.registry:
+        from sc_registry import latest_version
+
+        version = latest_version(args.registry, args.version)
+        if version is None:
+            raise FileNotFoundError(f"Tidak ada versi model di registry: {args.registry}")
+        model_dir = os.path.join(args.registry, version)
+
+    t0 = time.perf_counter()
+    scorer = BackfillScorer.from_dir(model_dir, labels=args.labels, threshold=args.threshold,
+                                     batch_rows=args.batch_rows)
+    df = load_input(args.input, args.ts_col)
+    t1 = time.perf_counter()
+    rows = scorer.write_parquet(df, args.out, args.group_col, args.ts_col)
+    t2 = time.perf_counter()
+    print(f"BACKFILL {rows} baris -> {args.out} | model={model_dir} labels={args.labels} "
+          f"batches={scorer.batches} | load={t1 - t0:.2f}s score+write={t2 - t1:.2f}s "
+          f"({rows / max(t2 - t1, 1e-9):.0f} baris/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Lapisan loading data training iris_model.py.
+
+- PathIndex : lokasi file dicari sekali (termasuk os.walk folder kandidat),
+              hasilnya disimpan di JSON sehingga run berikutnya cukup stat().
+- DataCache : tiap CSV dikonversi SEKALI ke file kolom dengan nama berisi
+              hash konten CSV: kolom float -> float32 (kecuali kolom sensor
+              yang dilabeli threshold, tetap float64), timestamp sudah
+              di-parse dan data sudah diurutkan. Load berikutnya membaca
+              memory-mapped dan hanya kolom yang diminta.
+
+Format cache:
+  "arrow" : Arrow IPC / Feather v2 tanpa kompresi (butuh pyarrow); buffer
+            kolom dibaca langsung dari mmap tanpa decode. Parquet tidak
+            dipakai untuk cache karena selalu di-decode ke memori.
+  "npy"   : satu .npy per kolom + meta.json (tanpa dependensi tambahan),
+            dibaca dengan np.load(mmap_mode="r").
+  "auto"  : arrow jika pyarrow ter-install, selain itu npy.
+
+Hash konten CSV diingat per (path, size, mtime) di index yang sama, jadi file
+yang tidak berubah tidak di-hash ulang.
+"""
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from iris_labels import LABEL_RULES
+
+CACHE_VERSION = 2
+
+# Kolom sensor yang dilabeli iris_labels tidak di-downcast: float32 bisa
+# menggeser nilai melewati batas "<" / "<=" (mis. 27.0000009 -> 27.0) dan
+# mengubah label training.
+LABEL_SENSOR_COLS = tuple(sensor_col for sensor_col, _ in LABEL_RULES.values())
+
+
+def _read_json(path: str) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_json(path: str, data: dict):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def has_pyarrow() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+class PathIndex:
+    """Cache lokasi file (nama -> path) + hash konten per (path, size, mtime)."""
+
+    def __init__(self, candidate_dirs: list, index_path: str | None = None):
+        self.candidate_dirs = list(candidate_dirs)
+        self.index_path = index_path
+        data = _read_json(index_path) if index_path else {}
+        self.paths = data.get("paths", {})
+        self.hashes = data.get("hashes", {})
+        self.walked = False
+
+    def save(self):
+        if self.index_path:
+            _write_json(self.index_path, {"paths": self.paths, "hashes": self.hashes})
+
+    def _walk(self):
+        """Satu kali walk semua folder kandidat; semua nama file masuk index sekaligus."""
+        found = {}
+        for d in self.candidate_dirs:
+            if os.path.isdir(d):
+                for root, _, files in os.walk(d):
+                    for name in files:
+                        found.setdefault(name, os.path.join(root, name))
+        self.paths.update(found)
+        self.walked = True
+        self.save()
+
+    def resolve(self, filename: str) -> str:
+        if os.path.exists(filename):
+            return filename
+        for d in self.candidate_dirs:
+            p = os.path.join(d, filename)
+            if os.path.exists(p):
+                return p
+        p = self.paths.get(filename)
+        if p and os.path.exists(p):
+            return p
+        if not self.walked:
+            self._walk()
+            p = self.paths.get(filename)
+            if p and os.path.exists(p):
+                return p
+        raise FileNotFoundError(f"File '{filename}' tidak ditemukan. Pastikan sudah upload/tersedia di folder notebook atau /content (Colab).")
+
+    def content_hash(self, path: str) -> str:
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        stamp = f"{st.st_size}:{st.st_mtime_ns}"
+        entry = self.hashes.get(path)
+        if entry and entry.get("stamp") == stamp:
+            return entry["hash"]
+        digest = file_hash(path)
+        self.hashes[path] = {"stamp": stamp, "hash": digest}
+        self.save()
+        return digest
+
+
+def compact_frame(df: pd.DataFrame, ts_col: str | None = "timestamp", float_dtype="float32",
+                  keep_cols=LABEL_SENSOR_COLS) -> pd.DataFrame:
+    """Parse + urutkan timestamp (seperti iris_model.py lama), kolom float selain keep_cols -> float_dtype."""
+    if ts_col and ts_col in df.columns:
+        df[ts_col] = pd.to_datetime(df[ts_col], errors="coerce")
+        df.sort_values(ts_col, inplace=True)
+        df.reset_index(drop=True, inplace=True)
+    if float_dtype is not None:
+        for c in df.columns:
+            if c not in keep_cols and pd.api.types.is_float_dtype(df[c]):
+                df[c] = df[c].astype(float_dtype)
+    return df
+
+
+class DataCache:
+    def __init__(self, cache_dir: str, candidate_dirs: list, fmt: str = "auto",
+                 ts_col: str | None = "timestamp", float_dtype="float32", keep_cols=LABEL_SENSOR_COLS):
+        if fmt == "auto":
+            fmt = "arrow" if has_pyarrow() else "npy"
+        if fmt not in ("arrow", "npy"):
+            raise ValueError(f"Format cache tidak dikenal: {fmt!r} (pakai 'arrow', 'npy', atau 'auto')")
+        self.cache_dir = cache_dir
+        self.fmt = fmt
+        self.ts_col = ts_col
+        self.float_dtype = float_dtype
+        self.keep_cols = tuple(keep_cols)
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index = PathIndex(candidate_dirs, os.path.join(cache_dir, "path_index.json"))
+
+    def resolve(self, filename: str) -> str:
+        return self.index.resolve(filename)
+
+    # ---------- konversi ----------
+    def cache_path(self, csv_path: str) -> str:
+        stem = os.path.splitext(os.path.basename(csv_path))[0]
+        opts = (f"v{CACHE_VERSION}:{self.ts_col}:{np.dtype(self.float_dtype).str if self.float_dtype else '-'}"
+                f":{','.join(self.keep_cols)}")
+        tag = hashlib.blake2b(f"{self.index.content_hash(csv_path)}:{opts}".encode("utf-8"), digest_size=8).hexdigest()
+        ext = ".arrow" if self.fmt == "arrow" else ".npydir"
+        return os.path.join(self.cache_dir, f"{stem}.{tag}{ext}")
+
+    def convert(self, csv_path: str) -> str:
+        """CSV -> file cache (jika belum ada untuk konten ini). Return path cache."""
+        out = self.cache_path(csv_path)
+        if os.path.exists(out):
+            return out
+        df = compact_frame(pd.read_csv(csv_path), self.ts_col, self.float_dtype, self.keep_cols)
+        if self.fmt == "arrow":
+            self._write_arrow(df, out)
+        else:
+            self._write_npy(df, out)
+        print(f"DATA cache: {os.path.basename(csv_path)} -> {os.path.basename(out)} ({len(df)} baris)")
+        return out
+
+    @staticmethod
+    def _write_arrow(df: pd.DataFrame, out: str):
+        import pyarrow as pa
+        import pyarrow.feather as feather
+
+        tmp = f"{out}.tmp"
+        # satu record batch -> tiap kolom satu buffer kontigu di mmap
+        feather.write_feather(pa.Table.from_pandas(df, preserve_index=False), tmp,
+                              compression="uncompressed", chunksize=max(1, len(df)))
+        os.replace(tmp, out)
+
+    @staticmethod
+    def _write_npy(df: pd.DataFrame, out: str):
+        tmp = f"{out}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        meta = {"columns": [], "rows": len(df)}
+        for i, c in enumerate(df.columns):
+            s = df[c]
+            if pd.api.types.is_datetime64_any_dtype(s):
+                arr, kind = s.to_numpy(dtype="datetime64[ns]").view(np.int64), "datetime64[ns]"
+            elif pd.api.types.is_numeric_dtype(s) or pd.api.types.is_bool_dtype(s):
+                arr, kind = s.to_numpy(), "numeric"
+            else:
+                arr, kind = s.fillna("").astype(str).to_numpy(dtype=str), "str"
+            fname = f"{i:03d}.npy"
+            np.save(os.path.join(tmp, fname), np.ascontiguousarray(arr))
+            meta["columns"].append({"name": str(c), "file": fname, "kind": kind})
+        _write_json(os.path.join(tmp, "meta.json"), meta)
+        shutil.rmtree(out, ignore_errors=True)
+        os.replace(tmp, out)
+
+    # ---------- load ----------
+    @staticmethod
+    def _npy_columns(path: str, columns: list | None) -> tuple:
+        meta = _read_json(os.path.join(path, "meta.json"))
+        cols = {c["name"]: c for c in meta["columns"]}
+        names = list(cols) if columns is None else list(columns)
+        missing = [c for c in names if c not in cols]
+        if missing:
+            raise KeyError(f"Kolom tidak ada di cache {os.path.basename(path)}: {missing}")
+        out = {}
+        for name in names:
+            c = cols[name]
+            arr = np.load(os.path.join(path, c["file"]), mmap_mode="r")
+            if c["kind"] == "datetime64[ns]":
+                arr = arr.view("datetime64[ns]")
+            out[name] = arr
+        return out, cols
+
+    def load_columns(self, filename: str, columns: list | None = None) -> dict:
+        """
+        {kolom: array} langsung dari mmap (tanpa copy untuk kolom numerik).
+        Timestamp dikembalikan sebagai datetime64[ns].
+        """
+        path = self.convert(self.resolve(filename))
+        if self.fmt == "npy":
+            return self._npy_columns(path, columns)[0]
+
+        import pyarrow as pa
+        import pyarrow.ipc as ipc
+
+        table = ipc.open_file(pa.memory_map(path, "r")).read_all()
+        if columns is not None:
+            table = table.select(list(columns))
+        out = {}
+        for name, col in zip(table.column_names, table.columns):
+            if col.num_chunks == 1:
+                out[name] = col.chunk(0).to_numpy(zero_copy_only=False)
+            else:
+                out[name] = col.to_numpy()
+        return out
+
+    def load(self, filename: str, columns: list | None = None) -> pd.DataFrame:
+        """DataFrame dari cache (hanya kolom `columns` jika diisi)."""
+        path = self.convert(self.resolve(filename))
+        if self.fmt == "arrow":
+            import pyarrow.feather as feather
+
+            return feather.read_table(path, columns=columns, memory_map=True).to_pandas()
+
+        arrays, cols = self._npy_columns(path, columns)
+        data = {}
+        for name, arr in arrays.items():
+            if cols[name]["kind"] == "str":
+                # string disimpan tanpa NaN -> kembalikan "" ke NaN; dtype string diinfer seperti read_csv
+                arr = np.where(arr == "", None, arr.astype(object))
+                data[name] = pd.Series(arr)
+            else:
+                data[name] = np.asarray(arr)
+        return pd.DataFrame(data)
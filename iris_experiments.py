@@ -0,0 +1,230 @@
+"""
+Runner eksperimen forest untuk iris_model.py.
+
+Sweep n_estimators (mis. [50, 100, 200, 300, 500, 800]) tidak melatih ulang
+forest dari nol per nilai: satu forest per target di-grow bertahap dengan
+`warm_start=True`, dan di setiap n dibuat snapshot MultiOutputClassifier
+untuk dievaluasi. Pohon ke-k memakai seed yang sama seperti fit dari nol
+dengan random_state yang sama, jadi model (dan kurva akurasi) identik,
+tapi total pohon yang dilatih = max(n_list), bukan sum(n_list).
+
+Forest yang sudah di-fit disimpan di ModelCache dengan key hash
+(konfigurasi + sidik jari data). Karena model n pohon = n pohon pertama
+forest yang lebih besar, cukup forest terbesar yang disimpan: n <= yang ada
+dilayani sebagai prefix tanpa training, n yang lebih besar melanjutkan grow.
+
+Konfigurasi yang independen dijalankan paralel di process pool
+(`run_sweeps`); n_jobs forest di tiap proses dibagi dari jumlah CPU agar
+tidak terjadi oversubscription (pool x n_jobs=-1).
+"""
+import copy
+import hashlib
+import json
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.metrics import accuracy_score
+from sklearn.multioutput import MultiOutputClassifier
+
+ESTIMATORS = {
+    "rf": RandomForestClassifier,
+    "et": ExtraTreesClassifier,
+}
+
+
+def data_fingerprint(*arrays) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for a in arrays:
+        a = np.ascontiguousarray(np.asarray(a))
+        h.update(str((a.shape, a.dtype.str)).encode("utf-8"))
+        if a.dtype == object:
+            h.update("\x1f".join(map(str, a.ravel().tolist())).encode("utf-8"))
+        else:
+            h.update(a.tobytes())
+    return h.hexdigest()
+
+
+def config_key(config: dict, data_fp: str) -> str:
+    """Key cache: estimator + parameter (tanpa n_estimators/n_jobs) + data training."""
+    params = {k: v for k, v in config.get("params", {}).items() if k not in ("n_estimators", "n_jobs")}
+    payload = {
+        "estimator": config.get("estimator", "rf"),
+        "params": params,
+        "data": data_fp,
+    }
+    raw = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+class ModelCache:
+    """
+    Cache forest ter-fit (list forest per target): memori + (opsional) file
+    joblib per key di `cache_dir`.
+    """
+
+    def __init__(self, cache_dir: str | None = None):
+        self.cache_dir = cache_dir
+        self._mem = {}
+        self.hits = 0
+        self.misses = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.joblib")
+
+    def get(self, key: str):
+        model = self._mem.get(key)
+        if model is None and self.cache_dir and os.path.exists(self._path(key)):
+            model = self._mem[key] = joblib.load(self._path(key))
+        if model is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return model
+
+    def put(self, key: str, model):
+        self._mem[key] = model
+        if self.cache_dir:
+            tmp = self._path(key) + ".tmp"
+            joblib.dump(model, tmp)
+            os.replace(tmp, self._path(key))
+
+
+def make_estimator(config: dict, n_estimators: int, n_jobs=None):
+    params = dict(config.get("params", {}))
+    if n_jobs is not None:
+        params["n_jobs"] = n_jobs
+    return ESTIMATORS[config.get("estimator", "rf")](n_estimators=int(n_estimators), **params)
+
+
+def _columns(y):
+    y = y.values if hasattr(y, "values") else np.asarray(y)
+    return y if y.ndim == 2 else y.reshape(-1, 1)
+
+
+def _n_trees(ests) -> int:
+    return min(len(e.estimators_) for e in ests) if ests else 0
+
+
+def _snapshot(config: dict, ests: list, n: int, n_features: int) -> MultiOutputClassifier:
+    """MultiOutputClassifier dari n pohon pertama forest per target (tanpa menyalin pohon)."""
+    subs = []
+    for e in ests:
+        # warm_start hanya menambah pohon ke list estimators_ -> pohon lama tidak berubah
+        e = copy.copy(e)
+        e.estimators_ = e.estimators_[:n]
+        e.set_params(n_estimators=n, warm_start=False)
+        subs.append(e)
+    m = MultiOutputClassifier(make_estimator(config, n))
+    m.estimators_ = subs
+    m.n_features_in_ = n_features
+    return m
+
+
+def evaluate(model, X_test, y_test) -> dict:
+    yt = _columns(y_test)
+    yp = model.predict(X_test)
+    cols = list(y_test.columns) if hasattr(y_test, "columns") else [f"y{i}" for i in range(yt.shape[1])]
+    per_target = {c: float(accuracy_score(yt[:, i], yp[:, i])) for i, c in enumerate(cols)}
+    return {
+        "avg_acc": float(np.mean(list(per_target.values()))),
+        "exact_match": float(np.mean(np.all(yp == yt, axis=1))),
+        "per_target": per_target,
+    }
+
+
+def sweep_n_estimators(config: dict, X_train, y_train, X_test, y_test, n_list,
+                       cache: ModelCache | None = None, n_jobs=-1, keep_models: bool = True):
+    """
+    Grow forest per target dengan warm_start melewati n_list (urut naik).
+    Return (rows, models): rows = list dict hasil evaluasi per n,
+    models = {n: MultiOutputClassifier} (kosong jika keep_models=False).
+    """
+    n_list = sorted({int(n) for n in n_list})
+    yt = _columns(y_train)
+    n_features = np.asarray(X_train).shape[1]
+    key = config_key(config, data_fingerprint(X_train, yt))
+    name = config.get("name", config.get("estimator", "rf"))
+
+    ests = cache.get(key) if cache is not None else None
+    if ests is None:
+        ests = [make_estimator(config, 0, n_jobs) for _ in range(yt.shape[1])]
+    else:
+        ests = [copy.copy(e) for e in ests]
+        for e in ests:
+            e.estimators_ = list(e.estimators_)
+    for e in ests:
+        e.set_params(warm_start=True, n_jobs=n_jobs)
+    have = _n_trees(ests) if hasattr(ests[0], "estimators_") else 0
+
+    grown = False
+    rows, models = [], {}
+    for n in n_list:
+        t0 = time.perf_counter()
+        cached = n <= have
+        if not cached:
+            with warnings.catch_warnings():
+                # preset class_weight + warm_start aman di sini: data training sama persis
+                warnings.filterwarnings("ignore", message=".*class_weight presets.*")
+                for i, e in enumerate(ests):
+                    e.set_params(n_estimators=n)
+                    e.fit(X_train, yt[:, i])
+            have = n
+            grown = True
+        model = _snapshot(config, ests, n, n_features)
+        fit_sec = time.perf_counter() - t0
+
+        row = {"config": name, "n_estimators": n, "fit_sec": fit_sec, "cached": cached}
+        row.update(evaluate(model, X_test, y_test))
+        rows.append(row)
+        if keep_models:
+            models[n] = model
+
+    if grown and cache is not None:
+        cache.put(key, _snapshot(config, ests, have, n_features).estimators_)
+    return rows, models
+
+
+def seed_cache(cache: ModelCache, config: dict, model, X_train, y_train):
+    """
+    Masukkan MultiOutputClassifier yang sudah di-fit dengan konfigurasi `config`
+    (mis. clf di iris_model.py) ke cache, supaya sweep konfigurasi yang sama
+    memakai pohonnya dan tidak melatih ulang.
+    """
+    key = config_key(config, data_fingerprint(X_train, _columns(y_train)))
+    existing = cache.get(key)
+    if existing is None or _n_trees(existing) < _n_trees(model.estimators_):
+        cache.put(key, list(model.estimators_))
+
+
+def _sweep_job(args):
+    config, X_train, y_train, X_test, y_test, n_list, cache_dir, n_jobs = args
+    cache = ModelCache(cache_dir) if cache_dir else None
+    rows, _ = sweep_n_estimators(config, X_train, y_train, X_test, y_test, n_list,
+                                 cache=cache, n_jobs=n_jobs, keep_models=False)
+    return rows
+
+
+def run_sweeps(configs: list, X_train, y_train, X_test, y_test, n_list,
+               cache_dir: str | None = None, max_workers: int | None = None) -> list:
+    """
+    Jalankan sweep n_estimators untuk beberapa konfigurasi independen di process pool.
+    Tiap proses memakai n_jobs = cpu // workers (tanpa n_jobs=-1 bersarang).
+    Model yang di-fit disimpan ke cache_dir (jika diisi); return gabungan rows.
+    """
+    cpu = os.cpu_count() or 1
+    workers = max(1, min(len(configs), max_workers or cpu))
+    n_jobs = max(1, cpu // workers)
+    jobs = [(c, X_train, y_train, X_test, y_test, n_list, cache_dir, n_jobs) for c in configs]
+    if workers == 1:
+        results = [_sweep_job(j) for j in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_sweep_job, jobs))
+    return [row for rows in results for row in rows]
@@ -0,0 +1,252 @@
+"""
+Inferensi tree ensemble berbasis array datar (flat NumPy).
+
+Semua pohon dari model sklearn (RandomForest / ExtraTrees, dibungkus
+MultiOutputClassifier / MultiOutputRegressor, opsional di belakang
+StandardScaler dalam Pipeline) dipak jadi satu set array node kontigu:
+
+    feature[N], threshold[N], left[N], right[N], value[N, V], roots[T]
+
+Prediksi menelusuri SEMUA pohon sekaligus per level (vektorisasi NumPy),
+bukan dispatch Python per-estimator seperti sklearn. StandardScaler disimpan
+sebagai mean/scale dan diterapkan ke X sekali sebelum traversal.
+
+Paritas: seperti sklearn, X (setelah scaler) di-cast ke float32 lalu
+dibandingkan dengan threshold asli, jadi hasil identik dengan sklearn termasuk
+untuk nilai tepat di batas split (tests/test_forest.py). Format v1 lama
+melipat scaler ke threshold (x <= t * scale + mean) dan masih bisa di-load,
+tetapi bisa berbeda dari sklearn tepat di batas split.
+"""
+import numpy as np
+
+COMPILED_FORMAT = "iris_flat_forest_v2"
+# v1: scaler dilipat ke threshold (bundle lama, masih didukung saat load)
+_FOLDED_FORMAT = "iris_flat_forest_v1"
+
+
+def _unwrap_pipeline(model):
+    """Pisahkan StandardScaler (opsional) dan estimator akhir dari Pipeline."""
+    mean = scale = None
+    steps = getattr(model, "steps", None)
+    if steps is None:
+        return model, mean, scale
+
+    for _, step in steps[:-1]:
+        if step is None or step == "passthrough":
+            continue
+        if type(step).__name__ != "StandardScaler":
+            raise TypeError(f"Step pipeline tidak didukung untuk kompilasi: {type(step).__name__}")
+        if mean is not None:
+            raise TypeError("Lebih dari satu StandardScaler di pipeline tidak didukung.")
+        mean = np.asarray(step.mean_, dtype=np.float64) if step.with_mean else None
+        scale = np.asarray(step.scale_, dtype=np.float64) if step.with_std else None
+        if mean is None:
+            mean = np.zeros(int(step.n_features_in_), dtype=np.float64)
+    return steps[-1][1], mean, scale
+
+
+def _forest_groups(est):
+    """
+    Return (kind, groups). Tiap group = satu output model:
+      {"trees": [...], "width": V_g, "classes": array|None}
+    """
+    name = type(est).__name__
+    if name in ("MultiOutputClassifier", "MultiOutputRegressor"):
+        groups = []
+        kind = None
+        for sub in est.estimators_:
+            k, g = _forest_groups(sub)
+            if len(g) != 1:
+                raise TypeError("Nested multi-output tidak didukung.")
+            kind = k
+            groups.extend(g)
+        return kind, groups
+
+    trees = getattr(est, "estimators_", None)
+    if trees is None or not hasattr(est, "n_outputs_"):
+        raise TypeError(f"Estimator tidak didukung untuk kompilasi: {name}")
+    trees = [t.tree_ for t in trees]
+
+    if hasattr(est, "classes_"):
+        if est.n_outputs_ != 1:
+            raise TypeError("Forest classifier multi-output native tidak didukung; pakai MultiOutputClassifier.")
+        classes = np.asarray(est.classes_)
+        return "classifier", [{"trees": trees, "width": len(classes), "classes": classes}]
+
+    return "regressor", [{"trees": trees, "width": int(est.n_outputs_), "classes": None}]
+
+
+def compile_model(model) -> dict:
+    """Pak model sklearn menjadi dict array datar (siap joblib.dump)."""
+    est, mean, scale = _unwrap_pipeline(model)
+    kind, groups = _forest_groups(est)
+
+    V = max(g["width"] for g in groups)
+    n_nodes = sum(t.node_count for g in groups for t in g["trees"])
+    n_trees = sum(len(g["trees"]) for g in groups)
+
+    feature = np.zeros(n_nodes, dtype=np.int32)
+    threshold = np.full(n_nodes, np.inf, dtype=np.float64)
+    left = np.empty(n_nodes, dtype=np.int32)
+    right = np.empty(n_nodes, dtype=np.int32)
+    value = np.zeros((n_nodes, V), dtype=np.float64)
+    roots = np.empty(n_trees, dtype=np.int32)
+    group_start = np.empty(len(groups), dtype=np.int64)
+    group_size = np.empty(len(groups), dtype=np.int64)
+
+    off = 0
+    ti = 0
+    max_depth = 0
+    for gi, g in enumerate(groups):
+        group_start[gi] = ti
+        group_size[gi] = len(g["trees"])
+        for t in g["trees"]:
+            n = t.node_count
+            idx = np.arange(n, dtype=np.int32) + off
+            is_leaf = t.children_left == -1
+
+            feature[off:off + n] = np.where(is_leaf, 0, t.feature)
+            threshold[off:off + n] = np.where(is_leaf, np.inf, t.threshold)
+
+            # leaf menunjuk dirinya sendiri -> traversal bisa jalan max_depth langkah tanpa cek leaf
+            left[off:off + n] = np.where(is_leaf, idx, t.children_left + off)
+            right[off:off + n] = np.where(is_leaf, idx, t.children_right + off)
+
+            v = t.value[:, :, 0] if kind == "regressor" else t.value[:, 0, :]
+            v = np.asarray(v, dtype=np.float64)
+            if kind == "classifier":
+                tot = v.sum(axis=1, keepdims=True)
+                v = np.divide(v, tot, out=np.zeros_like(v), where=tot > 0)
+            value[off:off + n, :v.shape[1]] = v
+
+            roots[ti] = off
+            max_depth = max(max_depth, int(t.max_depth))
+            off += n
+            ti += 1
+
+    classes = [g["classes"] for g in groups] if kind == "classifier" else None
+    names = getattr(model, "feature_names_in_", None)
+    return {
+        "format": COMPILED_FORMAT,
+        "kind": kind,
+        "n_features": int(getattr(model, "n_features_in_", 0) or 0),
+        "feature_names": [str(c) for c in names] if names is not None else [],
+        "multi_output": type(est).__name__.startswith("MultiOutput") or len(groups) > 1,
+        "feature": feature,
+        "threshold": threshold,
+        "left": left,
+        "right": right,
+        "value": value,
+        "roots": roots,
+        "group_start": group_start,
+        "group_size": group_size,
+        "group_width": np.asarray([g["width"] for g in groups], dtype=np.int64),
+        "classes": classes,
+        "max_depth": max_depth,
+        "scaled": mean is not None or scale is not None,
+        "mean": mean,
+        "scale": scale,
+    }
+
+
+class CompiledForest:
+    """
+    Model hasil compile_model() dengan API .predict() seperti sklearn.
+    Atribut n_features_in_ / feature_names_in_ disalin agar perakitan fitur
+    di sc_worker tetap memakai urutan kolom yang sama.
+    """
+
+    def __init__(self, packed: dict):
+        if packed.get("format") not in (COMPILED_FORMAT, _FOLDED_FORMAT):
+            raise ValueError(f"Format model terkompilasi tidak dikenal: {packed.get('format')!r}")
+        self.packed = packed
+        self.folded = packed["format"] == _FOLDED_FORMAT and bool(packed.get("scaled", False))
+        self.mean = packed.get("mean")
+        self.scale = packed.get("scale")
+        self.kind = packed["kind"]
+        self.feature = packed["feature"]
+        self.threshold = packed["threshold"]
+        self.left = packed["left"]
+        self.right = packed["right"]
+        self.value = packed["value"]
+        self.roots = packed["roots"]
+        self.group_start = np.asarray(packed["group_start"])
+        self.group_size = np.asarray(packed["group_size"])
+        self.group_width = np.asarray(packed["group_width"])
+        self.classes = packed["classes"]
+        self.max_depth = int(packed["max_depth"])
+        self.multi_output = bool(packed["multi_output"])
+        if packed["n_features"]:
+            self.n_features_in_ = int(packed["n_features"])
+        if packed["feature_names"]:
+            self.feature_names_in_ = np.asarray(packed["feature_names"], dtype=object)
+
+    def apply(self, X) -> np.ndarray:
+        """Index leaf (global) per sampel per pohon: shape (n_samples, n_trees)."""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if not self.folded:
+            if self.mean is not None:
+                X = X - self.mean
+            if self.scale is not None:
+                X = X / self.scale
+            # samakan dengan sklearn: X (setelah scaler) dibandingkan dalam float32
+            X = X.astype(np.float32).astype(np.float64)
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def _group_means(self, X) -> np.ndarray:
+        leaves = self.apply(X)
+        vals = self.value[leaves]                                   # (n, T, V)
+        sums = np.add.reduceat(vals, self.group_start, axis=1)      # (n, G, V)
+        return sums / self.group_size[None, :, None]
+
+    def predict(self, X) -> np.ndarray:
+        means = self._group_means(X)
+        if self.kind == "regressor":
+            out = np.concatenate([means[:, g, :w] for g, w in enumerate(self.group_width)], axis=1)
+            if out.shape[1] == 1 and not self.multi_output:
+                return out[:, 0]
+            return out
+
+        cols = []
+        for g, w in enumerate(self.group_width):
+            idx = np.argmax(means[:, g, :w], axis=1)
+            cols.append(np.asarray(self.classes[g])[idx])
+        if len(cols) == 1 and not self.multi_output:
+            return cols[0]
+        return np.stack(cols, axis=1)
+
+    def predict_proba(self, X) -> list:
+        """Hanya classifier: list probabilitas per output (seperti MultiOutputClassifier)."""
+        if self.kind != "classifier":
+            raise AttributeError("predict_proba hanya tersedia untuk classifier.")
+        means = self._group_means(X)
+        return [means[:, g, :w] for g, w in enumerate(self.group_width)]
+
+
+def export_compiled(model, path: str, meta: dict | None = None) -> dict:
+    """Compile + simpan ke `path` (joblib, array tanpa kompresi). Return bundle."""
+    import joblib
+
+    packed = compile_model(model)
+    bundle = dict(meta or {})
+    bundle["compiled"] = packed
+    joblib.dump(bundle, path)
+    return bundle
+
+
+def load_compiled(path: str, mmap: bool = True) -> tuple:
+    """
+    Return (CompiledForest, meta_bundle). mmap=True -> array node di-memory-map
+    (read-only), jadi load hampir instan dan halaman dibagi antar proses.
+    """
+    import joblib
+
+    bundle = joblib.load(path, mmap_mode="r" if mmap else None)
+    return CompiledForest(bundle["compiled"]), bundle
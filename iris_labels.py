@@ -0,0 +1,245 @@
+"""
+Label threshold tomat indoor (sesuai Flutter), satu sumber untuk training
+(iris_model.py) dan runtime (sc_worker.py).
+
+Tiap label dideklarasikan sebagai tabel batas bin. Batas "<=" diubah ke batas
+"<" memakai np.nextafter, sehingga seluruh array bisa dilabeli sekali jalan
+dengan np.searchsorted (vektor) atau bisect (skalar).
+"""
+from bisect import bisect_right
+
+import numpy as np
+
+MISSING_LABEL = "-"
+
+
+class LabelRule:
+    """
+    edges : list (batas, op) urut naik; op "<" atau "<=" menyatakan nilai yang
+            masuk bin SEBELUM batas tersebut (v < batas / v <= batas).
+    labels: len(edges) + 1 label.
+    """
+
+    def __init__(self, edges: list, labels: list):
+        if len(labels) != len(edges) + 1:
+            raise ValueError("Jumlah label harus len(edges) + 1.")
+        self.edges = [(float(e), op) for e, op in edges]
+        self.labels = list(labels)
+        # v <= e  <=>  v < nextafter(e, +inf)
+        self.cut = np.array([e if op == "<" else np.nextafter(e, np.inf) for e, op in self.edges])
+        self._cut_list = self.cut.tolist()
+        self._lookup = np.array(self.labels + [MISSING_LABEL], dtype=object)
+
+    def bin_index(self, values) -> np.ndarray:
+        """Index bin per nilai; NaN -> len(labels)."""
+        v = np.asarray(values, dtype=np.float64)
+        idx = np.searchsorted(self.cut, v, side="right")
+        idx[np.isnan(v)] = len(self.labels)
+        return idx
+
+    def label_array(self, values) -> np.ndarray:
+        return self._lookup[self.bin_index(values)]
+
+    def edge_distance(self, value) -> float:
+        """Jarak nilai ke batas bin terdekat (NaN -> 0, dianggap ambigu)."""
+        if value is None:
+            return 0.0
+        v = float(value)
+        if v != v:
+            return 0.0
+        return min(abs(v - e) for e, _ in self.edges)
+
+    def label(self, value) -> str:
+        if value is None:
+            return MISSING_LABEL
+        v = float(value)
+        if v != v:
+            return MISSING_LABEL
+        return self.labels[bisect_right(self._cut_list, v)]
+
+
+SUHU_RULE = LabelRule(
+    [(13, "<"), (18, "<"), (27, "<="), (30, "<="), (33, "<=")],
+    ["Dingin", "Sejuk", "Optimal", "Hangat", "Panas", "Bahaya panas"],
+)
+RH_RULE = LabelRule(
+    [(40, "<"), (55, "<"), (75, "<="), (85, "<=")],
+    ["Terlalu kering", "Agak kering", "Optimal", "Terlalu lembap", "Sangat lembap (risiko jamur)"],
+)
+SOIL_RULE = LabelRule(
+    [(30, "<"), (40, "<"), (70, "<="), (85, "<=")],
+    ["Kering (butuh air)", "Agak kering", "Optimal", "Basah (kurangi air)", "Terlalu basah (risiko busuk akar)"],
+)
+LUX_RULE = LabelRule(
+    [(200, "<"), (600, "<"), (900, "<")],
+    ["Rendah", "Sedang", "Tinggi", "Sangat tinggi"],
+)
+UV_RULE = LabelRule(
+    [(2, "<="), (5, "<="), (7, "<="), (10, "<=")],
+    ["Rendah", "Sedang", "Tinggi", "Sangat tinggi", "Ekstrem"],
+)
+
+# label target -> (kolom sensor training, rule)
+LABEL_RULES = {
+    "label_suhu": ("air_temperature_c", SUHU_RULE),
+    "label_rh": ("air_humidity_pct", RH_RULE),
+    "label_soil": ("soil_moisture_pct", SOIL_RULE),
+    "label_lux": ("light_intensity_lux", LUX_RULE),
+    "label_uv": ("uv_index", UV_RULE),
+}
+TARGET_LABEL_COLS = list(LABEL_RULES)
+
+
+def suhu_ket_tomat_indoor(t: float) -> str:
+    return SUHU_RULE.label(t)
+
+def rh_ket_tomat_indoor(rh: float) -> str:
+    return RH_RULE.label(rh)
+
+def soil_ket_tomat_indoor(sm: float) -> str:
+    return SOIL_RULE.label(sm)
+
+def lux_ket(lux: float) -> str:
+    return LUX_RULE.label(lux)
+
+def uv_ket(uv: float) -> str:
+    return UV_RULE.label(uv)
+
+
+def label_arrays(columns: dict) -> dict:
+    """columns: {kolom_sensor: array}. Return {label_col: array label} untuk kolom yang ada."""
+    out = {}
+    for label_col, (sensor_col, rule) in LABEL_RULES.items():
+        if sensor_col in columns:
+            out[label_col] = rule.label_array(columns[sensor_col])
+    return out
+
+
+def label_frame(df):
+    """Label semua baris DataFrame (kolom sensor training) sekaligus."""
+    import pandas as pd
+
+    cols = {c: df[c].to_numpy(dtype=np.float64, na_value=np.nan) for c, _ in LABEL_RULES.values() if c in df.columns}
+    return pd.DataFrame(label_arrays(cols), index=df.index)
+
+
+def rule_labels(values: dict) -> dict:
+    """values: {kolom_sensor_training: float}. Return {label_col: label} (skalar)."""
+    return {
+        label_col: rule.label(values.get(sensor_col))
+        for label_col, (sensor_col, rule) in LABEL_RULES.items()
+    }
+
+
+def ambiguous_labels(values: dict, bands: dict) -> list:
+    """
+    Label yang nilainya berada dalam pita ambigu (<= bands[label_col]) dari
+    batas bin, atau NaN. Label tanpa entry di `bands` tidak pernah ambigu.
+    """
+    out = []
+    for label_col, (sensor_col, rule) in LABEL_RULES.items():
+        band = bands.get(label_col)
+        if band is None:
+            continue
+        if rule.edge_distance(values.get(sensor_col)) <= band:
+            out.append(label_col)
+    return out
+
+
+# =========================
+# ATURAN KEPUTUSAN (dari label / forecast soil)
+# =========================
+def decide_action_from_labels(labels: dict) -> str:
+    """
+    labels: dict dengan key:
+      label_suhu, label_rh, label_soil, label_lux, label_uv
+    Return: aksi/alert ringkas untuk aplikasi.
+    """
+    soil = labels.get("label_soil", "-")
+    suhu = labels.get("label_suhu", "-")
+    rh   = labels.get("label_rh", "-")
+    uv   = labels.get("label_uv", "-")
+
+    if soil == "Kering (butuh air)":
+        return "SIRAM_SEKARANG"
+    if soil == "Agak kering":
+        return "SIAGA_SIRAM"
+    if soil in ["Basah (kurangi air)", "Terlalu basah (risiko busuk akar)"]:
+        return "KURANGI_SIRAM"
+
+    if suhu in ["Panas", "Bahaya panas"]:
+        return "WASPADA_PANAS"
+    if rh in ["Sangat lembap (risiko jamur)"]:
+        return "RISIKO_JAMUR"
+    if uv in ["Sangat tinggi", "Ekstrem"]:
+        return "WASPADA_UV"
+
+    return "AMAN"
+
+def estimate_next_irrigation_hours(soil_forecast, threshold=30.0, freq_minutes=10):
+    """Estimasi berapa jam lagi soil moisture melewati threshold (default 30)."""
+    idx = np.where(np.array(soil_forecast) <= threshold)[0]
+    if len(idx) == 0:
+        return None
+    first = int(idx[0])
+    minutes = (first + 1) * freq_minutes
+    return minutes / 60.0
+
+def future_decision_timeline(soil_forecast):
+    """Timeline keputusan berbasis prediksi soil moisture (mengikuti label soil)."""
+    timeline = []
+    for v in soil_forecast:
+        s = soil_ket_tomat_indoor(v)
+        if s == "Kering (butuh air)":
+            timeline.append("SIRAM_SEKARANG")
+        elif s == "Agak kering":
+            timeline.append("SIAGA_SIRAM")
+        elif s in ["Basah (kurangi air)", "Terlalu basah (risiko busuk akar)"]:
+            timeline.append("KURANGI_SIRAM")
+        else:
+            timeline.append("AMAN")
+    return timeline
+
+
+# =========================
+# VERSI ARRAY (backfill / batch)
+# =========================
+# aksi timeline per bin SOIL_RULE (+ bin NaN terakhir -> AMAN, sama seperti label "-")
+_TIMELINE_BY_SOIL_BIN = np.array(
+    ["SIRAM_SEKARANG", "SIAGA_SIRAM", "AMAN", "KURANGI_SIRAM", "KURANGI_SIRAM", "AMAN"], dtype=object
+)
+
+
+def decide_action_array(labels: dict) -> np.ndarray:
+    """decide_action_from_labels untuk array label sekaligus (urutan prioritas sama)."""
+    n = len(next(iter(labels.values())))
+    missing = np.full(n, MISSING_LABEL, dtype=object)
+    soil = np.asarray(labels.get("label_soil", missing), dtype=object)
+    suhu = np.asarray(labels.get("label_suhu", missing), dtype=object)
+    rh = np.asarray(labels.get("label_rh", missing), dtype=object)
+    uv = np.asarray(labels.get("label_uv", missing), dtype=object)
+    return np.select(
+        [
+            soil == "Kering (butuh air)",
+            soil == "Agak kering",
+            np.isin(soil, ["Basah (kurangi air)", "Terlalu basah (risiko busuk akar)"]),
+            np.isin(suhu, ["Panas", "Bahaya panas"]),
+            rh == "Sangat lembap (risiko jamur)",
+            np.isin(uv, ["Sangat tinggi", "Ekstrem"]),
+        ],
+        ["SIRAM_SEKARANG", "SIAGA_SIRAM", "KURANGI_SIRAM", "WASPADA_PANAS", "RISIKO_JAMUR", "WASPADA_UV"],
+        default="AMAN",
+    ).astype(object)
+
+
+def future_decision_array(soil_forecast) -> np.ndarray:
+    """future_decision_timeline untuk matriks (n, H) prediksi soil -> matriks aksi (n, H)."""
+    return _TIMELINE_BY_SOIL_BIN[SOIL_RULE.bin_index(soil_forecast)]
+
+
+def next_irrigation_hours_array(soil_forecast, threshold=30.0, freq_minutes=10) -> np.ndarray:
+    """estimate_next_irrigation_hours per baris matriks (n, H); None -> NaN."""
+    below = np.asarray(soil_forecast, dtype=np.float64) <= threshold
+    first = np.argmax(below, axis=1)
+    hours = (first + 1) * freq_minutes / 60.0
+    return np.where(below.any(axis=1), hours, np.nan)
@@ -7,7 +7,7 @@ Original file is located at
     https://colab.research.google.com/drive/1ogoioQ4j9yM4anac3-b8wlvYa5lA-CnG
 """
 
-import os, zipfile, random, math
+import os, zipfile, random, math, time
 import numpy as np
 import pandas as pd
 
@@ -38,19 +38,20 @@ CANDIDATE_DIRS = [
     "/mnt/data"
 ]
 
+# Cache data (iris_data): index lokasi file + CSV dikonversi sekali ke file kolom
+# (Arrow IPC jika pyarrow ada, selain itu .npy per kolom) dengan nama berisi hash konten.
+# Kolom float disimpan float32 (tree sklearn memang bekerja di float32), kecuali
+# kolom sensor yang dilabeli threshold (tetap float64 agar label tidak bergeser);
+# timestamp sudah di-parse dan diurutkan; load ulang memory-mapped.
+from iris_data import DataCache
+
+DATA_CACHE_DIR = os.path.join(DATA_DIR, "data_cache")
+DATA_CACHE_FORMAT = "auto"      # "auto" | "arrow" | "npy"
+SENSOR_DTYPE = "float32"
+data_cache = DataCache(DATA_CACHE_DIR, CANDIDATE_DIRS, fmt=DATA_CACHE_FORMAT, float_dtype=SENSOR_DTYPE)
+
 def resolve_file(filename):
-    if os.path.exists(filename):
-        return filename
-    for d in CANDIDATE_DIRS:
-        p = os.path.join(d, filename)
-        if os.path.exists(p):
-            return p
-    for d in CANDIDATE_DIRS:
-        if os.path.isdir(d):
-            for root, _, files in os.walk(d):
-                if filename in files:
-                    return os.path.join(root, filename)
-    raise FileNotFoundError(f"File '{filename}' tidak ditemukan. Pastikan sudah upload/tersedia di folder notebook atau /content (Colab).")
+    return data_cache.resolve(filename)
 
 CSV_CLASSIFY = resolve_file("tomato_sensor_multiclass_12000.csv")
 CSV_TIMESERIES = resolve_file("dummy_tomato_sensor_dataset_7days_10min.csv")
@@ -71,10 +72,11 @@ EXP_DIR = os.path.join(DATA_DIR, "expresi_tanaman_dataset_extracted")
 """## 1) Load dataset CSV + standarisasi kolom"""
 
 # 1) Load dataset CSV + standarisasi kolom
-def load_csv_safe(path):
+def load_csv_safe(path, columns=None):
     if not os.path.exists(path):
         raise FileNotFoundError(f"Tidak ditemukan: {path}")
-    return pd.read_csv(path)
+    # timestamp sudah di-parse + diurutkan saat konversi cache
+    return data_cache.load(path, columns=columns)
 
 df_cls = load_csv_safe(CSV_CLASSIFY)
 df_ts  = load_csv_safe(CSV_TIMESERIES)
@@ -82,12 +84,6 @@ df_ts  = load_csv_safe(CSV_TIMESERIES)
 print("df_cls:", df_cls.shape, "cols:", list(df_cls.columns))
 print("df_ts :", df_ts.shape,  "cols:", list(df_ts.columns))
 
-for df in [df_cls, df_ts]:
-    if "timestamp" in df.columns:
-        df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
-        df.sort_values("timestamp", inplace=True)
-        df.reset_index(drop=True, inplace=True)
-
 SENSOR_COLS = ["air_humidity_pct", "soil_moisture_pct", "air_temperature_c", "light_intensity_lux", "uv_index"]
 
 missing_cls = [c for c in SENSOR_COLS if c not in df_cls.columns]
@@ -100,61 +96,14 @@ if missing_ts:
 # ============================================================
 # Auto-label (Tomat Indoor) sesuai threshold Flutter Anda
 # Ini yang akan dipakai untuk MELATIH model klasifikasi.
+# Tabel threshold ada di iris_labels.py (dipakai juga oleh sc_worker.py).
 # ============================================================
 
-def suhu_ket_tomat_indoor(t: float) -> str:
-    if pd.isna(t): return "-"
-    t = float(t)
-    if t < 13: return "Dingin"
-    if t < 18: return "Sejuk"
-    if t <= 27: return "Optimal"
-    if t <= 30: return "Hangat"
-    if t <= 33: return "Panas"
-    return "Bahaya panas"
-
-def rh_ket_tomat_indoor(rh: float) -> str:
-    if pd.isna(rh): return "-"
-    rh = float(rh)
-    if rh < 40: return "Terlalu kering"
-    if rh < 55: return "Agak kering"
-    if rh <= 75: return "Optimal"
-    if rh <= 85: return "Terlalu lembap"
-    return "Sangat lembap (risiko jamur)"
-
-def soil_ket_tomat_indoor(sm: float) -> str:
-    if pd.isna(sm): return "-"
-    sm = float(sm)
-    if sm < 30: return "Kering (butuh air)"
-    if sm < 40: return "Agak kering"
-    if sm <= 70: return "Optimal"
-    if sm <= 85: return "Basah (kurangi air)"
-    return "Terlalu basah (risiko busuk akar)"
-
-def lux_ket(lux: float) -> str:
-    if pd.isna(lux): return "-"
-    lux = float(lux)
-    if lux < 200: return "Rendah"
-    if lux < 600: return "Sedang"
-    if lux < 900: return "Tinggi"
-    return "Sangat tinggi"
-
-def uv_ket(uv: float) -> str:
-    if pd.isna(uv): return "-"
-    uv = float(uv)
-    if uv <= 2: return "Rendah"
-    if uv <= 5: return "Sedang"
-    if uv <= 7: return "Tinggi"
-    if uv <= 10: return "Sangat tinggi"
-    return "Ekstrem"
+from iris_labels import TARGET_LABEL_COLS, label_frame
 
 # Target label per-sensor (multi-output)
-TARGET_LABEL_COLS = ["label_suhu", "label_rh", "label_soil", "label_lux", "label_uv"]
-
-df_cls["label_suhu"] = df_cls["air_temperature_c"].apply(suhu_ket_tomat_indoor)
-df_cls["label_rh"]   = df_cls["air_humidity_pct"].apply(rh_ket_tomat_indoor)
-df_cls["label_soil"] = df_cls["soil_moisture_pct"].apply(soil_ket_tomat_indoor)
-df_cls["label_lux"]  = df_cls["light_intensity_lux"].apply(lux_ket)
-df_cls["label_uv"]   = df_cls["uv_index"].apply(uv_ket)
+# TARGET_LABEL_COLS (dari iris_labels): label_suhu, label_rh, label_soil, label_lux, label_uv
+df_cls[TARGET_LABEL_COLS] = label_frame(df_cls)[TARGET_LABEL_COLS]
 
 print("\nContoh hasil auto-label (5 baris):")
 display(df_cls[SENSOR_COLS + TARGET_LABEL_COLS].head())
@@ -249,6 +198,8 @@ for i, col in enumerate(TARGET_LABEL_COLS):
 Tujuan: dari data time-series 10 menit, kita membuat model untuk memprediksi **soil_moisture_pct** untuk beberapa jam ke depan.
 
 Model yang digunakan: **ExtraTreesRegressor (MultiOutput)** berbasis fitur lag (window waktu). Model ini stabil dan ringan untuk Colab/Jupyter tanpa GPU.
+
+`FORECASTER_KIND = "native"` melatih satu forest multi-output untuk semua H langkah (bukan H forest terpisah); `compare_forecasters()` membandingkan kedua opsi.
 """
 
 # 4) Model-2: Prediksi Kelembapan Tanah (Forecast beberapa jam ke depan)
@@ -259,21 +210,64 @@ W = int(PAST_HOURS*60/FREQ_MINUTES)
 H = int(FORECAST_HOURS*60/FREQ_MINUTES)
 TARGET_COL = "soil_moisture_pct"
 
-def make_supervised_forecast(df, sensor_cols, target_col, window=W, horizon=H):
-    """Ubah time series menjadi supervised dataset (X lag window, y multi-step horizon)."""
-    values = df[sensor_cols].values.astype(float)
-    target = df[target_col].values.astype(float)
-
-    X_list, y_list = [], []
-    for t in range(window, len(df) - horizon):
-        x = values[t-window:t].reshape(-1)
-        y = target[t:t+horizon]
-        X_list.append(x)
-        y_list.append(y)
-    Xs = np.array(X_list)
-    ys = np.array(y_list)
+from numpy.lib.stride_tricks import as_strided, sliding_window_view
+
+def _forecast_window_views(values, target, window, horizon):
+    """
+    View (tanpa copy) untuk semua sample: X[i] = values[i:i+window].reshape(-1),
+    y[i] = target[i+window:i+window+horizon]. `values` harus C-contiguous.
+    """
+    n = len(values) - window - horizon
+    n_feat = values.shape[1]
+    if n <= 0:
+        return (np.empty((0, window * n_feat), dtype=values.dtype),
+                np.empty((0, horizon), dtype=target.dtype))
+    # baris berurutan di memori C-contiguous -> window langsung bisa dibaca sebagai 1 baris datar
+    X = as_strided(values, shape=(n, window * n_feat), strides=(values.strides[0], values.strides[1]),
+                   writeable=False)
+    y = sliding_window_view(target, horizon)[window:window + n]
+    return X, y
+
+def make_supervised_forecast(df, sensor_cols, target_col, window=W, horizon=H, dtype=np.float64, copy=False):
+    """
+    Ubah time series menjadi supervised dataset (X lag window, y multi-step horizon).
+    Default mengembalikan view read-only tanpa copy; copy=True -> satu alokasi per array.
+    """
+    values = np.ascontiguousarray(df[sensor_cols].to_numpy(), dtype=dtype)
+    target = np.ascontiguousarray(df[target_col].to_numpy(), dtype=dtype)
+
+    Xs, ys = _forecast_window_views(values, target, window, horizon)
+    if copy:
+        Xs, ys = np.array(Xs), np.array(ys)
     return Xs, ys
 
+def iter_supervised_forecast(chunks, sensor_cols, target_col, window=W, horizon=H,
+                             dtype=np.float32, chunk_rows=100_000):
+    """
+    Versi streaming untuk data > RAM. `chunks` = DataFrame atau iterable DataFrame
+    (mis. pd.read_csv(..., chunksize=N)). Yield (X, y) per chunk; ekor window+horizon
+    baris dibawa ke chunk berikutnya sehingga hasil gabungannya sama dengan
+    make_supervised_forecast pada seluruh data.
+    """
+    if isinstance(chunks, pd.DataFrame):
+        df_all = chunks
+        chunks = (df_all.iloc[i:i + chunk_rows] for i in range(0, len(df_all), chunk_rows))
+
+    tail_v = tail_t = None
+    for chunk in chunks:
+        v = np.ascontiguousarray(chunk[sensor_cols].to_numpy(), dtype=dtype)
+        t = np.ascontiguousarray(chunk[target_col].to_numpy(), dtype=dtype)
+        if tail_v is not None:
+            v = np.concatenate([tail_v, v])
+            t = np.concatenate([tail_t, t])
+
+        Xs, ys = _forecast_window_views(v, t, window, horizon)
+        if len(Xs):
+            yield Xs, ys
+            tail_v, tail_t = v[len(Xs):], t[len(Xs):]
+        else:
+            tail_v, tail_t = v, t
+
 Xf, yf = make_supervised_forecast(df_ts, SENSOR_COLS, TARGET_COL, window=W, horizon=H)
 print("Forecast supervised X:", Xf.shape, "y:", yf.shape)
 
@@ -281,22 +275,84 @@ split_idx = int(len(Xf) * 0.8)
 Xf_train, Xf_test = Xf[:split_idx], Xf[split_idx:]
 yf_train, yf_test = yf[:split_idx], yf[split_idx:]
 
-forecaster = Pipeline(steps=[
-    ("scaler", StandardScaler()),
-    ("model", MultiOutputRegressor(
-        ExtraTreesRegressor(
-            n_estimators=300,
-            random_state=RANDOM_STATE,
-            n_jobs=-1,
-            min_samples_leaf=2
-        )
-    ))
-])
-
+# "multioutput" = 1 forest ExtraTrees per langkah horizon (H forest, cara lama)
+# "native"      = 1 forest ExtraTrees multi-output untuk semua H langkah sekaligus
+FORECASTER_KIND = "multioutput"
+# True = latih juga jenis forecaster lainnya untuk perbandingan (mahal: multioutput = H x 300 tree)
+COMPARE_FORECASTERS = False
+
+def make_forecaster(kind=FORECASTER_KIND):
+    et = ExtraTreesRegressor(
+        n_estimators=300,
+        random_state=RANDOM_STATE,
+        n_jobs=-1,
+        min_samples_leaf=2
+    )
+    if kind == "multioutput":
+        model = MultiOutputRegressor(et)
+    elif kind == "native":
+        model = et
+    else:
+        raise ValueError(f"FORECASTER_KIND tidak dikenal: {kind!r} (pakai 'multioutput' atau 'native')")
+    return Pipeline(steps=[
+        ("scaler", StandardScaler()),
+        ("model", model)
+    ])
+
+forecaster = make_forecaster(FORECASTER_KIND)
+
+_t0 = time.perf_counter()
 forecaster.fit(Xf_train, yf_train)
+forecaster_fit_sec = time.perf_counter() - _t0
 pred_test = forecaster.predict(Xf_test)
 mae = np.mean(np.abs(pred_test - yf_test))
-print("Mean Absolute Error (avg over horizon):", round(mae, 4))
+print(f"[{FORECASTER_KIND}] Mean Absolute Error (avg over horizon):", round(mae, 4))
+
+def compare_forecasters(fitted=None, kinds=("multioutput", "native"), n_latency=20):
+    """Bandingkan MAE, waktu training, ukuran file joblib, dan latency predict 1 baris.
+
+    fitted = {kind: (model_terlatih, fit_sec)} dipakai ulang apa adanya; hanya
+    jenis yang belum ada di sana yang dilatih.
+    """
+    import io
+    fitted = dict(fitted or {})
+    rows = []
+    for kind in kinds:
+        if kind in fitted:
+            m, fit_sec = fitted[kind]
+        else:
+            m = make_forecaster(kind)
+            t0 = time.perf_counter()
+            m.fit(Xf_train, yf_train)
+            fit_sec = time.perf_counter() - t0
+
+        p = m.predict(Xf_test)
+        buf = io.BytesIO()
+        joblib.dump(m, buf)
+
+        est = m.named_steps["model"]
+        subs = est.estimators_ if kind == "multioutput" else [est]
+        n_trees = sum(len(e.estimators_) for e in subs)
+
+        x1 = Xf_test[:1]
+        t0 = time.perf_counter()
+        for _ in range(n_latency):
+            m.predict(x1)
+        predict_ms = 1000.0 * (time.perf_counter() - t0) / n_latency
+
+        rows.append({
+            "kind": kind,
+            "mae": float(np.mean(np.abs(p - yf_test))),
+            "fit_sec": fit_sec,
+            "size_mb": buf.tell() / 1e6,
+            "predict_ms_1row": predict_ms,
+            "n_trees": n_trees,
+        })
+    return pd.DataFrame(rows).set_index("kind")
+
+if COMPARE_FORECASTERS:
+    print("\n=== Perbandingan forecaster ===")
+    display(compare_forecasters({FORECASTER_KIND: (forecaster, forecaster_fit_sec)}))
 
 i = 0
 plt.figure(figsize=(10,4))
@@ -316,32 +372,9 @@ Agar output lebih "aplikatif" (bukan hanya label mentah), kita buat *post-proces
 """
 
 # 5) Aturan interpretasi (Keputusan AI + Prediksi Siram + Laju Penguapan)
-def decide_action_from_labels(labels: dict) -> str:
-    """
-    labels: dict dengan key:
-      label_suhu, label_rh, label_soil, label_lux, label_uv
-    Return: aksi/alert ringkas untuk aplikasi.
-    """
-    soil = labels.get("label_soil", "-")
-    suhu = labels.get("label_suhu", "-")
-    rh   = labels.get("label_rh", "-")
-    uv   = labels.get("label_uv", "-")
-
-    if soil == "Kering (butuh air)":
-        return "SIRAM_SEKARANG"
-    if soil == "Agak kering":
-        return "SIAGA_SIRAM"
-    if soil in ["Basah (kurangi air)", "Terlalu basah (risiko busuk akar)"]:
-        return "KURANGI_SIRAM"
-
-    if suhu in ["Panas", "Bahaya panas"]:
-        return "WASPADA_PANAS"
-    if rh in ["Sangat lembap (risiko jamur)"]:
-        return "RISIKO_JAMUR"
-    if uv in ["Sangat tinggi", "Ekstrem"]:
-        return "WASPADA_UV"
-
-    return "AMAN"
+# decide_action_from_labels / estimate_next_irrigation_hours / future_decision_timeline
+# ada di iris_labels.py agar bisa dipakai juga oleh backend/app.py
+from iris_labels import decide_action_from_labels, estimate_next_irrigation_hours, future_decision_timeline
 
 def decision_to_expression(decision: str) -> str:
     """Pemetaan keputusan -> kelas ekspresi untuk animasi."""
@@ -357,69 +390,82 @@ def decision_to_expression(decision: str) -> str:
         return "sick" if os.path.exists(os.path.join(train_root, "sick")) else "sad_cry"
     return "sad_cry"
 
-def soil_ket_tomat_indoor(sm: float) -> str:
-    if pd.isna(sm): return "-"
-    sm = float(sm)
-    if sm < 30: return "Kering (butuh air)"
-    if sm < 40: return "Agak kering"
-    if sm <= 70: return "Optimal"
-    if sm <= 85: return "Basah (kurangi air)"
-    return "Terlalu basah (risiko busuk akar)"
-
-def estimate_next_irrigation_hours(soil_forecast, threshold=30.0):
-    """Estimasi berapa jam lagi soil moisture melewati threshold (default 30)."""
-    idx = np.where(np.array(soil_forecast) <= threshold)[0]
-    if len(idx) == 0:
-        return None
-    first = int(idx[0])
-    minutes = (first + 1) * FREQ_MINUTES
-    return minutes / 60.0
-
-def future_decision_timeline(soil_forecast):
-    """Timeline keputusan berbasis prediksi soil moisture (mengikuti label soil)."""
-    timeline = []
-    for v in soil_forecast:
-        s = soil_ket_tomat_indoor(v)
-        if s == "Kering (butuh air)":
-            timeline.append("SIRAM_SEKARANG")
-        elif s == "Agak kering":
-            timeline.append("SIAGA_SIRAM")
-        elif s in ["Basah (kurangi air)", "Terlalu basah (risiko busuk akar)"]:
-            timeline.append("KURANGI_SIRAM")
-        else:
-            timeline.append("AMAN")
-    return timeline
-
 """## 5.1 API Inferensi (untuk integrasi realtime)
 Jika nanti data sensor datang dari ESP32/Firebase, gunakan fungsi di bawah ini.
 Anda cukup menyimpan **history window W langkah terakhir** (misalnya list/array 36 baris) lalu panggil `predict_once(...)`.
 """
 
-from collections import deque
+from operator import itemgetter
 
 class SmartFarmingPredictor:
-    def __init__(self, decision_model, forecast_model, sensor_cols, target_label_cols, window=W):
+    """
+    History window disimpan di ring buffer array (2*window, n_sensor) yang
+    dialokasikan sekali: tiap reading ditulis di slot i dan i+window, sehingga
+    `window` baris terakhir selalu satu potongan kontigu dan input forecast
+    cukup di-reshape (tanpa copy). Satu objek = state satu bed/device.
+    """
+
+    def __init__(self, decision_model, forecast_model, sensor_cols, target_label_cols, window=W,
+                 dtype=np.float64):
         self.decision_model = decision_model
         self.forecast_model = forecast_model
-        self.sensor_cols = sensor_cols
+        self.sensor_cols = list(sensor_cols)
         self.target_label_cols = target_label_cols
-        self.window = window
-        self.history = deque(maxlen=window)
+        self.window = int(window)
+        self._get = itemgetter(*self.sensor_cols)
+        self._buf = np.zeros((2 * self.window, len(self.sensor_cols)), dtype=dtype)
+        self._pos = 0    # slot tulis berikutnya (0..window-1)
+        self._count = 0  # jumlah reading di window (maks window)
 
     def add_reading(self, reading: dict):
         """reading: dict berisi 5 sensor sesuai sensor_cols."""
-        self.history.append([float(reading[c]) for c in self.sensor_cols])
+        p = self._pos
+        self._buf[p] = self._get(reading)
+        self._buf[p + self.window] = self._buf[p]
+        self._pos = (p + 1) % self.window
+        self._count = min(self._count + 1, self.window)
+
+    def add_readings(self, rows):
+        """
+        Backfill banyak reading sekaligus (urut lama -> baru): DataFrame (kolom
+        sensor_cols), array (n, n_sensor), atau iterable dict. Hanya `window`
+        baris terakhir yang ditulis.
+        """
+        if isinstance(rows, pd.DataFrame):
+            arr = rows[self.sensor_cols].to_numpy(dtype=self._buf.dtype)
+        elif isinstance(rows, np.ndarray):
+            arr = rows
+        else:
+            arr = np.array([self._get(r) for r in rows], dtype=self._buf.dtype)
+        arr = np.asarray(arr, dtype=self._buf.dtype).reshape(-1, len(self.sensor_cols))[-self.window:]
+        if not len(arr):
+            return
+        idx = (self._pos + np.arange(len(arr))) % self.window
+        self._buf[idx] = arr
+        self._buf[idx + self.window] = arr
+        self._pos = (self._pos + len(arr)) % self.window
+        self._count = min(self._count + len(arr), self.window)
+
+    @property
+    def history(self) -> np.ndarray:
+        """View (count, n_sensor) reading di window, urut lama -> baru (berubah saat reading baru masuk)."""
+        end = self._pos + self.window
+        return self._buf[end - self._count:end]
+
+    def window_flat(self) -> np.ndarray:
+        """Input forecast (1, window*n_sensor): view kontigu ke buffer, tanpa copy."""
+        return self._buf[self._pos:self._pos + self.window].reshape(1, -1)
 
     def ready(self):
-        return len(self.history) >= self.window
+        return self._count >= self.window
 
     def forecast_soil(self):
         """Prediksi soil moisture beberapa jam ke depan (butuh window histori)."""
         if not self.ready():
             return None
-        x = np.array(self.history, dtype=float).reshape(1, -1)
-        pred = self.forecast_model.predict(x)[0]
-        return pred.tolist()
+        pred = self.forecast_model.predict(self.window_flat())[0]
+        # forecaster "multioutput" maupun "native" -> vektor H langkah
+        return np.ravel(pred).tolist()
 
     def predict_once(self, current_row: dict):
         """
@@ -449,7 +495,7 @@ class SmartFarmingPredictor:
             }
 
         soil_future = self.forecast_soil()
-        next_irrig_hours = estimate_next_irrigation_hours(soil_future, threshold=30.0)
+        next_irrig_hours = estimate_next_irrigation_hours(soil_future, threshold=30.0, freq_minutes=FREQ_MINUTES)
         timeline = future_decision_timeline(soil_future)
 
         return {
@@ -493,9 +539,7 @@ predictor = SmartFarmingPredictor(
 )
 
 seed_n = W
-for i in range(seed_n):
-    r = df_ts.iloc[i]
-    predictor.add_reading({c: r[c] for c in SENSOR_COLS})
+predictor.add_readings(df_ts.iloc[:seed_n])
 
 start_idx = seed_n
 end_idx = min(start_idx + 30, len(df_ts))
@@ -543,39 +587,97 @@ for i in range(start_idx, end_idx):
 
     time.sleep(0.05)
 
+"""## 6.1) Backfill skor seluruh time-series (batch)
+Demo di atas memproses satu baris per langkah. Untuk menghitung ulang label, keputusan, forecast
+dan `next_irrig_hours` seluruh histori (mis. setelah threshold/model berubah), `iris_backfill`
+membentuk semua window sekaligus dan memanggil model per batch besar. Dari command line:
+`python iris_backfill.py --input telemetry.csv --out scores.parquet --model-dir export_models`.
+"""
+
+from iris_backfill import BackfillScorer
+
+backfill = BackfillScorer(
+    clf, {"sensor_cols": SENSOR_COLS, "target_label_cols": TARGET_LABEL_COLS},
+    forecaster, {"sensor_cols": SENSOR_COLS, "window": W, "horizon": H, "freq_minutes": FREQ_MINUTES},
+)
+t0 = time.perf_counter()
+df_scores = backfill.score_frame(df_ts)
+print(f"Backfill {len(df_scores)} baris: {time.perf_counter() - t0:.2f}s")
+display(df_scores[["timestamp", "decision", "next_irrig_hours"] + TARGET_LABEL_COLS].tail())
+
 """## 7) Simpan model (untuk integrasi ke aplikasi / Firebase / backend)
 File yang disimpan:
 - `tomato_decision_model.joblib` (klasifikasi kondisi)
 - `tomato_forecast_model.joblib` (forecast soil moisture)
+- `*.compiled.joblib` (versi flat-array dari kedua model, untuk `sc_worker.py`)
 
 Anda bisa upload file ini ke storage/back-end dan dipanggil saat inferensi.
 """
 
+from iris_forest import export_compiled, load_compiled
+
 OUT_DIR = os.path.join(DATA_DIR, "export_models")
 os.makedirs(OUT_DIR, exist_ok=True)
 
 clf_path = os.path.join(OUT_DIR, "2tomato_decision_multilabel_model.joblib")
 fc_path  = os.path.join(OUT_DIR, "2tomato_forecast_model.joblib")
+clf_compiled_path = os.path.join(OUT_DIR, "2tomato_decision_multilabel_model.compiled.joblib")
+fc_compiled_path  = os.path.join(OUT_DIR, "2tomato_forecast_model.compiled.joblib")
 
-joblib.dump({
-    "model": clf,
+clf_meta = {
     "sensor_cols": SENSOR_COLS,
     "target_label_cols": TARGET_LABEL_COLS,
     "label_scheme": "tomat_indoor_flutter_threshold_v1",
-}, clf_path)
-
-joblib.dump({
-    "model": forecaster,
+}
+fc_meta = {
     "sensor_cols": SENSOR_COLS,
     "target_col": TARGET_COL,
     "window": W,
     "horizon": H,
     "freq_minutes": FREQ_MINUTES,
-}, fc_path)
+    "forecaster_kind": FORECASTER_KIND,
+}
+
+joblib.dump({"model": clf, **clf_meta}, clf_path)
+joblib.dump({"model": forecaster, **fc_meta}, fc_path)
+
+export_compiled(clf, clf_compiled_path, clf_meta)
+export_compiled(forecaster, fc_compiled_path, fc_meta)
+
+# cek paritas model terkompilasi vs sklearn
+clf_c, _ = load_compiled(clf_compiled_path)
+fc_c, _ = load_compiled(fc_compiled_path)
+print("Compiled decision exact match :", bool(np.all(clf_c.predict(X_test) == clf.predict(X_test))))
+print("Compiled forecast max |diff|  :", float(np.max(np.abs(fc_c.predict(Xf_test) - pred_test))))
 
 print("Saved:")
 print(" -", clf_path)
 print(" -", fc_path)
+print(" -", clf_compiled_path)
+print(" -", fc_compiled_path)
+
+# terbitkan sebagai versi baru di registry model; sc_worker yang sedang jalan
+# mem-poll registry, memvalidasi versi ini dengan probe (held-out test set)
+# lalu menukar model tanpa restart
+from sc_registry import publish
+from datetime import datetime
+
+REGISTRY_DIR = os.path.join(OUT_DIR, "registry")
+PROBE_ROWS = 2000
+
+model_version = datetime.now().strftime("%Y%m%d-%H%M%S")
+published = publish(
+    REGISTRY_DIR, model_version,
+    files=[clf_path, fc_path, clf_compiled_path, fc_compiled_path],
+    probe={
+        "decision_X": np.asarray(X_test, dtype=np.float64)[:PROBE_ROWS],
+        "decision_y": y_test.values.astype(str)[:PROBE_ROWS],
+        "forecast_X": np.asarray(Xf_test, dtype=np.float64)[:PROBE_ROWS],
+        "forecast_y": np.asarray(yf_test, dtype=np.float64)[:PROBE_ROWS],
+    },
+    meta={"decision_avg_acc": float(np.mean(y_pred == y_test.values)), "forecast_mae": float(mae)},
+)
+print(" - registry:", published)
 
 """## 8) (Opsional) Analisis tambahan dari dataset agronomi (ET)
 Jika Anda ingin mengaitkan prediksi dengan konsep agronomi (evapotranspirasi, radiasi surya, dsb.), dataset `2.Tomato_Irrigation_Dataset.csv` bisa dipakai di sini.
@@ -583,7 +685,7 @@ Bagian ini tidak wajib untuk demo realtime 5 sensor, tetapi berguna untuk lapora
 """
 
 if CSV_IRRIG and os.path.exists(CSV_IRRIG):
-    df_ir = pd.read_csv(CSV_IRRIG)
+    df_ir = load_csv_safe(CSV_IRRIG)
     print("df_irrig:", df_ir.shape)
     display(df_ir.head())
     cols = ["temperature","humidity","soil_moisture","evapotranspiration","solar_radiation_ghi","days_of_planted"]
@@ -599,21 +701,40 @@ drive.mount('/content/drive')
 !cp -r /content/export_models "/content/drive/MyDrive/export_models3"
 !ls -lah "/content/drive/MyDrive/export_models3"
 
+"""## 9) Eksperimen: akurasi vs n_estimators
+Sweep dijalankan lewat `iris_experiments`: forest per target di-grow bertahap (`warm_start`)
+melewati semua nilai n, jadi total pohon yang dilatih = max(n_list), bukan jumlah semua n.
+Forest di-cache per hash konfigurasi + data (`SWEEP_CACHE_DIR`), sehingga menjalankan ulang
+sel ini (atau menambah n) tidak melatih ulang pohon yang sudah ada. Hasilnya identik dengan
+melatih tiap n dari nol dengan random_state yang sama.
+"""
+
 import numpy as np
 import matplotlib.pyplot as plt
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.multioutput import MultiOutputClassifier
-from sklearn.metrics import accuracy_score
 
-base = RandomForestClassifier(n_estimators=500, random_state=42, n_jobs=-1, class_weight="balanced")
-mo = MultiOutputClassifier(base)
-mo.fit(X_train, y_train)
+from iris_experiments import ModelCache, run_sweeps, seed_cache, sweep_n_estimators
 
-y_pred = mo.predict(X_test)
+SWEEP_N_LIST = [50, 100, 200, 300, 500, 800]
+SWEEP_BAR_N = 500
+SWEEP_CACHE_DIR = os.path.join(DATA_DIR, "sweep_cache")
+sweep_cache = ModelCache(SWEEP_CACHE_DIR)
 
-accs = {}
-for i, col in enumerate(y_test.columns):
-    accs[col] = accuracy_score(y_test[col].values, y_pred[:, i])
+RF_BALANCED = {"name": "rf_balanced", "estimator": "rf",
+               "params": {"random_state": 42, "class_weight": "balanced"}}
+# konfigurasi clf (Model-1) -> pohonnya dipakai ulang oleh sweep konfigurasi ini
+CLF_CONFIG = {"name": "clf", "estimator": "rf",
+              "params": {"random_state": RANDOM_STATE, "class_weight": "balanced_subsample",
+                         "max_depth": None, "min_samples_leaf": 2}}
+seed_cache(sweep_cache, CLF_CONFIG, clf, X_train, y_train)
+
+sweep_rows, sweep_models = sweep_n_estimators(RF_BALANCED, X_train, y_train, X_test, y_test,
+                                              SWEEP_N_LIST, cache=sweep_cache)
+sweep_df = pd.DataFrame(sweep_rows).set_index("n_estimators")
+display(sweep_df[["avg_acc", "exact_match", "fit_sec", "cached"]])
+
+# model SWEEP_BAR_N pohon = snapshot dari sweep (tidak di-fit ulang)
+mo = sweep_models[SWEEP_BAR_N]
+accs = sweep_df.loc[SWEEP_BAR_N, "per_target"]
 
 plt.figure(figsize=(9,4))
 plt.bar(list(accs.keys()), list(accs.values()))
@@ -625,19 +746,8 @@ plt.grid(True, axis="y", alpha=0.3)
 plt.tight_layout()
 plt.show()
 
-n_list = [50, 100, 200, 300, 500, 800]
-avg_test = []
-
-for n in n_list:
-    base = RandomForestClassifier(n_estimators=n, random_state=42, n_jobs=-1, class_weight="balanced")
-    m = MultiOutputClassifier(base)
-    m.fit(X_train, y_train)
-    yp = m.predict(X_test)
-
-    per_target = []
-    for i, col in enumerate(y_test.columns):
-        per_target.append(accuracy_score(y_test[col].values, yp[:, i]))
-    avg_test.append(float(np.mean(per_target)))
+n_list = SWEEP_N_LIST
+avg_test = sweep_df["avg_acc"].tolist()
 
 plt.figure(figsize=(9,4))
 plt.plot(n_list, avg_test, label="avg test accuracy (across targets)")
@@ -648,4 +758,28 @@ plt.ylim(0, 1.05)
 plt.grid(True, alpha=0.3)
 plt.legend()
 plt.tight_layout()
-plt.show()
\ No newline at end of file
+plt.show()
+
+# (opsional) bandingkan beberapa konfigurasi sekaligus: tiap konfigurasi satu proses,
+# n_jobs forest dibagi dari jumlah CPU (tidak ada n_jobs=-1 bersarang di dalam pool)
+RUN_CONFIG_SWEEPS = False
+SWEEP_CONFIGS = [
+    RF_BALANCED,
+    CLF_CONFIG,
+    {"name": "et_balanced", "estimator": "et",
+     "params": {"random_state": RANDOM_STATE, "class_weight": "balanced"}},
+]
+
+if RUN_CONFIG_SWEEPS:
+    cfg_df = pd.DataFrame(run_sweeps(SWEEP_CONFIGS, X_train, y_train, X_test, y_test,
+                                     SWEEP_N_LIST, cache_dir=SWEEP_CACHE_DIR))
+    plt.figure(figsize=(9,4))
+    for name, g in cfg_df.groupby("config"):
+        plt.plot(g["n_estimators"], g["avg_acc"], marker="o", label=name)
+    plt.title("Avg Accuracy vs n_estimators per konfigurasi")
+    plt.xlabel("n_estimators")
+    plt.ylabel("avg accuracy")
+    plt.grid(True, alpha=0.3)
+    plt.legend()
+    plt.tight_layout()
+    plt.show()
@@ -0,0 +1,90 @@
+"""
+Helper asyncio untuk mode async sc_worker.
+
+firebase_admin dan model.predict() sifatnya blocking, jadi keduanya
+dijalankan di executor: I/O RTDB di pool thread I/O, predict di pool CPU
+terpisah, sehingga round trip Firebase yang lambat tidak menahan inferensi
+dan sebaliknya.
+
+Tulisan bersifat fire-and-forget: AsyncWriter mengirim delta OutputStage
+ke executor lalu langsung kembali. Maksimal satu tulisan in-flight per key
+(device) dan `max_in_flight` secara total; selama masih penuh, perubahan
+tetap menumpuk di OutputStage dan ikut tergabung di flush berikutnya
+(nilai terbaru menang), jadi tidak ada antrian tulisan yang tumbuh tanpa batas.
+Jika diberi `metrics` (sc_metrics.Metrics), durasi tulisan masuk stage "write"
+dan tulisan gagal / ditunda / tidak berubah ikut dihitung.
+"""
+import asyncio
+import time
+
+
+async def run_io(executor, fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+
+class AsyncWriter:
+    def __init__(self, executor, max_in_flight: int = 8, metrics=None):
+        self.executor = executor
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.metrics = metrics
+        self._in_flight = {}
+        self.submitted = 0
+        self.deferred = 0
+        self.failed = 0
+
+    def busy(self, key) -> bool:
+        return key in self._in_flight or len(self._in_flight) >= self.max_in_flight
+
+    def flush(self, key, stage) -> bool:
+        """
+        Kirim perubahan `stage` (OutputStage) tanpa menunggu. Return True jika
+        ada tulisan yang dikirim. Harus dipanggil dari thread event loop.
+        """
+        if self.busy(key):
+            if stage.has_pending():
+                self.deferred += 1
+                if self.metrics is not None:
+                    self.metrics.inc("writes_deferred")
+            return False
+        suppressed = stage.paths_suppressed
+        delta = stage.take()
+        if self.metrics is not None:
+            self.metrics.inc("writes_skipped", stage.paths_suppressed - suppressed, reason="unchanged")
+        if not delta:
+            return False
+
+        t0 = time.perf_counter()
+        fut = asyncio.get_running_loop().run_in_executor(self.executor, stage.base_ref.update, delta)
+        self._in_flight[key] = fut
+        self.submitted += 1
+        # callback jalan di thread event loop -> aman mengubah stage
+        fut.add_done_callback(lambda f: self._done(key, stage, delta, f, t0))
+        return True
+
+    def _done(self, key, stage, delta: dict, fut, t0: float):
+        self._in_flight.pop(key, None)
+        err = None if fut.cancelled() else fut.exception()
+        if self.metrics is not None:
+            self.metrics.observe("write", time.perf_counter() - t0, key)
+        if fut.cancelled() or err is not None:
+            self.failed += 1
+            stage.restore(delta)
+            if self.metrics is not None:
+                self.metrics.inc("errors", stage="write")
+                self.metrics.inc("retries", kind="write")
+            print(f"SC write error [{key}]:", repr(err))
+            return
+        stage.commit(delta)
+
+    async def drain(self):
+        """Tunggu semua tulisan in-flight selesai (dipakai saat shutdown)."""
+        if self._in_flight:
+            await asyncio.gather(*list(self._in_flight.values()), return_exceptions=True)
+
+    def summary(self) -> dict:
+        return {
+            "in_flight": len(self._in_flight),
+            "submitted": self.submitted,
+            "deferred": self.deferred,
+            "failed": self.failed,
+        }
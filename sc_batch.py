@@ -0,0 +1,87 @@
+"""
+Micro-batching inferensi lintas device.
+
+Daripada memanggil model.predict() dengan DataFrame 1 baris per device,
+baris dari semua device dikumpulkan lalu diprediksi sekali. Overhead
+per-call (dispatch per estimator pada RandomForest/ExtraTrees) jadi
+dibagi ke seluruh batch.
+"""
+import time
+
+import numpy as np
+
+
+class BatchStats:
+    """Statistik trade-off ukuran batch vs latency untuk satu stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.reset()
+
+    def reset(self):
+        self.batches = 0
+        self.rows = 0
+        self.max_batch = 0
+        self.predict_sec = 0.0
+        self.wait_sec = 0.0
+
+    def record(self, batch_size: int, predict_sec: float, wait_sec: float = 0.0):
+        self.batches += 1
+        self.rows += batch_size
+        self.max_batch = max(self.max_batch, batch_size)
+        self.predict_sec += predict_sec
+        self.wait_sec += wait_sec
+
+    def summary(self) -> dict:
+        b = max(1, self.batches)
+        r = max(1, self.rows)
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "avg_batch": self.rows / b,
+            "max_batch": self.max_batch,
+            "avg_predict_ms": 1000.0 * self.predict_sec / b,
+            "predict_ms_per_row": 1000.0 * self.predict_sec / r,
+            "avg_wait_ms": 1000.0 * self.wait_sec / b,
+        }
+
+    def report(self):
+        s = self.summary()
+        print(
+            f"BATCH {self.name}: batches={s['batches']} rows={s['rows']} "
+            f"avg_batch={s['avg_batch']:.1f} max_batch={s['max_batch']} "
+            f"predict={s['avg_predict_ms']:.1f}ms/batch ({s['predict_ms_per_row']:.2f}ms/row) "
+            f"wait={s['avg_wait_ms']:.1f}ms"
+        )
+
+
+def _stack(frames: list):
+    if isinstance(frames[0], np.ndarray):
+        return np.vstack(frames)
+    import pandas as pd
+    return pd.concat(frames, ignore_index=True)
+
+
+def predict_batch(model, frames: list, stats: BatchStats | None = None, wait_sec: float = 0.0) -> list:
+    """
+    frames: list buffer fitur 1 baris (ndarray dari feature plan, atau
+    DataFrame; boleh beda susunan kolom / lebar).
+    Frame dengan kolom yang sama ditumpuk dan diprediksi sekali.
+    Return list baris prediksi, urutannya sama dengan `frames`.
+    """
+    out = [None] * len(frames)
+    groups = {}
+    for i, X in enumerate(frames):
+        key = ("ndarray", X.shape[1]) if isinstance(X, np.ndarray) else tuple(X.columns)
+        groups.setdefault(key, []).append(i)
+
+    for idx in groups.values():
+        # vstack menyalin -> buffer per device aman dipakai ulang setelah ini
+        X = _stack([frames[i] for i in idx])
+        t0 = time.perf_counter()
+        pred = model.predict(X)
+        if stats is not None:
+            stats.record(len(idx), time.perf_counter() - t0, wait_sec)
+        for j, i in enumerate(idx):
+            out[i] = pred[j]
+    return out
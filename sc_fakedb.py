@@ -0,0 +1,252 @@
+"""
+Fake server REST RTDB untuk menguji lapisan transport sc_worker (sc_transport)
+tanpa Firebase.
+
+Melayani subset endpoint `<path>.json` yang dipakai RestBackend (GET dengan
+shallow / orderBy="$key" + startAt/endAt/limitToFirst/limitToLast, PUT,
+PATCH multi-path, POST, DELETE) di atas sc_store.MemoryBackend, lewat
+HTTP/1.1 keep-alive. Gangguan bisa disuntikkan:
+
+  - latency_ms (+ jitter_ms) per request
+  - error_rate    : fraksi request yang dijawab `error_status` (default 503)
+  - timeout_rate  : fraksi request yang ditahan `hang_sec` sebelum dijawab
+                    (client dengan timeout lebih pendek melihat timeout)
+  - outage(sec)   : semua request dijawab `error_status` selama sec detik
+  - drop_connections() : tutup semua koneksi keep-alive yang terbuka (seperti
+                    server restart / idle timeout load balancer)
+
+    python sc_fakedb.py --port 8765 --latency-ms 40 --error-rate 0.05
+    SC_STORAGE_BACKEND=rest SC_DB_URL=http://127.0.0.1:8765 python sc_worker.py
+
+sc_replay.py --fake-db menjalankan server ini in-process.
+"""
+import argparse
+import json
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from sc_store import MemoryBackend, _split_path
+
+
+class FakeRTDBServer:
+    def __init__(self, store: MemoryBackend | None = None, host: str = "127.0.0.1", port: int = 0,
+                 latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 503, timeout_rate: float = 0.0, hang_sec: float = 30.0, seed: int | None = None):
+        self.store = store if store is not None else MemoryBackend()
+        self.latency_ms = float(latency_ms)
+        self.jitter_ms = float(jitter_ms)
+        self.error_rate = float(error_rate)
+        self.error_status = int(error_status)
+        self.timeout_rate = float(timeout_rate)
+        self.hang_sec = float(hang_sec)
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._outage_until = 0.0
+        self._conns = set()
+        self.requests = 0
+        self.connections = 0
+        self.errors_injected = 0
+        self.timeouts_injected = 0
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="sc-fakedb", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def outage(self, sec: float):
+        """Semua request gagal (error_status) selama `sec` detik mulai sekarang."""
+        with self._lock:
+            self._outage_until = time.time() + float(sec)
+
+    def drop_connections(self) -> int:
+        """Tutup semua koneksi client yang terbuka. Return jumlah koneksi."""
+        with self._lock:
+            conns = list(self._conns)
+        for sock in conns:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        return len(conns)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "connections": self.connections,
+            "errors_injected": self.errors_injected,
+            "timeouts_injected": self.timeouts_injected,
+        }
+
+    # ---------- fault ----------
+    def _fault(self) -> str | None:
+        """None = layani normal, "error" / "hang" = gangguan untuk request ini."""
+        with self._lock:
+            self.requests += 1
+            if time.time() < self._outage_until:
+                self.errors_injected += 1
+                return "error"
+            r = self.rng.random()
+            if r < self.error_rate:
+                self.errors_injected += 1
+                return "error"
+            if r < self.error_rate + self.timeout_rate:
+                self.timeouts_injected += 1
+                return "hang"
+            delay = self.latency_ms + self.rng.uniform(0.0, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+        return None
+
+    # ---------- RTDB ----------
+    def _get(self, parts: list, q: dict):
+        if q.get("shallow") == "true":
+            return self.store.get(parts, shallow=True)
+        if "orderBy" not in q:
+            return self.store.get(parts)
+        if json.loads(q["orderBy"]) != "$key":
+            raise ValueError("hanya orderBy=\"$key\" yang didukung")
+        query = self.store.reference("/" + "/".join(parts)).order_by_key()
+        if "startAt" in q:
+            query.start_at(json.loads(q["startAt"]))
+        if "endAt" in q:
+            query.end_at(json.loads(q["endAt"]))
+        if "limitToFirst" in q:
+            query.limit_to_first(int(q["limitToFirst"]))
+        if "limitToLast" in q:
+            query.limit_to_last(int(q["limitToLast"]))
+        return query.get()
+
+    def handle(self, method: str, raw_path: str, body: bytes) -> tuple:
+        """Return (status, payload JSON-able, silent)."""
+        u = urlsplit(raw_path)
+        if not u.path.endswith(".json"):
+            return 404, {"error": "path harus berakhiran .json"}, False
+        parts = [unquote(p) for p in _split_path(u.path[:-len(".json")])]
+        q = {k: v[-1] for k, v in parse_qs(u.query).items()}
+        silent = q.get("print") == "silent"
+        try:
+            value = json.loads(body) if body else None
+            if method == "GET":
+                return 200, self._get(parts, q), False
+            if method == "PUT":
+                self.store.set(parts, value)
+                return 200, value, silent
+            if method == "PATCH":
+                if not isinstance(value, dict):
+                    return 400, {"error": "PATCH butuh objek JSON"}, False
+                self.store.update(parts, value)
+                return 200, value, silent
+            if method == "POST":
+                key = self.store.push_key()
+                if value is not None:
+                    self.store.set(parts + [key], value)
+                return 200, {"name": key}, silent
+            if method == "DELETE":
+                self.store.set(parts, None)
+                return 200, None, silent
+        except ValueError as e:
+            return 400, {"error": str(e)}, False
+        return 405, {"error": f"method {method} tidak didukung"}, False
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+                    server._conns.add(self.connection)
+
+            def finish(self):
+                with server._lock:
+                    server._conns.discard(self.connection)
+                try:
+                    super().finish()
+                except OSError:
+                    pass
+
+            def _serve(self):
+                n = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(n) if n else b""
+                fault = server._fault()
+                if fault == "hang":
+                    time.sleep(server.hang_sec)
+                if fault == "error":
+                    status, payload, silent = server.error_status, {"error": "injected fault"}, False
+                else:
+                    status, payload, silent = server.handle(self.command, self.path, body)
+                try:
+                    self._respond(status, payload, silent and status < 400)
+                except (BrokenPipeError, ConnectionResetError):
+                    # client sudah timeout dan menutup koneksi (hang yang disuntikkan)
+                    self.close_connection = True
+
+            def _respond(self, status: int, payload, silent: bool):
+                if silent:
+                    self.send_response(204)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                data = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_PUT = do_PATCH = do_POST = do_DELETE = _serve
+
+            def log_message(self, fmt, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--error-status", type=int, default=503)
+    ap.add_argument("--timeout-rate", type=float, default=0.0)
+    ap.add_argument("--hang-sec", type=float, default=30.0)
+    ap.add_argument("--stats-sec", type=float, default=60.0)
+    args = ap.parse_args()
+
+    server = FakeRTDBServer(
+        host=args.host, port=args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate, error_status=args.error_status, timeout_rate=args.timeout_rate,
+        hang_sec=args.hang_sec,
+    ).start()
+    print("FAKE RTDB:", server.url)
+    try:
+        while True:
+            time.sleep(args.stats_sec)
+            print("FAKE RTDB stats:", server.stats())
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Feature plan sc_worker: urutan kolom di-resolve SEKALI per model, lalu tiap
+tick cukup mengisi buffer NumPy yang sudah dialokasikan langsung dari state
+RTDB mentah (tanpa dict per baris dan tanpa pd.DataFrame).
+
+Semua nilai yang bisa diturunkan dari state/telemetry disimpan sebagai vektor
+dengan urutan ROW_FIELDS; nama kolom ESP32 dan nama kolom training adalah
+alias ke index yang sama.
+"""
+from datetime import datetime
+
+import numpy as np
+
+# index nilai dalam vektor baris
+SOIL, TEMP, HUM, LUX, UV, HOUR, LIGHT_PCT = range(7)
+N_ROW_VALUES = 7
+
+# nama kolom (versi ESP32 + versi model training) -> index vektor baris
+ROW_FIELDS = {
+    "soil_percent": SOIL,
+    "tempC": TEMP,
+    "humRH": HUM,
+    "light_percent": LIGHT_PCT,
+    "uv_uvi": UV,
+    "hour": HOUR,
+    "soil_moisture_pct": SOIL,
+    "air_temperature_c": TEMP,
+    "air_humidity_pct": HUM,
+    "light_intensity_lux": LUX,
+    "uv_index": UV,
+}
+
+
+def state_values(state: dict, now: datetime) -> list:
+    """
+    Nilai baris (urutan index ROW_FIELDS) langsung dari /state mentah.
+    Aturan fallback dan error sama dengan build_row_from_state.
+    """
+    soil = state.get("soil", {}).get("percent", None)
+    temp = state.get("env", {}).get("tempC", None)
+    hum  = state.get("env", {}).get("humRH", None)
+
+    light_obj = state.get("light", {}) or {}
+    light_percent = light_obj.get("percent", 0)
+
+    # jika ada lux asli dari device, pakai
+    light_lux = light_obj.get("lux", None)
+    if light_lux is None:
+        # fallback kasar: 0–100% -> 0–1000 lux
+        try:
+            light_lux = float(light_percent) * 10.0
+        except Exception:
+            light_lux = 0.0
+
+    uv_obj = state.get("uv", {}) or {}
+    uv_uvi = uv_obj.get("uvi", 0.0)
+
+    if soil is None or temp is None or hum is None:
+        raise ValueError("State belum lengkap: pastikan /state/soil/percent dan /state/env/tempC|humRH sudah ada.")
+
+    return [
+        float(soil),
+        float(temp),
+        float(hum),
+        float(light_lux),
+        float(uv_uvi),
+        int(now.hour),
+        float(light_percent),
+    ]
+
+
+def row_values(row: dict) -> list:
+    """Vektor baris dari dict hasil build_row_from_state / _normalize_point."""
+    out = [0.0] * N_ROW_VALUES
+    for name, i in ROW_FIELDS.items():
+        out[i] = row[name]
+    return out
+
+
+def values_to_row(values) -> dict:
+    row = {name: float(values[i]) for name, i in ROW_FIELDS.items()}
+    row["hour"] = int(values[HOUR])
+    return row
+
+
+class FeaturePlan:
+    """Satu baris fitur (decision / forecast single-step) dengan urutan kolom tetap."""
+
+    def __init__(self, cols: list, source: str, dtype="float64"):
+        self.cols = [str(c) for c in cols]
+        self.source = source
+        self.dtype = np.dtype(dtype)
+        self.missing = [c for c in self.cols if c not in ROW_FIELDS]
+        self.index = np.asarray([ROW_FIELDS.get(c, 0) for c in self.cols], dtype=np.intp)
+        self.n_features = len(self.cols)
+
+    def empty(self) -> np.ndarray:
+        """Buffer (1, n_features) milik pemanggil; dipakai ulang setiap tick."""
+        return np.empty((1, self.n_features), dtype=self.dtype)
+
+    def _check(self):
+        if self.missing:
+            raise ValueError(f"Fitur kurang untuk model ({self.source}): {self.missing}")
+
+    def fill_values(self, values, out: np.ndarray) -> np.ndarray:
+        self._check()
+        out[0] = np.asarray(values, dtype=np.float64)[self.index]
+        return out
+
+    def fill(self, state: dict, now: datetime, out: np.ndarray) -> np.ndarray:
+        return self.fill_values(state_values(state, now), out)
+
+
+class SequencePlan:
+    """
+    Window `steps` baris x `per` fitur (forecast multi-step), diratakan jadi
+    satu baris. Baris telemetry yang kurang dipad dengan baris state saat ini;
+    untuk 6 fitur per step, "hour" diisi per step mundur dari `now`.
+    """
+
+    def __init__(self, n_in: int, feats_by_per: dict, step_minutes: int, dtype="float64"):
+        self.n_features = int(n_in)
+        self.dtype = np.dtype(dtype)
+        self.step_minutes = int(step_minutes)
+        self.error = None
+        self.per = next((p for p in sorted(feats_by_per) if n_in % p == 0), None)
+        if self.per is None:
+            self.error = f"Forecast model n_features_in_={n_in} tidak bisa dipetakan ke 5/6 fitur per step."
+            self.per, self.steps, self.cols = 1, 0, []
+        else:
+            self.steps = n_in // self.per
+            self.cols = list(feats_by_per[self.per])
+        self.index = np.asarray([ROW_FIELDS[c] for c in self.cols], dtype=np.intp)
+        self.with_hour = "hour" in self.cols
+        self._offsets = np.arange(self.steps, dtype=np.int64) * self.step_minutes
+
+    def empty(self) -> np.ndarray:
+        return np.empty((1, self.n_features), dtype=self.dtype)
+
+    def hours(self, now: datetime) -> np.ndarray:
+        """Jam per step: sama dengan now - (steps-1-i)*step_minutes (jam dinding)."""
+        m0 = now.hour * 60 + now.minute - (self.steps - 1) * self.step_minutes
+        return ((m0 + self._offsets) // 60) % 24
+
+    def fill(self, history: np.ndarray, state: dict, now: datetime, out: np.ndarray,
+             hours: np.ndarray | None = None) -> np.ndarray:
+        """
+        history: array (k, N_ROW_VALUES) telemetry terurut lama -> baru.
+        hours  : jam per step (panjang `steps`) jika history sudah ber-timestamp
+                 (window hasil resample); None = mundur dari `now`.
+        """
+        if self.error:
+            raise ValueError(self.error)
+        current = np.asarray(state_values(state, now), dtype=np.float64)
+        view = out.reshape(self.steps, self.per)
+        k = min(len(history), self.steps)
+        pad = self.steps - k
+        if pad:
+            view[:pad] = current[self.index]
+        if k:
+            view[pad:] = history[len(history) - k:, self.index]
+        if self.with_hour:
+            view[:, self.cols.index("hour")] = self.hours(now) if hours is None else hours
+        return out
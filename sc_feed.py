@@ -0,0 +1,129 @@
+"""
+Change-feed untuk sc_worker (mode streaming).
+
+Daripada polling ref.get() setiap LOOP_SEC, feed menyimpan mirror lokal dari
+node RTDB (mis. /state dan /controls) dan memberi tahu worker hanya saat ada
+perubahan. Perubahan beruntun (burst) dikumpulkan dulu selama `coalesce_sec`
+sehingga inferensi cukup jalan sekali untuk satu burst.
+
+Implementasi:
+  - FirebaseChangeFeed : pakai ref.listen() (SSE firebase_admin)
+  - FakeChangeFeed     : feed lokal tanpa jaringan, untuk test / replay
+"""
+import copy
+import threading
+import time
+
+
+def _split_path(path: str) -> list:
+    return [p for p in str(path or "/").split("/") if p]
+
+
+def _set_path(node, parts: list, value):
+    """Set value di node[parts...]; value None = hapus (semantik RTDB)."""
+    if not parts:
+        return copy.deepcopy(value)
+    node = dict(node) if isinstance(node, dict) else {}
+    head, rest = parts[0], parts[1:]
+    child = _set_path(node.get(head), rest, value)
+    if child is None or child == {}:
+        node.pop(head, None)
+    else:
+        node[head] = child
+    return node or None
+
+
+def apply_event(snapshot, event_type: str, path: str, data):
+    """
+    Terapkan event RTDB ("put" / "patch") ke snapshot lokal.
+    Return snapshot baru (snapshot lama tidak diubah).
+    """
+    parts = _split_path(path)
+    if event_type == "patch":
+        node = snapshot
+        for k, v in (data or {}).items():
+            node = _set_path(node, parts + _split_path(k), v)
+        return node
+    return _set_path(snapshot, parts, data)
+
+
+class ChangeFeed:
+    """
+    Interface change-feed: mirror lokal beberapa node + notifikasi perubahan.
+    Subclass cukup mengimplementasikan start()/stop() dan memanggil _on_event().
+    """
+
+    def __init__(self, names):
+        self._cond = threading.Condition()
+        self._snap = {str(n): None for n in names}
+        self._dirty = set()
+        self.events = 0
+
+    def start(self):
+        raise NotImplementedError
+
+    def stop(self):
+        pass
+
+    def _on_event(self, name: str, event_type: str, path: str, data):
+        with self._cond:
+            self._snap[name] = apply_event(self._snap.get(name), event_type, path, data)
+            self._dirty.add(name)
+            self.events += 1
+            self._cond.notify_all()
+
+    def snapshot(self, name: str):
+        with self._cond:
+            return copy.deepcopy(self._snap.get(name))
+
+    def wait(self, timeout: float | None, coalesce_sec: float = 0.0) -> set:
+        """
+        Tunggu sampai ada perubahan (maks `timeout` detik), lalu tunggu lagi
+        `coalesce_sec` untuk menggabungkan burst. Return nama node yang berubah.
+        """
+        with self._cond:
+            if not self._dirty:
+                self._cond.wait(timeout)
+            if not self._dirty:
+                return set()
+        if coalesce_sec > 0:
+            time.sleep(coalesce_sec)
+        with self._cond:
+            changed, self._dirty = self._dirty, set()
+            return changed
+
+
+class FirebaseChangeFeed(ChangeFeed):
+    """Feed berbasis listener RTDB (satu koneksi streaming per node)."""
+
+    def __init__(self, refs: dict):
+        super().__init__(refs.keys())
+        self.refs = dict(refs)
+        self._registrations = []
+
+    def start(self):
+        for name, ref in self.refs.items():
+            def handler(event, name=name):
+                self._on_event(name, event.event_type, event.path, event.data)
+            self._registrations.append(ref.listen(handler))
+
+    def stop(self):
+        for reg in self._registrations:
+            try:
+                reg.close()
+            except Exception as e:
+                print("Feed close error:", repr(e))
+        self._registrations = []
+
+
+class FakeChangeFeed(ChangeFeed):
+    """Feed lokal: event didorong manual lewat put()/patch()."""
+
+    def start(self):
+        pass
+
+    def put(self, name: str, data, path: str = "/"):
+        self._on_event(name, "put", path, data)
+
+    def patch(self, name: str, data: dict, path: str = "/"):
+        self._on_event(name, "patch", path, data)
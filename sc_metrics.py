@@ -0,0 +1,244 @@
+"""
+Instrumentasi per stage sc_worker.
+
+Setiap stage (baca RTDB, fitur, predict, telemetry, forecast, tulis) dibungkus
+`metrics.timer(stage, device_id)`: durasi masuk histogram rolling (N sampel
+terakhir -> p50/p95/p99) dan exception dihitung sebagai error stage itu lalu
+diteruskan. Counter bebas (retry, tulisan yang dilewati, ...) lewat `inc()`.
+
+Diekspos sebagai:
+  - text Prometheus (`prometheus()` / endpoint HTTP `serve(port)` -> /metrics)
+  - snapshot JSON berkala (`maybe_snapshot()` -> print atau file)
+  - ringkasan per device (`device_snapshot()`) untuk node /devices/{id}/ai/metrics
+
+Histogram global selalu ada; histogram per device hanya jika
+`per_device=True` (ukurannya ikut jumlah device).
+"""
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class RollingHistogram:
+    """Ring buffer `maxlen` durasi terakhir (detik) + count/sum kumulatif."""
+
+    def __init__(self, maxlen: int = 1024):
+        self.maxlen = max(1, int(maxlen))
+        self._buf = np.zeros(self.maxlen, dtype=np.float64)
+        self._i = 0
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, sec: float):
+        self._buf[self._i] = sec
+        self._i = (self._i + 1) % self.maxlen
+        self.count += 1
+        self.sum += sec
+
+    def window(self) -> np.ndarray:
+        return self._buf[:min(self.count, self.maxlen)].copy()
+
+    def quantiles(self) -> dict:
+        w = self.window()
+        if not len(w):
+            return {}
+        return dict(zip(QUANTILES, np.quantile(w, QUANTILES).tolist()))
+
+    def summary(self) -> dict:
+        q = self.quantiles()
+        out = {"count": self.count, "avg_ms": 1000.0 * self.sum / max(1, self.count)}
+        for k, v in q.items():
+            out[f"p{int(round(k * 100))}_ms"] = 1000.0 * v
+        return out
+
+
+class _Timer:
+    __slots__ = ("metrics", "stage", "device_id", "t0")
+
+    def __init__(self, metrics, stage: str, device_id):
+        self.metrics = metrics
+        self.stage = stage
+        self.device_id = device_id
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.stage, time.perf_counter() - self.t0, self.device_id)
+        if exc_type is not None:
+            self.metrics.inc("errors", stage=self.stage)
+            if self.device_id is not None and self.metrics.per_device:
+                self.metrics._device_errors(self.device_id, self.stage)
+        return False
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    def __init__(self, prefix: str = "sc", enabled: bool = True, window: int = 1024,
+                 per_device: bool = False, device_window: int = 128):
+        self.prefix = prefix
+        self.enabled = enabled
+        self.window = int(window)
+        self.per_device = per_device
+        self.device_window = int(device_window)
+        self._lock = threading.Lock()
+        self._hist = {}
+        self._counters = {}
+        self._devices = {}
+        self.started = time.time()
+        self.last_snapshot = time.time()
+
+    # ---------- record ----------
+    def timer(self, stage: str, device_id=None):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, stage, device_id)
+
+    def observe(self, stage: str, sec: float, device_id=None):
+        if not self.enabled:
+            return
+        with self._lock:
+            h = self._hist.get(stage)
+            if h is None:
+                h = self._hist[stage] = RollingHistogram(self.window)
+            h.observe(sec)
+            if device_id is not None and self.per_device:
+                dev = self._device(device_id)
+                dh = dev["hist"].get(stage)
+                if dh is None:
+                    dh = dev["hist"][stage] = RollingHistogram(self.device_window)
+                dh.observe(sec)
+
+    def inc(self, name: str, n: int = 1, **labels):
+        if not self.enabled or not n:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + n
+
+    def _device(self, device_id) -> dict:
+        dev = self._devices.get(device_id)
+        if dev is None:
+            dev = self._devices[device_id] = {"hist": {}, "errors": {}}
+        return dev
+
+    def _device_errors(self, device_id, stage: str):
+        with self._lock:
+            errors = self._device(device_id)["errors"]
+            errors[stage] = errors.get(stage, 0) + 1
+
+    def forget_device(self, device_id):
+        with self._lock:
+            self._devices.pop(device_id, None)
+
+    # ---------- export ----------
+    def snapshot(self) -> dict:
+        with self._lock:
+            stages = {k: h.summary() for k, h in self._hist.items()}
+            counters = {}
+            for (name, labels), v in self._counters.items():
+                label = ",".join(f"{k}={val}" for k, val in labels)
+                counters[f"{name}{{{label}}}" if label else name] = v
+        return {"ts": int(time.time()), "uptime_sec": time.time() - self.started,
+                "stages": stages, "counters": counters}
+
+    def device_snapshot(self, device_id, ts: int | None = None) -> dict:
+        """Ringkasan stage satu device (untuk /devices/{id}/ai/metrics)."""
+        with self._lock:
+            dev = self._devices.get(device_id) or {"hist": {}, "errors": {}}
+            stages = {}
+            for k, h in dev["hist"].items():
+                s = h.summary()
+                stages[k] = {key: (round(v, 2) if isinstance(v, float) else v) for key, v in s.items()}
+            errors = dict(dev["errors"])
+        return {"stages": stages, "errors": errors, "ts": int(time.time() if ts is None else ts)}
+
+    def prometheus(self) -> str:
+        """Format exposition text Prometheus 0.0.4 (histogram rolling sebagai summary)."""
+        p = self.prefix
+        lines = [
+            f"# HELP {p}_stage_seconds Durasi stage worker (kuantil dari {self.window} sampel terakhir).",
+            f"# TYPE {p}_stage_seconds summary",
+        ]
+        with self._lock:
+            for stage, h in sorted(self._hist.items()):
+                for q, v in h.quantiles().items():
+                    lines.append(f'{p}_stage_seconds{{stage="{stage}",quantile="{q}"}} {v:.6g}')
+                lines.append(f'{p}_stage_seconds_sum{{stage="{stage}"}} {h.sum:.6g}')
+                lines.append(f'{p}_stage_seconds_count{{stage="{stage}"}} {h.count}')
+            by_name = {}
+            for (name, labels), v in self._counters.items():
+                by_name.setdefault(name, []).append((labels, v))
+        for name, items in sorted(by_name.items()):
+            lines.append(f"# TYPE {p}_{name}_total counter")
+            for labels, v in sorted(items):
+                label = ",".join(f'{k}="{val}"' for k, val in labels)
+                lines.append(f"{p}_{name}_total{{{label}}} {v}" if label else f"{p}_{name}_total {v}")
+        lines.append(f"# TYPE {p}_uptime_seconds gauge")
+        lines.append(f"{p}_uptime_seconds {time.time() - self.started:.0f}")
+        return "\n".join(lines) + "\n"
+
+    def write_snapshot(self, path: str = ""):
+        """Tulis snapshot JSON ke `path` (atomik), atau print satu baris jika path kosong."""
+        data = json.dumps(self.snapshot(), sort_keys=True)
+        if not path:
+            print("METRICS", data)
+            return
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def maybe_snapshot(self, interval_sec: float, path: str = ""):
+        if self.enabled and interval_sec > 0 and time.time() - self.last_snapshot >= interval_sec:
+            self.last_snapshot = time.time()
+            try:
+                self.write_snapshot(path)
+            except OSError as e:
+                print("METRICS snapshot error:", repr(e))
+
+    def serve(self, port: int, host: str = "0.0.0.0"):
+        """Endpoint HTTP di thread daemon: /metrics (Prometheus) dan /metrics.json."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, ctype = metrics.prometheus(), "text/plain; version=0.0.4; charset=utf-8"
+                elif self.path == "/metrics.json":
+                    body, ctype = json.dumps(metrics.snapshot()), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, fmt, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, int(port)), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="sc-metrics", daemon=True).start()
+        print(f"METRICS endpoint: http://{host}:{server.server_address[1]}/metrics")
+        return server
@@ -0,0 +1,121 @@
+"""
+Output stage sc_worker: coalescing + delta-only write ke RTDB.
+
+Semua tulisan satu tick (ai/now, ai/forecast, field /controls) di-stage dulu,
+dibandingkan dengan nilai yang TERAKHIR DITULIS, lalu yang berubah digabung
+menjadi SATU multi-path update di root device. Perubahan angka di bawah
+`tolerance` dan field volatil (ts/iso) tidak dihitung sebagai perubahan,
+sehingga listener Flutter tidak terbangun tanpa alasan. Node yang tidak
+berubah tetap ditulis ulang setiap `heartbeat_sec` agar "ts" di app tetap segar.
+"""
+import time
+
+VOLATILE_KEYS = ("ts", "iso")
+
+
+def _is_number(v) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+def changed(old, new, tolerance: float = 0.0, ignore=VOLATILE_KEYS) -> bool:
+    """True jika `new` berbeda bermakna dari `old`."""
+    if _is_number(old) and _is_number(new):
+        if old != old or new != new:
+            return (old != old) != (new != new)
+        return abs(float(new) - float(old)) > tolerance
+    if isinstance(old, dict) and isinstance(new, dict):
+        keys = (set(old) | set(new)) - set(ignore)
+        return any(k not in old or k not in new or changed(old[k], new[k], tolerance, ignore) for k in keys)
+    if isinstance(old, (list, tuple)) and isinstance(new, (list, tuple)):
+        if len(old) != len(new):
+            return True
+        return any(changed(a, b, tolerance, ignore) for a, b in zip(old, new))
+    return old != new
+
+
+class OutputStage:
+    def __init__(self, base_ref, tolerance: float = 0.0, heartbeat_sec: float = 0.0):
+        self.base_ref = base_ref
+        self.tolerance = float(tolerance)
+        self.heartbeat_sec = float(heartbeat_sec)
+        self._pending = {}
+        self._written = {}
+        self._written_ts = {}
+        self.writes = 0
+        self.paths_written = 0
+        self.paths_suppressed = 0
+
+    def put(self, path: str, value):
+        """Stage penulisan node penuh (semantik ref.set) di path relatif root device."""
+        self._pending[path.strip("/")] = value
+
+    def patch(self, path: str, fields: dict):
+        """Stage update beberapa field (semantik ref.update)."""
+        base = path.strip("/")
+        for k, v in fields.items():
+            self._pending[f"{base}/{k}" if base else str(k)] = v
+
+    def has_pending(self) -> bool:
+        return bool(self._pending)
+
+    def take(self) -> dict:
+        """
+        Ambil delta yang perlu ditulis dan kosongkan pending, tanpa menulis.
+        Pemanggil wajib memanggil commit(delta) jika tulisan berhasil atau
+        restore(delta) jika gagal (dipakai writer async di sc_async).
+        """
+        if not self._pending:
+            return {}
+        now = time.time()
+        delta = {}
+        for path, value in self._pending.items():
+            stale = self.heartbeat_sec > 0 and now - self._written_ts.get(path, 0.0) >= self.heartbeat_sec
+            if path not in self._written or stale or changed(self._written[path], value, self.tolerance):
+                delta[path] = value
+            else:
+                self.paths_suppressed += 1
+        self._pending = {}
+        return delta
+
+    def commit(self, delta: dict):
+        now = time.time()
+        self.writes += 1
+        self.paths_written += len(delta)
+        for path, value in delta.items():
+            self._written[path] = value
+            self._written_ts[path] = now
+
+    def restore(self, delta: dict):
+        """Kembalikan delta gagal ke pending, kecuali path yang sudah di-stage ulang."""
+        for path, value in delta.items():
+            self._pending.setdefault(path, value)
+
+    def flush(self) -> dict:
+        """Tulis perubahan dalam satu update. Return dict yang ditulis ({} jika tidak ada)."""
+        delta = self.take()
+        if not delta:
+            return {}
+        try:
+            self.base_ref.update(delta)
+        except Exception:
+            # dicoba lagi pada flush berikutnya
+            self.restore(delta)
+            raise
+        self.commit(delta)
+        return delta
+
+    def snapshot(self) -> dict:
+        """Nilai yang terakhir ditulis (+ waktunya), untuk checkpoint sc_state."""
+        return {"written": self._written, "written_ts": self._written_ts}
+
+    def restore_written(self, snap: dict):
+        """Setelah restart: output yang tidak berubah sejak checkpoint tidak ditulis ulang."""
+        self._written.update(snap.get("written") or {})
+        self._written_ts.update(snap.get("written_ts") or {})
+
+    def summary(self) -> dict:
+        return {
+            "writes": self.writes,
+            "paths_written": self.paths_written,
+            "paths_suppressed": self.paths_suppressed,
+        }
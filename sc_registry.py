@@ -0,0 +1,201 @@
+"""
+Registry model + hot-swap untuk sc_worker.
+
+Layout registry (satu direktori per versi, urutan nama = urutan versi):
+
+    MODEL_REGISTRY_DIR/
+        20261018-0930/
+            2tomato_decision_multilabel_model[.compiled].joblib
+            2tomato_forecast_model[.compiled].joblib
+            probe.npz        (opsional) held-out probe set dari notebook
+            manifest.json
+
+`publish()` menyalin bundle ke direktori sementara berawalan "." lalu
+me-rename ke nama versi, jadi worker tidak pernah melihat versi setengah jadi.
+
+ModelReloader mem-poll registry di thread daemon. Versi baru di-load dan
+divalidasi di thread itu (loop kontrol tetap jalan dengan model lama), lalu
+dipasang lewat `install_fn` (satu assignment referensi). Versi yang gagal
+validasi dicatat dan tidak dicoba ulang.
+"""
+import gc
+import json
+import os
+import shutil
+import threading
+import time
+import traceback
+from pathlib import Path
+
+import numpy as np
+
+MANIFEST = "manifest.json"
+PROBE = "probe.npz"
+
+
+def rss_mb() -> float:
+    """RSS proses saat ini (MB); fallback ke maxrss jika /proc tidak ada."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def maxrss_mb() -> float:
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def list_versions(registry_dir) -> list:
+    """Versi lengkap (punya manifest.json), urut naik."""
+    d = Path(registry_dir)
+    if not d.is_dir():
+        return []
+    return sorted(p.name for p in d.iterdir()
+                  if p.is_dir() and not p.name.startswith(".") and (p / MANIFEST).exists())
+
+
+def latest_version(registry_dir, pinned: str = "") -> str | None:
+    versions = list_versions(registry_dir)
+    if pinned:
+        return pinned if pinned in versions else None
+    return versions[-1] if versions else None
+
+
+def read_manifest(version_dir) -> dict:
+    try:
+        with open(Path(version_dir) / MANIFEST) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_probe(version_dir) -> dict:
+    p = Path(version_dir) / PROBE
+    if not p.exists():
+        return {}
+    with np.load(p, allow_pickle=False) as data:
+        return {k: data[k] for k in data.files}
+
+
+def publish(registry_dir, version: str, files: list, probe: dict | None = None, meta: dict | None = None) -> Path:
+    """
+    Terbitkan satu versi: salin `files` (path bundle joblib) + probe
+    (dict array, mis. decision_X/decision_y/forecast_X/forecast_y) ke registry.
+    """
+    registry_dir = Path(registry_dir)
+    final = registry_dir / version
+    if final.exists():
+        raise FileExistsError(f"Versi model sudah ada: {final}")
+    tmp = registry_dir / f".{version}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    for f in files:
+        shutil.copy2(f, tmp / Path(f).name)
+    if probe:
+        np.savez(tmp / PROBE, **{k: np.asarray(v) for k, v in probe.items()})
+    manifest = {"version": version, "created": int(time.time()), "files": [Path(f).name for f in files]}
+    manifest.update(meta or {})
+    with open(tmp / MANIFEST, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True, default=str)
+    os.replace(tmp, final)
+    return final
+
+
+class ModelReloader:
+    """
+    load_fn(version_dir, version) -> model set baru
+    validate_fn(new_set, version_dir) -> (ok: bool, report: dict)
+    install_fn(new_set) -> model set lama
+    """
+
+    def __init__(self, registry_dir, current_version, load_fn, validate_fn, install_fn,
+                 poll_sec: float = 30.0, pinned: str = ""):
+        self.registry_dir = Path(registry_dir)
+        self.current_version = current_version
+        self.load_fn = load_fn
+        self.validate_fn = validate_fn
+        self.install_fn = install_fn
+        self.poll_sec = float(poll_sec)
+        self.pinned = pinned
+        self.rejected = set()
+        self.history = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sc-model-reload", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.poll_sec):
+            try:
+                self.check()
+            except Exception as e:
+                print("MODEL reload error:", repr(e))
+
+    def check(self) -> bool:
+        """Pasang versi terbaru jika berbeda dari yang aktif. Return True jika terjadi swap."""
+        version = latest_version(self.registry_dir, self.pinned)
+        if version is None or version == self.current_version or version in self.rejected:
+            return False
+        return self.reload(version)
+
+    def reload(self, version: str) -> bool:
+        version_dir = self.registry_dir / version
+        rss0, peak0 = rss_mb(), maxrss_mb()
+        t0 = time.perf_counter()
+        try:
+            new = self.load_fn(version_dir, version)
+            load_sec = time.perf_counter() - t0
+            t1 = time.perf_counter()
+            ok, report = self.validate_fn(new, version_dir)
+            validate_sec = time.perf_counter() - t1
+        except Exception as e:
+            self.rejected.add(version)
+            print(f"MODEL REJECT {version}: load/validasi gagal:", repr(e))
+            traceback.print_exc()
+            return False
+        if not ok:
+            self.rejected.add(version)
+            print(f"MODEL REJECT {version}: probe gagal | {report}")
+            return False
+
+        # puncak overlap: model lama + baru sama-sama resident
+        rss_overlap = rss_mb()
+        # maxrss hanya naik jika load melewati puncak proses sebelumnya
+        peak = max(rss_overlap, maxrss_mb()) if maxrss_mb() > peak0 else rss_overlap
+        old = self.install_fn(new)
+        swap_at = time.perf_counter()
+        previous, self.current_version = self.current_version, version
+        del old, new
+        gc.collect()
+        rss_after = rss_mb()
+        entry = {
+            "version": version,
+            "previous": previous,
+            "load_ms": 1000.0 * load_sec,
+            "validate_ms": 1000.0 * validate_sec,
+            "reload_ms": 1000.0 * (swap_at - t0),
+            "rss_before_mb": rss0,
+            "rss_overlap_mb": rss_overlap,
+            "rss_peak_mb": peak,
+            "rss_after_mb": rss_after,
+            "probe": report,
+        }
+        self.history.append(entry)
+        print(
+            f"MODEL SWAP {previous} -> {version}: load={entry['load_ms']:.0f}ms validate={entry['validate_ms']:.0f}ms "
+            f"total={entry['reload_ms']:.0f}ms | rss before={rss0:.0f}MB overlap={rss_overlap:.0f}MB "
+            f"(+{rss_overlap - rss0:.0f}MB) peak={peak:.0f}MB after={rss_after:.0f}MB | probe={report}"
+        )
+        return True
@@ -0,0 +1,373 @@
+"""
+Replay / load-test sc_worker tanpa Firebase.
+
+Menjalankan sc_worker dengan storage backend "memory" (sc_store.MemoryBackend)
+lalu mensimulasikan N device ESP32: tiap device push payload berbentuk
+`pushToFirebase` (IRIS_Program.ino) ke /devices/{id}/telemetry dan /state,
+dengan data dari CSV ala dummy_tomato_sensor_dataset_7days_10min.csv
+(timestamp + kolom sensor training). Jam worker diganti jam simulasi
+(`--speed` detik simulasi per detik nyata), jadi data berhari-hari bisa
+diputar dalam hitungan menit.
+
+    python sc_replay.py --devices 50 --speed 600 --duration 60 --mode fleet
+    python sc_replay.py --csv dummy_tomato_sensor_dataset_7days_10min.csv --devices 10 --mode async
+
+Tanpa --csv dipakai deret sintetis harian. Laporan di akhir: decision/detik,
+latency end-to-end (state ditulis -> keputusan diterapkan) p50/p95/p99,
+CPU & RSS per device.
+
+Dengan --fake-db worker memakai backend "rest" (sc_transport, pool koneksi
+HTTP) ke sc_fakedb.FakeRTDBServer lokal yang bisa menyuntikkan latency,
+error dan outage; device simulasi tetap menulis langsung ke store server.
+
+    python sc_replay.py --devices 20 --mode fleet --fake-db --latency-ms 30 --error-rate 0.05 \
+        --outage-at 10 --outage-sec 15
+"""
+import argparse
+import csv
+import os
+import random
+import resource
+import sys
+import threading
+import time
+from datetime import datetime
+
+os.environ["SC_STORAGE_BACKEND"] = "memory"
+# checkpoint state (sc_state) hanya jika diminta eksplisit: store memori selalu mulai kosong
+os.environ.setdefault("SC_STATE_PATH", "")
+
+import numpy as np
+
+SENSOR_COLS = ["air_humidity_pct", "soil_moisture_pct", "air_temperature_c", "light_intensity_lux", "uv_index"]
+
+# kalibrasi IRIS_Program.ino (untuk membalik persen -> nilai mentah)
+WET_ADC = 2920
+DRY_ADC = 4095
+UV_ADC_FS_MV = 1100.0
+UV_BASE_mV = 50.0
+UV_FULLSUN_mV = 900.0
+UVI_FULLSUN = 10.0
+
+
+# =========================
+# DATA
+# =========================
+def load_csv(path: str) -> tuple:
+    """Return (ts_sec array, values array (n, 5) urutan SENSOR_COLS)."""
+    ts, rows = [], []
+    with open(path, newline="") as f:
+        for r in csv.DictReader(f):
+            try:
+                t = datetime.fromisoformat(str(r["timestamp"]).strip()).timestamp()
+                rows.append([float(r[c]) for c in SENSOR_COLS])
+                ts.append(t)
+            except (KeyError, ValueError):
+                continue
+    if not ts:
+        raise ValueError(f"CSV tidak punya baris valid (timestamp + {SENSOR_COLS}): {path}")
+    order = np.argsort(ts)
+    return np.asarray(ts, dtype=np.float64)[order], np.asarray(rows, dtype=np.float64)[order]
+
+
+def synthetic_series(days: int = 7, step_sec: int = 600, seed: int = 0) -> tuple:
+    """Deret harian sintetis: suhu/cahaya/UV ikut matahari, soil turun pelan lalu disiram."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(0, days * 86400, step_sec, dtype=np.float64)
+    day = np.clip(np.sin(2 * np.pi * ((t / 3600.0) % 24 - 6) / 24), 0, None)
+    temp = 22 + 9 * day + rng.normal(0, 0.5, len(t))
+    hum = 80 - 25 * day + rng.normal(0, 2, len(t))
+    lux = 1000 * day + rng.normal(0, 20, len(t)).clip(0)
+    uv = 9 * day ** 2
+    soil = 70 - (t % (2 * 86400)) / (2 * 86400) * 45 + rng.normal(0, 1, len(t))
+    values = np.column_stack([hum, soil, temp, lux, uv])
+    return t + (time.time() // 86400) * 86400 - days * 86400, values
+
+
+def esp32_payload(values, ts_ms: int, pump: bool) -> dict:
+    """Satu push sesuai pushToFirebase() di IRIS_Program.ino."""
+    hum, soil, temp, lux, uvi = (float(v) for v in values)
+    pct_soil = int(min(100, max(0, round(soil))))
+    adc = int(round(DRY_ADC - pct_soil * (DRY_ADC - WET_ADC) / 100.0))
+    ldr_pct = int(min(100, max(0, round(lux / 10.0))))
+    uv_present = uvi > 0
+    uv_mv = UV_BASE_mV + min(uvi, UVI_FULLSUN) / UVI_FULLSUN * (UV_FULLSUN_mV - UV_BASE_mV) if uv_present else 0.0
+    return {
+        "soil": {"adc": adc, "percent": pct_soil},
+        "env": {"tempC": round(temp, 2), "humRH": round(hum, 2)},
+        "light": {"percent": ldr_pct},
+        "uv": {
+            "raw": int(uv_mv * 4095.0 / UV_ADC_FS_MV),
+            "mV": round(uv_mv, 1),
+            "uvi": round(uvi, 2),
+            "status": "OK" if uv_present else "N/A",
+            "present": uv_present,
+        },
+        "pump": {"on": bool(pump)},
+        "control": {"mode": "auto", "power": True},
+        "ts": int(ts_ms),
+    }
+
+
+# =========================
+# SIMULASI
+# =========================
+class SimClock:
+    def __init__(self, start_sec: float, speed: float):
+        self.start = float(start_sec)
+        self.speed = float(speed)
+        self.wall0 = time.time()
+
+    def __call__(self) -> float:
+        return self.start + (time.time() - self.wall0) * self.speed
+
+
+class SimDevice:
+    def __init__(self, device_id: str, ts: np.ndarray, values: np.ndarray, offset: int, push_sec: float):
+        self.device_id = device_id
+        self.ts = ts
+        self.values = values
+        self.offset = offset
+        self.push_sec = push_sec
+        self.span = float(ts[-1] - ts[0]) + (ts[1] - ts[0] if len(ts) > 1 else push_sec)
+
+    def values_at(self, sim_sec: float):
+        """Nilai CSV untuk waktu simulasi (data diputar ulang, tiap device mulai di offset berbeda)."""
+        rel = (sim_sec - self.ts[0] + self.offset * (self.ts[1] - self.ts[0])) % self.span
+        i = int(np.searchsorted(self.ts - self.ts[0], rel, side="right")) - 1
+        return self.values[max(0, i)]
+
+
+class Recorder:
+    """Waktu tulis state per (device, ts) -> latency saat keputusan untuk state itu diterapkan."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.written = {}
+        self.latency_ms = []
+        self.decisions = 0
+        self.forecasts = 0
+        self.pushes = 0
+        self.dropped = 0
+
+    def state_written(self, device_id: str, ts_ms: int):
+        with self._lock:
+            self.written[(device_id, ts_ms)] = time.perf_counter()
+            self.pushes += 1
+
+    def decided(self, device_id: str, ts_ms):
+        with self._lock:
+            t = self.written.pop((device_id, ts_ms), None)
+            if t is not None:
+                self.decisions += 1
+                self.latency_ms.append(1000.0 * (time.perf_counter() - t))
+
+
+def instrument(sc, rec: Recorder):
+    prepare, apply, apply_fc = sc.DeviceWorker.prepare_decision, sc.DeviceWorker.apply_decision, sc.DeviceWorker.apply_forecast
+
+    def prepare_decision(self, controls, state, now):
+        pending = prepare(self, controls, state, now)
+        if pending is not None:
+            pending["replay_ts"] = state.get("ts")
+        return pending
+
+    def apply_decision(self, pending, pred_row=None):
+        apply(self, pending, pred_row)
+        rec.decided(self.device_id, pending.get("replay_ts"))
+
+    def apply_forecast(self, pending, y_pred):
+        apply_fc(self, pending, y_pred)
+        rec.forecasts += 1
+
+    sc.DeviceWorker.prepare_decision = prepare_decision
+    sc.DeviceWorker.apply_decision = apply_decision
+    sc.DeviceWorker.apply_forecast = apply_forecast
+
+
+def seed_history(store, devices: list, clock, hours: float):
+    """Isi /telemetry + /state awal tanpa event (seperti device yang sudah lama jalan)."""
+    now = clock()
+    for d in devices:
+        tel = {}
+        n = int(hours * 3600 / d.push_sec)
+        for i in range(n, 0, -1):
+            t = now - i * d.push_sec
+            tel[store.push_key() + f"{i:08d}"] = esp32_payload(d.values_at(t), int(t * 1000), False)
+        last = esp32_payload(d.values_at(now), int(now * 1000), False)
+        store.reference(f"/devices/{d.device_id}").set({
+            "telemetry": tel,
+            "state": last,
+            "controls": {"mode": "auto", "power": True},
+        })
+
+
+def feeder(store, devices: list, clock, rec: Recorder, stop: threading.Event, cpu: dict):
+    next_push = {d.device_id: clock() for d in devices}
+    refs = {d.device_id: store.reference(f"/devices/{d.device_id}") for d in devices}
+    t_cpu = time.thread_time()
+    while not stop.is_set():
+        now = clock()
+        for d in devices:
+            due = next_push[d.device_id]
+            if due > now:
+                continue
+            # tertinggal jauh (CPU penuh): lewati push lama, jangan menumpuk
+            missed = int((now - due) // d.push_sec)
+            if missed > 0:
+                rec.dropped += missed
+                due += missed * d.push_sec
+            ts_ms = int(due * 1000)
+            ref = refs[d.device_id]
+            pump = bool((ref.child("controls/pump_auto").get()) or False)
+            payload = esp32_payload(d.values_at(due), ts_ms, pump)
+            ref.child("telemetry").push(payload)
+            ref.child("state").set(payload)
+            rec.state_written(d.device_id, ts_ms)
+            next_push[d.device_id] = due + d.push_sec
+        time.sleep(0.002)
+    cpu["feeder"] = time.thread_time() - t_cpu
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def cpu_sec() -> float:
+    r = resource.getrusage(resource.RUSAGE_SELF)
+    return r.ru_utime + r.ru_stime
+
+
+def start_workers(sc, mode: str, device_ids: list):
+    threads = []
+    if mode == "fleet":
+        sc.FLEET_DEVICE_IDS = list(device_ids)
+        threads.append(threading.Thread(target=sc.run_fleet, daemon=True))
+    elif mode == "async":
+        workers = [sc.DeviceWorker(d) for d in device_ids]
+        threads.append(threading.Thread(target=sc.run_async, args=(workers,), daemon=True))
+    elif mode in ("polling", "stream"):
+        run = sc.run_polling if mode == "polling" else sc.run_streaming
+        for d in device_ids:
+            threads.append(threading.Thread(target=run, args=(sc.DeviceWorker(d),), daemon=True))
+    else:
+        raise ValueError(f"mode tidak dikenal: {mode}")
+    for t in threads:
+        t.start()
+    return threads
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--csv", default=None, help="CSV timestamp + kolom sensor training (default: deret sintetis)")
+    ap.add_argument("--devices", type=int, default=10)
+    ap.add_argument("--mode", default="fleet", choices=["fleet", "async", "polling", "stream"])
+    ap.add_argument("--speed", type=float, default=60.0, help="detik simulasi per detik nyata")
+    ap.add_argument("--duration", type=float, default=30.0, help="lama replay (detik nyata)")
+    ap.add_argument("--push-sec", type=float, default=60.0, help="interval push device (detik simulasi)")
+    ap.add_argument("--history-hours", type=float, default=7.0, help="telemetry awal per device")
+    ap.add_argument("--loop-sec", type=float, default=0.2, help="LOOP_SEC worker (detik nyata)")
+    ap.add_argument("--engine", default=None, choices=["model", "rules", "hybrid"])
+    ap.add_argument("--reload-sec", type=float, default=None,
+                    help="poll registry model (SC_MODEL_REGISTRY) tiap N detik nyata selama replay")
+    ap.add_argument("--quiet", action="store_true", help="sembunyikan print worker selama replay")
+    ap.add_argument("--fake-db", action="store_true", help="worker lewat REST ke fake server lokal (sc_fakedb)")
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="--fake-db: latency per request")
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0, help="--fake-db: fraksi request dijawab 503")
+    ap.add_argument("--timeout-rate", type=float, default=0.0, help="--fake-db: fraksi request yang menggantung")
+    ap.add_argument("--outage-at", type=float, default=None, help="--fake-db: mulai outage (detik nyata)")
+    ap.add_argument("--outage-sec", type=float, default=10.0)
+    args = ap.parse_args()
+    if args.fake_db and args.mode == "stream":
+        ap.error("--fake-db tidak mendukung mode stream (RestBackend tanpa listen)")
+
+    ts, values = load_csv(args.csv) if args.csv else synthetic_series()
+    clock = SimClock(time.time(), args.speed)
+    devices = [
+        SimDevice(f"sim-{i:04d}", ts, values, offset=random.Random(i).randrange(len(ts)), push_sec=args.push_sec)
+        for i in range(args.devices)
+    ]
+
+    server = None
+    if args.fake_db:
+        from sc_fakedb import FakeRTDBServer
+        server = FakeRTDBServer(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                                timeout_rate=args.timeout_rate, hang_sec=10.0).start()
+        os.environ["SC_STORAGE_BACKEND"] = "rest"
+        os.environ["SC_DB_URL"] = server.url
+
+    rss0 = rss_mb()
+    import sc_worker as sc
+    rss_loaded = rss_mb()
+
+    sc.clock = clock
+    sc.LOOP_SEC = args.loop_sec
+    sc.TELEMETRY_PUSH_SEC = args.push_sec
+    if args.engine:
+        sc.DECISION_ENGINE = args.engine
+    if args.reload_sec is not None:
+        sc.MODEL_RELOAD_POLL_SEC = args.reload_sec
+    rec = Recorder()
+    instrument(sc, rec)
+
+    # device simulasi menulis langsung ke store (tanpa gangguan jaringan)
+    store = server.store if server is not None else sc.backend
+    seed_history(store, devices, clock, args.history_hours)
+
+    stop = threading.Event()
+    cpu = {}
+    feed = threading.Thread(target=feeder, args=(store, devices, clock, rec, stop, cpu), daemon=True)
+
+    # worker (thread daemon) tetap jalan sampai proses selesai; laporan selalu ke stdout asli
+    out = sys.stdout
+    if args.quiet:
+        sys.stdout = open(os.devnull, "w")
+    cpu0, wall0, sim0 = cpu_sec(), time.time(), clock()
+    start_workers(sc, args.mode, [d.device_id for d in devices])
+    reloader = sc.start_model_reloader()
+    feed.start()
+    if server is not None and args.outage_at is not None:
+        outage = threading.Timer(args.outage_at, server.outage, args=(args.outage_sec,))
+        outage.daemon = True
+        outage.start()
+    time.sleep(args.duration)
+    stop.set()
+    feed.join()
+    wall = time.time() - wall0
+    cpu_total = cpu_sec() - cpu0
+    cpu_worker = cpu_total - cpu.get("feeder", 0.0)
+    rss_end = rss_mb()
+
+    n = max(1, args.devices)
+    lat = np.asarray(rec.latency_ms, dtype=float)
+    print(f"REPLAY mode={args.mode} devices={args.devices} speed={args.speed:g}x wall={wall:.1f}s "
+          f"sim={(clock() - sim0) / 3600.0:.1f}h engine={sc.DECISION_ENGINE}", file=out)
+    print(f"pushes={rec.pushes} dropped={rec.dropped} decisions={rec.decisions} "
+          f"({rec.decisions / wall:.1f}/s) forecasts={rec.forecasts} ({rec.forecasts / wall:.1f}/s)", file=out)
+    if len(lat):
+        p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+        print(f"latency state->decision p50={p50:.1f}ms p95={p95:.1f}ms p99={p99:.1f}ms max={lat.max():.1f}ms", file=out)
+    print(f"cpu worker={cpu_worker:.2f}s ({100.0 * cpu_worker / wall:.0f}% of 1 core) "
+          f"= {1000.0 * cpu_worker / wall / n:.1f}ms/s per device | feeder={cpu.get('feeder', 0.0):.2f}s", file=out)
+    print(f"rss start={rss0:.0f}MB models={rss_loaded:.0f}MB end={rss_end:.0f}MB "
+          f"= {(rss_end - rss_loaded) / n:.2f}MB per device", file=out)
+    print(f"store reads={store.reads} writes={store.writes}", file=out)
+    print("forecast cache:", sc.forecast_cache.summary(), file=out)
+    print("transport:", sc.backend.summary(), file=out)
+    if server is not None:
+        print("fake db:", server.stats(), file=out)
+    for h in (reloader.history if reloader else []):
+        print(f"model swap {h['previous']} -> {h['version']}: reload={h['reload_ms']:.0f}ms "
+              f"rss overlap=+{h['rss_overlap_mb'] - h['rss_before_mb']:.0f}MB peak={h['rss_peak_mb']:.0f}MB", file=out)
+    for stage, m in sorted(sc.metrics.snapshot()["stages"].items()):
+        print(f"  stage {stage:<18} n={m['count']:<7} p50={m.get('p50_ms', 0):7.2f}ms "
+              f"p95={m.get('p95_ms', 0):7.2f}ms p99={m.get('p99_ms', 0):7.2f}ms", file=out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Resampler telemetry ke bin STEP_MINUTES, inkremental.
+
+Forecaster dilatih pada baris tepat 10 menit (FREQ_MINUTES di iris_model.py),
+sedangkan ESP32 push ke /telemetry tiap ~5 detik. StepResampler memasukkan
+tiap titik (timestamp server "ts") ke bin waktu tetap dalam O(1):
+akumulator bin yang sedang terbuka di-update, dan saat titik pertama bin
+berikutnya datang, bin lama ditutup ke ring buffer `steps` bin.
+
+Agregasi bin : "mean" | "last" | "first" | "max" | "min"
+Gap-fill     : "ffill"  = bin kosong diisi nilai bin sebelumnya
+               "linear" = interpolasi linear antara bin sebelum dan sesudah gap
+                          (gap di ujung window, sampai waktu sekarang, di-ffill)
+               "none"   = bin kosong dilewati (window = bin terisi terakhir)
+
+Window hanya berisi bin yang SUDAH lengkap (berakhir sebelum bin waktu
+sekarang), jadi isinya berubah paling cepat sekali per step.
+"""
+import math
+from datetime import datetime
+
+import numpy as np
+
+AGGREGATIONS = ("mean", "last", "first", "max", "min")
+FILL_POLICIES = ("ffill", "linear", "none")
+
+
+class StepResampler:
+    def __init__(self, step_sec: float, steps: int, n_values: int, agg: str = "mean", fill: str = "ffill"):
+        if agg not in AGGREGATIONS:
+            raise ValueError(f"Agregasi tidak dikenal: {agg!r} (pilih {AGGREGATIONS})")
+        if fill not in FILL_POLICIES:
+            raise ValueError(f"Gap-fill tidak dikenal: {fill!r} (pilih {FILL_POLICIES})")
+        self.step_sec = float(step_sec)
+        self.n_values = int(n_values)
+        self.agg = agg
+        self.fill = fill
+        self.steps = max(1, int(steps))
+        self.points = 0
+        self.late = 0
+        self.filled = 0
+        self.reset()
+
+    # ---------- state ----------
+    def reset(self):
+        self.bins = np.empty((self.steps, self.n_values), dtype=np.float64)
+        self.bin_ids = np.empty(self.steps, dtype=np.int64)
+        self.count = 0
+        self.head = 0
+        self.open_id = None
+        self._acc = np.zeros(self.n_values, dtype=np.float64)
+        self._acc_n = 0
+
+    def resize(self, steps: int):
+        """Ubah jumlah bin yang disimpan (bin terbaru dipertahankan)."""
+        steps = max(1, int(steps))
+        if steps == self.steps:
+            return
+        ids, vals = self._closed(steps)
+        open_id, acc, acc_n = self.open_id, self._acc, self._acc_n
+        self.steps = steps
+        self.reset()
+        for b, v in zip(ids.tolist(), vals):
+            self._push(b, v)
+        self.open_id, self._acc, self._acc_n = open_id, acc, acc_n
+
+    def _push(self, bin_id: int, values):
+        self.bins[self.head] = values
+        self.bin_ids[self.head] = bin_id
+        self.head = (self.head + 1) % self.steps
+        self.count = min(self.count + 1, self.steps)
+
+    def _closed(self, n: int):
+        k = min(int(n), self.count)
+        idx = (self.head - k + np.arange(k)) % self.steps
+        return self.bin_ids[idx], self.bins[idx]
+
+    # ---------- input ----------
+    def _accumulate(self, values):
+        v = np.asarray(values, dtype=np.float64)
+        if self._acc_n == 0 or self.agg == "last":
+            self._acc[:] = v
+        elif self.agg == "mean":
+            self._acc += v
+        elif self.agg == "max":
+            np.maximum(self._acc, v, out=self._acc)
+        elif self.agg == "min":
+            np.minimum(self._acc, v, out=self._acc)
+        # "first": biarkan nilai pertama
+        self._acc_n += 1
+
+    def _open_value(self) -> np.ndarray:
+        if self.agg == "mean":
+            return self._acc / max(1, self._acc_n)
+        return self._acc.copy()
+
+    def _gap_rows(self, prev_id: int, prev, next_id: int, nxt):
+        """Bin di antara prev_id dan next_id (eksklusif), maksimal `steps` terakhir."""
+        gap = next_id - prev_id - 1
+        if gap <= 0 or self.fill == "none":
+            return
+        for b in range(max(prev_id + 1, next_id - self.steps), next_id):
+            if self.fill == "linear" and nxt is not None:
+                w = (b - prev_id) / (next_id - prev_id)
+                yield b, prev + (nxt - prev) * w
+            else:
+                yield b, prev
+
+    def _close_open(self):
+        value = self._open_value()
+        if self.count:
+            last = (self.head - 1) % self.steps
+            for b, v in self._gap_rows(int(self.bin_ids[last]), self.bins[last].copy(), self.open_id, value):
+                self._push(b, v)
+                self.filled += 1
+        self._push(self.open_id, value)
+        self._acc_n = 0
+
+    def add(self, ts_sec: float, values) -> bool:
+        """Masukkan satu titik. Return False jika titik terlambat (bin-nya sudah ditutup)."""
+        b = int(math.floor(ts_sec / self.step_sec))
+        if self.open_id is not None and b != self.open_id:
+            if b < self.open_id:
+                self.late += 1
+                return False
+            self._close_open()
+        self.open_id = b
+        self._accumulate(values)
+        self.points += 1
+        return True
+
+    # ---------- output ----------
+    def window(self, n: int, now_sec: float):
+        """
+        Return (values (k, n_values), end_bin_id) berisi <= n bin lengkap
+        terakhir sebelum bin waktu `now_sec`. end_bin_id None jika kosong.
+        """
+        now_bin = int(math.floor(now_sec / self.step_sec))
+        ids, vals = self._closed(self.steps)
+        ids, vals = list(ids.tolist()), list(vals)
+        if self.open_id is not None and self._acc_n and self.open_id < now_bin:
+            value = self._open_value()
+            if ids:
+                for b, v in self._gap_rows(ids[-1], vals[-1], self.open_id, value):
+                    ids.append(b)
+                    vals.append(v)
+            ids.append(self.open_id)
+            vals.append(value)
+        if not ids:
+            return np.empty((0, self.n_values), dtype=np.float64), None
+        # device diam: isi sampai bin sebelum sekarang (linear tidak punya titik ujung -> ffill)
+        if self.fill != "none" and ids[-1] < now_bin - 1:
+            for b, v in self._gap_rows(ids[-1], vals[-1], now_bin, None):
+                ids.append(b)
+                vals.append(v)
+        vals = vals[-int(n):]
+        return np.asarray(vals, dtype=np.float64).reshape(-1, self.n_values), ids[-1]
+
+    def bin_hours(self, end_bin_id: int, n: int, tz=None) -> np.ndarray:
+        """Jam lokal awal bin untuk n bin berurutan yang berakhir di end_bin_id."""
+        start = (end_bin_id - np.arange(n - 1, -1, -1, dtype=np.int64)) * self.step_sec
+        offset = 0.0
+        if tz is not None:
+            offset = datetime.fromtimestamp(float(start[-1]), tz).utcoffset().total_seconds()
+        return ((start + offset) // 3600 % 24).astype(np.int64)
+
+    # ---------- checkpoint ----------
+    def snapshot(self) -> tuple:
+        """(meta, arrays) bin tertutup + akumulator bin terbuka (untuk sc_state)."""
+        ids, vals = self._closed(self.steps)
+        meta = {"step_sec": self.step_sec, "steps": self.steps, "n_values": self.n_values, "agg": self.agg,
+                "open_id": self.open_id, "acc_n": self._acc_n}
+        return meta, {"bin_ids": ids, "bins": vals, "acc": self._acc.copy()}
+
+    def restore(self, meta: dict, arrays: dict) -> bool:
+        """Pulihkan dari snapshot(); False (state tidak diubah) jika step/agregasi berbeda."""
+        if (float(meta.get("step_sec", 0)) != self.step_sec or meta.get("agg") != self.agg
+                or int(meta.get("n_values", 0)) != self.n_values):
+            return False
+        self.steps = max(1, int(meta["steps"]))
+        self.reset()
+        for b, v in zip(arrays["bin_ids"].tolist()[-self.steps:], arrays["bins"][-self.steps:]):
+            self._push(b, v)
+        self.open_id = meta.get("open_id")
+        self._acc[:] = arrays["acc"]
+        self._acc_n = int(meta.get("acc_n", 0))
+        return True
+
+    def summary(self) -> dict:
+        return {"points": self.points, "bins": self.count, "late": self.late, "filled": self.filled}
@@ -0,0 +1,120 @@
+"""
+Checkpoint state runtime sc_worker ke file lokal (SQLite, mode WAL).
+
+Satu baris per device: blob npz berisi array window telemetry (titik mentah
+atau bin resampler) + JSON skalar (last_pump, last_forecast_ts, key telemetry
+terakhir, nilai output yang terakhir ditulis). Saat start, semua baris dibaca
+dengan satu SELECT, jadi worker langsung punya window penuh dan keputusan
+pompa terakhir; query telemetry berikutnya hanya mengambil key setelah
+checkpoint (start_at last_key), bukan seed ulang seluruh window.
+
+Checkpoint ditulis oleh thread worker pemilik state (tanpa lock di sisi
+worker); koneksi SQLite dipakai bersama dengan lock internal.
+"""
+import io
+import json
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+SCHEMA_VERSION = 1
+_META = "__meta__"
+
+
+def encode_state(meta: dict, arrays: dict | None = None) -> bytes:
+    buf = io.BytesIO()
+    payload = {k: np.asarray(v) for k, v in (arrays or {}).items()}
+    payload[_META] = np.frombuffer(json.dumps(meta, separators=(",", ":"), default=str).encode("utf-8"), dtype=np.uint8)
+    np.savez(buf, **payload)
+    return buf.getvalue()
+
+
+def decode_state(blob: bytes) -> tuple:
+    """Return (meta, arrays)."""
+    with np.load(io.BytesIO(blob), allow_pickle=False) as data:
+        arrays = {k: data[k] for k in data.files if k != _META}
+        meta = json.loads(data[_META].tobytes().decode("utf-8"))
+    return meta, arrays
+
+
+class StateStore:
+    def __init__(self, path: str, max_age_sec: float = 0.0):
+        self.path = str(path)
+        self.max_age_sec = float(max_age_sec)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS device_state ("
+            "device_id TEXT PRIMARY KEY, schema INTEGER NOT NULL, saved_ts REAL NOT NULL, blob BLOB NOT NULL)"
+        )
+        self._cache = None
+        self.saves = 0
+        self.bytes_written = 0
+        self.load_ms = 0.0
+
+    def load_all(self) -> dict:
+        """{device_id: (saved_ts, meta, arrays)}; dibaca sekali lalu di-cache."""
+        if self._cache is not None:
+            return self._cache
+        t0 = time.perf_counter()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT device_id, saved_ts, blob FROM device_state WHERE schema = ?", (SCHEMA_VERSION,)
+            ).fetchall()
+        now = time.time()
+        out = {}
+        for device_id, saved_ts, blob in rows:
+            if self.max_age_sec > 0 and now - saved_ts > self.max_age_sec:
+                continue
+            try:
+                meta, arrays = decode_state(blob)
+            except (ValueError, OSError) as e:
+                print(f"STATE [{device_id}] checkpoint rusak, diabaikan:", repr(e))
+                continue
+            out[device_id] = (saved_ts, meta, arrays)
+        self._cache = out
+        self.load_ms = 1000.0 * (time.perf_counter() - t0)
+        return out
+
+    def get(self, device_id: str):
+        """(meta, arrays) checkpoint device, atau None. Sekali pakai: state berikutnya milik worker."""
+        entry = self.load_all().pop(device_id, None)
+        return None if entry is None else entry[1:]
+
+    def save_many(self, items: list):
+        """items: [(device_id, meta, arrays)] -> satu transaksi."""
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        for device_id, meta, arrays in items:
+            blob = encode_state(meta, arrays)
+            self.bytes_written += len(blob)
+            rows.append((device_id, SCHEMA_VERSION, now, blob))
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany("INSERT OR REPLACE INTO device_state VALUES (?, ?, ?, ?)", rows)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        self.saves += len(rows)
+
+    def save(self, device_id: str, meta: dict, arrays: dict | None = None):
+        self.save_many([(device_id, meta, arrays or {})])
+
+    def delete(self, device_id: str):
+        with self._lock:
+            self._db.execute("DELETE FROM device_state WHERE device_id = ?", (device_id,))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def summary(self) -> dict:
+        return {"saves": self.saves, "bytes_written": self.bytes_written, "load_ms": round(self.load_ms, 2)}
@@ -0,0 +1,319 @@
+"""
+Storage backend sc_worker.
+
+Worker hanya memakai subset API `firebase_admin.db.Reference`:
+child / get(shallow) / set / update (multi-path) / push / delete /
+order_by_key().start_at().limit_to_last().get() / listen. Backend memberi
+`reference(path)` yang mengembalikan objek dengan API itu:
+
+  - FirebaseBackend : firebase_admin asli (butuh service account)
+  - RestBackend     : endpoint REST RTDB lewat pool koneksi keep-alive
+                      (sc_transport), juga untuk fake server sc_fakedb
+  - MemoryBackend   : tree /devices/{id}/state|controls|telemetry|ai di memori,
+                      untuk replay / load-test / test tanpa jaringan
+
+Pilih lewat env SC_STORAGE_BACKEND ("firebase" | "rest" | "memory").
+"""
+import copy
+import random
+import threading
+import time
+
+PUSH_CHARS = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+
+
+def _split_path(path: str) -> list:
+    return [p for p in str(path or "/").split("/") if p]
+
+
+def _join(parts: list) -> str:
+    return "/" + "/".join(parts)
+
+
+def _key_order(k):
+    # urutan order_by_key RTDB: key integer (urut angka) dulu, lalu string leksikografis
+    k = str(k)
+    if k.isdigit() and (k == "0" or not k.startswith("0")):
+        return (0, int(k), "")
+    return (1, 0, k)
+
+
+def _prune(value):
+    """Semantik RTDB: None / dict kosong = node tidak ada."""
+    if isinstance(value, dict):
+        out = {}
+        for k, v in value.items():
+            v = _prune(v)
+            if v is not None:
+                out[str(k)] = v
+        return out or None
+    return copy.deepcopy(value)
+
+
+class FirebaseBackend:
+    name = "firebase"
+
+    def __init__(self, service_account_path, db_url: str, timeout: float | None = None):
+        import firebase_admin
+        from firebase_admin import credentials, db
+
+        cred = credentials.Certificate(str(service_account_path))
+        if not firebase_admin._apps:
+            options = {"databaseURL": db_url}
+            if timeout:
+                # timeout per request HTTP (detik); default firebase_admin tanpa batas
+                options["httpTimeout"] = float(timeout)
+            firebase_admin.initialize_app(cred, options)
+        self.db = db
+
+    def reference(self, path: str = "/"):
+        return self.db.reference(path)
+
+
+class MemoryEvent:
+    def __init__(self, event_type: str, path: str, data):
+        self.event_type = event_type
+        self.path = path
+        self.data = data
+
+
+class MemoryRegistration:
+    def __init__(self, backend, entry):
+        self._backend = backend
+        self._entry = entry
+
+    def close(self):
+        with self._backend._lock:
+            if self._entry in self._backend._listeners:
+                self._backend._listeners.remove(self._entry)
+
+
+class MemoryBackend:
+    """
+    RTDB di memori (thread-safe). Nilai disalin saat set/get seperti lewat
+    jaringan, jadi pemanggil tidak bisa mengubah tree tanpa sengaja.
+    """
+
+    name = "memory"
+
+    def __init__(self, data: dict | None = None):
+        self._lock = threading.RLock()
+        self._root = _prune(data) or {}
+        self._listeners = []
+        self._last_push_ms = 0
+        self._push_rand = [0] * 12
+        self.reads = 0
+        self.writes = 0
+
+    def reference(self, path: str = "/"):
+        return MemoryRef(self, _split_path(path))
+
+    # ---------- tree ----------
+    def _node(self, parts: list):
+        node = self._root
+        for p in parts:
+            if not isinstance(node, dict) or p not in node:
+                return None
+            node = node[p]
+        return node
+
+    def _write(self, parts: list, value):
+        value = _prune(value)
+        if not parts:
+            self._root = value or {}
+            return
+        node = self._root
+        trail = []
+        for p in parts[:-1]:
+            child = node.get(p)
+            if not isinstance(child, dict):
+                if value is None:
+                    return
+                child = node[p] = {}
+            trail.append((node, p))
+            node = child
+        if value is None:
+            node.pop(parts[-1], None)
+        else:
+            node[parts[-1]] = value
+        # hapus parent yang jadi kosong
+        for parent, key in reversed(trail):
+            if parent[key]:
+                break
+            parent.pop(key)
+
+    def get(self, parts: list, shallow: bool = False):
+        with self._lock:
+            self.reads += 1
+            node = self._node(parts)
+            if shallow and isinstance(node, dict):
+                return {k: True for k in node}
+            return copy.deepcopy(node)
+
+    def set(self, parts: list, value):
+        with self._lock:
+            self.writes += 1
+            self._write(parts, value)
+            events = self._events(parts, "put", value, [parts])
+        self._notify(events)
+
+    def update(self, parts: list, values: dict):
+        with self._lock:
+            self.writes += 1
+            written = []
+            for k, v in values.items():
+                written.append(parts + _split_path(k))
+                self._write(written[-1], v)
+            events = self._events(parts, "patch", values, written)
+        self._notify(events)
+
+    def push_key(self) -> str:
+        """Key kronologis ala Firebase push id (8 char waktu + 12 char urutan)."""
+        with self._lock:
+            now = int(time.time() * 1000)
+            if now == self._last_push_ms:
+                i = 11
+                while i >= 0 and self._push_rand[i] == 63:
+                    self._push_rand[i] = 0
+                    i -= 1
+                self._push_rand[i] += 1
+            else:
+                self._last_push_ms = now
+                self._push_rand = [random.randrange(64) for _ in range(12)]
+            ts_chars = []
+            for _ in range(8):
+                ts_chars.append(PUSH_CHARS[now % 64])
+                now //= 64
+            return "".join(reversed(ts_chars)) + "".join(PUSH_CHARS[i] for i in self._push_rand)
+
+    # ---------- listen ----------
+    def listen(self, parts: list, callback):
+        entry = (tuple(parts), callback)
+        with self._lock:
+            self._listeners.append(entry)
+            initial = MemoryEvent("put", "/", copy.deepcopy(self._node(parts)))
+        callback(initial)
+        return MemoryRegistration(self, entry)
+
+    def _events(self, parts: list, event_type: str, data, written: list) -> list:
+        out = []
+        for lparts, cb in self._listeners:
+            m = len(lparts)
+            if tuple(parts[:m]) == lparts:
+                # tulisan di dalam node yang di-listen
+                out.append((cb, MemoryEvent(event_type, _join(parts[m:]), copy.deepcopy(data))))
+            elif any(tuple(w[:m]) == lparts or lparts[:len(w)] == tuple(w) for w in written):
+                # tulisan di atas node yang di-listen dan menyentuh subtree-nya -> kirim ulang snapshot
+                out.append((cb, MemoryEvent("put", "/", copy.deepcopy(self._node(list(lparts))))))
+        return out
+
+    @staticmethod
+    def _notify(events: list):
+        for cb, ev in events:
+            try:
+                cb(ev)
+            except Exception as e:
+                print("Listener error:", repr(e))
+
+
+class MemoryQuery:
+    def __init__(self, ref):
+        self.ref = ref
+        self._start = None
+        self._end = None
+        self._first = None
+        self._last = None
+
+    def start_at(self, key):
+        self._start = str(key)
+        return self
+
+    def end_at(self, key):
+        self._end = str(key)
+        return self
+
+    def limit_to_first(self, n: int):
+        self._first = int(n)
+        return self
+
+    def limit_to_last(self, n: int):
+        self._last = int(n)
+        return self
+
+    def get(self):
+        backend = self.ref.backend
+        with backend._lock:
+            backend.reads += 1
+            node = backend._node(self.ref.parts)
+            if not isinstance(node, dict):
+                return copy.deepcopy(node)
+            keys = sorted(node, key=_key_order)
+            if self._start is not None:
+                start = _key_order(self._start)
+                keys = [k for k in keys if _key_order(k) >= start]
+            if self._end is not None:
+                end = _key_order(self._end)
+                keys = [k for k in keys if _key_order(k) <= end]
+            if self._first is not None:
+                keys = keys[:self._first]
+            if self._last is not None:
+                keys = keys[-self._last:] if self._last > 0 else []
+            return {k: copy.deepcopy(node[k]) for k in keys}
+
+
+class MemoryRef:
+    def __init__(self, backend: MemoryBackend, parts: list):
+        self.backend = backend
+        self.parts = list(parts)
+
+    @property
+    def key(self):
+        return self.parts[-1] if self.parts else None
+
+    @property
+    def path(self) -> str:
+        return _join(self.parts)
+
+    def child(self, path: str):
+        return MemoryRef(self.backend, self.parts + _split_path(path))
+
+    def get(self, shallow: bool = False):
+        return self.backend.get(self.parts, shallow=shallow)
+
+    def set(self, value):
+        self.backend.set(self.parts, value)
+
+    def update(self, value: dict):
+        self.backend.update(self.parts, value)
+
+    def delete(self):
+        self.backend.set(self.parts, None)
+
+    def push(self, value=None):
+        ref = self.child(self.backend.push_key())
+        if value is not None:
+            ref.set(value)
+        return ref
+
+    def order_by_key(self):
+        return MemoryQuery(self)
+
+    def listen(self, callback):
+        return self.backend.listen(self.parts, callback)
+
+
+def open_backend(name: str, service_account_path=None, db_url: str = "", **options):
+    """options: timeout (firebase); pool_size, read_timeout, write_timeout (rest)."""
+    if name == "memory":
+        return MemoryBackend()
+    if name == "firebase":
+        return FirebaseBackend(service_account_path, db_url, timeout=options.get("timeout"))
+    if name == "rest":
+        from sc_transport import RestBackend
+        return RestBackend(
+            db_url, service_account_path,
+            pool_size=options.get("pool_size", 4),
+            read_timeout=options.get("read_timeout", 5.0),
+            write_timeout=options.get("write_timeout", 10.0),
+        )
+    raise ValueError(f"Storage backend tidak dikenal: {name!r} (pilih 'firebase', 'rest' atau 'memory')")
@@ -0,0 +1,582 @@
+"""
+Lapisan transport RTDB untuk sc_worker: retry + backoff, circuit breaker,
+dan client REST dengan pool koneksi keep-alive.
+
+ResilientBackend membungkus backend sc_store mana pun (firebase / rest /
+memory) dengan API ref yang sama. Tiap get/set/update/query:
+
+  - error transient (timeout, koneksi putus, HTTP 408/429/5xx, kode
+    UNAVAILABLE/DEADLINE_EXCEEDED firebase_admin) di-retry dengan
+    exponential backoff + jitter, dalam batas `call_budget_sec` per call;
+    push (POST, tidak idempoten) tidak di-retry
+  - retry habis -> BackendUnavailable dan satu kegagalan dicatat di breaker
+  - `failure_threshold` call gagal berturut-turut -> breaker open: call
+    berikutnya langsung BackendUnavailable tanpa menyentuh jaringan selama
+    `reset_sec`, lalu satu call probe (half-open) menentukan close / open
+    lagi (reset_sec berlipat sampai `max_reset_sec`)
+
+Selama breaker tidak closed (`backend.degraded`), worker memakai snapshot
+controls/state terakhir, label rule threshold, dan menunda forecast serta
+tulisan (lihat sc_worker).
+
+RestBackend berbicara langsung ke endpoint REST RTDB (`<path>.json`) lewat
+http.client dengan pool koneksi keep-alive (tanpa dependency baru) dan
+timeout per call, sehingga reuse koneksi terlihat di pool_stats(). Tidak ada
+listen (stream SSE): sc_worker menolak STREAM_MODE dengan backend "rest". Token
+OAuth2 diambil dari service account lewat firebase_admin.credentials dan
+di-cache sampai mendekati kedaluwarsa.
+"""
+import http.client
+import json
+import os
+import queue
+import random
+import socket
+import threading
+import time
+from urllib.parse import quote, urlencode, urlsplit
+
+TRANSIENT_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+# kode firebase_admin.exceptions.FirebaseError yang layak di-retry
+TRANSIENT_CODES = frozenset({"UNAVAILABLE", "DEADLINE_EXCEEDED", "INTERNAL", "UNKNOWN", "RESOURCE_EXHAUSTED"})
+
+
+class TransportError(Exception):
+    def __init__(self, message: str, status: int | None = None, transient: bool | None = None):
+        super().__init__(message)
+        self.status = status
+        self.transient = (status is None or status in TRANSIENT_STATUS) if transient is None else transient
+
+
+class BackendUnavailable(TransportError):
+    """Breaker open, atau call gagal setelah semua retry."""
+
+    def __init__(self, message: str, status: int | None = None):
+        super().__init__(message, status=status, transient=False)
+
+
+def is_transient(exc: BaseException) -> bool:
+    if isinstance(exc, TransportError):
+        return exc.transient
+    if isinstance(exc, (ConnectionError, TimeoutError, socket.gaierror, http.client.HTTPException)):
+        return True
+    code = getattr(exc, "code", None)
+    if isinstance(code, str) and code.upper() in TRANSIENT_CODES:
+        return True
+    response = getattr(exc, "http_response", None)
+    return getattr(response, "status_code", None) in TRANSIENT_STATUS
+
+
+# =========================
+# BACKOFF / BREAKER
+# =========================
+class Backoff:
+    """
+    Exponential backoff dengan equal jitter: delay ke-n acak di [d/2, d],
+    d = min(cap, base * factor**n). Jitter mencegah banyak worker / device
+    me-retry serentak setelah gangguan yang sama.
+    """
+
+    def __init__(self, base_sec: float = 0.2, cap_sec: float = 30.0, factor: float = 2.0, rng=None):
+        self.base_sec = float(base_sec)
+        self.cap_sec = float(cap_sec)
+        self.factor = float(factor)
+        self.rng = rng or random.Random()
+        self.attempt = 0
+
+    def delay(self, attempt: int) -> float:
+        d = min(self.cap_sec, self.base_sec * self.factor ** max(0, attempt))
+        return d / 2.0 + self.rng.uniform(0.0, d / 2.0)
+
+    def next_delay(self) -> float:
+        """Delay berikutnya untuk loop yang gagal berulang (state di objek ini)."""
+        d = self.delay(self.attempt)
+        self.attempt += 1
+        return d
+
+    def reset(self):
+        self.attempt = 0
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_sec: float = 5.0, max_reset_sec: float = 60.0,
+                 on_change=None, clock=time.monotonic):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.base_reset_sec = float(reset_sec)
+        self.max_reset_sec = max(float(max_reset_sec), self.base_reset_sec)
+        self.reset_sec = self.base_reset_sec
+        self.on_change = on_change
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self.opens = 0
+        self.rejected = 0
+
+    @property
+    def degraded(self) -> bool:
+        return self.state != self.CLOSED
+
+    def allow(self) -> bool:
+        """True jika call boleh dikirim. Saat half-open hanya satu probe yang lolos."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_sec:
+                changed = self._set(self.HALF_OPEN)
+                self._probing = True
+            elif self.state == self.HALF_OPEN and not self._probing:
+                changed = None
+                self._probing = True
+            else:
+                self.rejected += 1
+                return False
+        self._notify(changed)
+        return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            changed = None
+            if self.state != self.CLOSED:
+                self.reset_sec = self.base_reset_sec
+                changed = self._set(self.CLOSED)
+        self._notify(changed)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            changed = None
+            if self.state == self.HALF_OPEN:
+                # probe gagal -> tunggu lebih lama sebelum probe berikutnya
+                self.reset_sec = min(self.max_reset_sec, self.reset_sec * 2.0)
+                changed = self._open()
+            elif self.state == self.CLOSED and self.failures >= self.failure_threshold:
+                changed = self._open()
+        self._notify(changed)
+
+    def _open(self):
+        self.opened_at = self.clock()
+        self.opens += 1
+        return self._set(self.OPEN)
+
+    def _set(self, state: str):
+        old, self.state = self.state, state
+        return (old, state)
+
+    def _notify(self, changed):
+        if changed and self.on_change is not None:
+            try:
+                self.on_change(*changed)
+            except Exception as e:
+                print("Breaker callback error:", repr(e))
+
+    def summary(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "opens": self.opens,
+            "rejected": self.rejected,
+            "reset_sec": self.reset_sec,
+        }
+
+
+# =========================
+# RESILIENT WRAPPER
+# =========================
+class ResilientBackend:
+    """Bungkus backend sc_store; atribut lain (reads, writes, push_key, ...) diteruskan ke backend asli."""
+
+    def __init__(self, inner, breaker: CircuitBreaker | None = None, retries: int = 2,
+                 backoff: Backoff | None = None, call_budget_sec: float = 10.0, metrics=None,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.inner = inner
+        self.breaker = breaker or CircuitBreaker()
+        self.retries = max(0, int(retries))
+        self.backoff = backoff or Backoff(0.2, 2.0)
+        self.call_budget_sec = float(call_budget_sec)
+        self.metrics = metrics
+        self.clock = clock
+        self.sleep = sleep
+        self.calls = 0
+        self.failed = 0
+        self.retried = 0
+        self.last_report = time.time()
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    @property
+    def degraded(self) -> bool:
+        return self.breaker.degraded
+
+    def reference(self, path: str = "/"):
+        return ResilientRef(self, self.inner.reference(path))
+
+    def _count(self, op: str, outcome: str):
+        if self.metrics is not None:
+            self.metrics.inc("transport_calls", op=op, outcome=outcome)
+
+    def call(self, op: str, fn, *args, retry: bool = True, **kwargs):
+        if not self.breaker.allow():
+            self._count(op, "rejected")
+            raise BackendUnavailable(f"RTDB {op}: circuit breaker {self.breaker.state}")
+        self.calls += 1
+        deadline = self.clock() + self.call_budget_sec
+        attempt = 0
+        while True:
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if not is_transient(e):
+                    # server menjawab (mis. 401/400): koneksi sehat, error diteruskan apa adanya
+                    self.breaker.record_success()
+                    self._count(op, "error")
+                    raise
+                delay = self.backoff.delay(attempt)
+                # probe half-open tidak di-retry: satu kegagalan cukup untuk open lagi
+                if (not retry or attempt >= self.retries or self.breaker.state != CircuitBreaker.CLOSED
+                        or self.clock() + delay > deadline):
+                    self.failed += 1
+                    self.breaker.record_failure()
+                    self._count(op, "unavailable")
+                    raise BackendUnavailable(f"RTDB {op} gagal setelah {attempt + 1} percobaan: {e!r}",
+                                             status=getattr(e, "status", None)) from e
+                attempt += 1
+                self.retried += 1
+                if self.metrics is not None:
+                    self.metrics.inc("retries", kind="transport")
+                self.sleep(delay)
+                continue
+            self.breaker.record_success()
+            self._count(op, "ok")
+            return result
+
+    def summary(self) -> dict:
+        out = {"backend": getattr(self.inner, "name", type(self.inner).__name__), "calls": self.calls,
+               "retried": self.retried, "failed": self.failed, "breaker": self.breaker.summary()}
+        pool_stats = getattr(self.inner, "pool_stats", None)
+        if pool_stats is not None:
+            out["pool"] = pool_stats()
+        return out
+
+    def report(self):
+        print("TRANSPORT:", self.summary())
+
+    def maybe_report(self, interval_sec: float):
+        if interval_sec > 0 and time.time() - self.last_report >= interval_sec:
+            self.report()
+            self.last_report = time.time()
+
+
+class ResilientQuery:
+    def __init__(self, backend: ResilientBackend, query):
+        self._backend = backend
+        self._query = query
+
+    def start_at(self, key):
+        self._query = self._query.start_at(key)
+        return self
+
+    def end_at(self, key):
+        self._query = self._query.end_at(key)
+        return self
+
+    def limit_to_first(self, n: int):
+        self._query = self._query.limit_to_first(n)
+        return self
+
+    def limit_to_last(self, n: int):
+        self._query = self._query.limit_to_last(n)
+        return self
+
+    def get(self):
+        return self._backend.call("query", self._query.get)
+
+
+class ResilientRef:
+    def __init__(self, backend: ResilientBackend, ref):
+        self._backend = backend
+        self._ref = ref
+
+    def __getattr__(self, name):
+        # key, path, parts, ...
+        return getattr(self._ref, name)
+
+    def child(self, path: str):
+        return ResilientRef(self._backend, self._ref.child(path))
+
+    def get(self, shallow: bool = False):
+        if shallow:
+            return self._backend.call("get", self._ref.get, shallow=True)
+        return self._backend.call("get", self._ref.get)
+
+    def set(self, value):
+        self._backend.call("set", self._ref.set, value)
+
+    def update(self, value: dict):
+        self._backend.call("update", self._ref.update, value)
+
+    def delete(self):
+        self._backend.call("delete", self._ref.delete)
+
+    def push(self, value=None):
+        # POST tidak idempoten: retry bisa membuat dua child
+        if value is None:
+            ref = self._backend.call("push", self._ref.push, retry=False)
+        else:
+            ref = self._backend.call("push", self._ref.push, value, retry=False)
+        return ResilientRef(self._backend, ref)
+
+    def order_by_key(self):
+        return ResilientQuery(self._backend, self._ref.order_by_key())
+
+    def listen(self, callback):
+        # listener streaming punya reconnect sendiri (firebase_admin)
+        return self._ref.listen(callback)
+
+
+# =========================
+# REST CLIENT
+# =========================
+class ConnectionPool:
+    """
+    Pool koneksi http.client keep-alive ke satu host. Koneksi idle disimpan
+    LIFO (yang paling baru dipakai paling mungkin masih hidup), maksimal
+    `size`; jika pool kosong dibuat koneksi baru (tidak pernah memblok).
+    """
+
+    STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine, BrokenPipeError,
+                    ConnectionResetError, ConnectionAbortedError)
+    IDEMPOTENT = frozenset({"GET", "PUT", "PATCH", "DELETE"})
+
+    def __init__(self, base_url: str, size: int = 4):
+        u = urlsplit(base_url)
+        if u.scheme not in ("http", "https"):
+            raise ValueError(f"URL RTDB tidak valid: {base_url!r}")
+        self.scheme = u.scheme
+        self.host = u.hostname
+        self.port = u.port
+        self.size = max(1, int(size))
+        self._idle = queue.LifoQueue(maxsize=self.size)
+        self._lock = threading.Lock()
+        self.created = 0
+        self.requests = 0
+        self.reused = 0
+        self.stale_retries = 0
+        self.discarded = 0
+
+    def _new(self, timeout: float):
+        cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        with self._lock:
+            self.created += 1
+        return cls(self.host, self.port, timeout=timeout)
+
+    def _acquire(self, timeout: float) -> tuple:
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            return self._new(timeout), False
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, True
+
+    def _release(self, conn, reusable: bool):
+        if reusable:
+            try:
+                self._idle.put_nowait(conn)
+                return
+            except queue.Full:
+                pass
+        with self._lock:
+            self.discarded += 1
+        conn.close()
+
+    def request(self, method: str, url: str, body: bytes | None, headers: dict, timeout: float) -> tuple:
+        """Return (status, body bytes). Koneksi reuse yang ternyata sudah ditutup server dicoba sekali lagi."""
+        conn, reused = self._acquire(timeout)
+        with self._lock:
+            self.requests += 1
+            self.reused += reused
+        try:
+            return self._send(conn, method, url, body, headers)
+        except self.STALE_ERRORS:
+            if not reused or method not in self.IDEMPOTENT:
+                raise
+            with self._lock:
+                self.stale_retries += 1
+            return self._send(self._new(timeout), method, url, body, headers)
+
+    def _send(self, conn, method: str, url: str, body, headers: dict) -> tuple:
+        try:
+            conn.request(method, url, body=body, headers=headers)
+            resp = conn.getresponse()
+            # body harus dibaca habis agar koneksi bisa dipakai ulang
+            data = resp.read()
+        except BaseException:
+            conn.close()
+            raise
+        self._release(conn, not resp.will_close)
+        return resp.status, data
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def stats(self) -> dict:
+        return {
+            "created": self.created,
+            "requests": self.requests,
+            "reused": self.reused,
+            "reuse_rate": self.reused / max(1, self.requests),
+            "stale_retries": self.stale_retries,
+            "discarded": self.discarded,
+            "idle": self._idle.qsize(),
+        }
+
+
+def _parts(path: str) -> list:
+    return [p for p in str(path or "/").split("/") if p]
+
+
+class RestBackend:
+    name = "rest"
+
+    TOKEN_REFRESH_MARGIN_SEC = 300
+
+    def __init__(self, db_url: str, service_account_path=None, pool_size: int = 4,
+                 read_timeout: float = 5.0, write_timeout: float = 10.0):
+        self.db_url = db_url.rstrip("/")
+        self.pool = ConnectionPool(self.db_url, pool_size)
+        self.read_timeout = float(read_timeout)
+        self.write_timeout = float(write_timeout)
+        self._cred = None
+        # http:// (fake server sc_fakedb / emulator) atau tanpa service account -> tanpa auth
+        if self.pool.scheme == "https" and service_account_path is not None \
+                and os.path.exists(str(service_account_path)):
+            from firebase_admin import credentials
+            self._cred = credentials.Certificate(str(service_account_path))
+        self._token = None
+        self._token_exp = 0.0
+        self._token_lock = threading.Lock()
+        self.reads = 0
+        self.writes = 0
+
+    def reference(self, path: str = "/"):
+        return RestRef(self, _parts(path))
+
+    def _auth_header(self) -> dict:
+        if self._cred is None:
+            return {}
+        with self._token_lock:
+            if self._token is None or time.time() >= self._token_exp - self.TOKEN_REFRESH_MARGIN_SEC:
+                info = self._cred.get_access_token()
+                self._token = info.access_token
+                self._token_exp = info.expiry.timestamp() if info.expiry else time.time() + 3600
+            return {"Authorization": f"Bearer {self._token}"}
+
+    def request(self, method: str, parts: list, params: dict | None = None, value=None, has_body: bool = False):
+        path = "/" + "/".join(quote(p, safe="") for p in parts) + ".json"
+        if params:
+            path += "?" + urlencode(params)
+        headers = {"Accept": "application/json", **self._auth_header()}
+        body = None
+        if has_body:
+            body = json.dumps(value, separators=(",", ":")).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        timeout = self.read_timeout if method == "GET" else self.write_timeout
+        status, data = self.pool.request(method, path, body, headers, timeout)
+        if method == "GET":
+            self.reads += 1
+        else:
+            self.writes += 1
+        if status >= 400:
+            try:
+                detail = json.loads(data or b"null")
+                detail = detail.get("error", detail) if isinstance(detail, dict) else detail
+            except ValueError:
+                detail = data[:200]
+            raise TransportError(f"RTDB {method} {'/'.join(parts) or '/'}: HTTP {status} {detail}", status=status)
+        if status == 204 or not data:
+            return None
+        return json.loads(data)
+
+    def pool_stats(self) -> dict:
+        return self.pool.stats()
+
+    def close(self):
+        self.pool.close()
+
+
+class RestQuery:
+    def __init__(self, ref):
+        self.ref = ref
+        self._params = {"orderBy": '"$key"'}
+
+    def start_at(self, key):
+        self._params["startAt"] = json.dumps(str(key))
+        return self
+
+    def end_at(self, key):
+        self._params["endAt"] = json.dumps(str(key))
+        return self
+
+    def limit_to_first(self, n: int):
+        self._params["limitToFirst"] = int(n)
+        return self
+
+    def limit_to_last(self, n: int):
+        self._params["limitToLast"] = int(n)
+        return self
+
+    def get(self):
+        return self.ref.backend.request("GET", self.ref.parts, self._params)
+
+
+class RestRef:
+    def __init__(self, backend: RestBackend, parts: list):
+        self.backend = backend
+        self.parts = list(parts)
+
+    @property
+    def key(self):
+        return self.parts[-1] if self.parts else None
+
+    @property
+    def path(self) -> str:
+        return "/" + "/".join(self.parts)
+
+    def child(self, path: str):
+        return RestRef(self.backend, self.parts + _parts(path))
+
+    def get(self, shallow: bool = False):
+        return self.backend.request("GET", self.parts, {"shallow": "true"} if shallow else None)
+
+    def set(self, value):
+        self.backend.request("PUT", self.parts, {"print": "silent"}, value, has_body=True)
+
+    def update(self, value: dict):
+        self.backend.request("PATCH", self.parts, {"print": "silent"}, value, has_body=True)
+
+    def delete(self):
+        self.backend.request("DELETE", self.parts, {"print": "silent"})
+
+    def push(self, value=None):
+        # POST null -> RTDB hanya membuat key (tanpa menulis data)
+        res = self.backend.request("POST", self.parts, None, value, has_body=True)
+        return self.child(res["name"])
+
+    def order_by_key(self):
+        return RestQuery(self)
@@ -1,32 +1,181 @@
+from __future__ import annotations
+
+import asyncio
+import atexit
+import os
+import signal
+import sys
 import time
-from datetime import datetime, timedelta
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait as futures_wait
+from contextlib import contextmanager
+from datetime import datetime
 from pathlib import Path
 import warnings
 
-import pytz
-import joblib
-import pandas as pd
+# =========================
+# STARTUP TIMING
+# =========================
+class StartupTimer:
+    """Catat durasi tiap fase startup sampai keputusan pertama (time-to-first-decision)."""
 
-import firebase_admin
-from firebase_admin import credentials, db
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.phases = []
+        self.reported = False
+
+    @contextmanager
+    def phase(self, name: str):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - t))
+
+    def report(self, label: str = "first_decision"):
+        if self.reported:
+            return
+        self.reported = True
+        total_ms = 1000.0 * (time.perf_counter() - self.t0)
+        parts = " | ".join(f"{n}={1000.0 * sec:.0f}ms" for n, sec in self.phases)
+        rss = ""
+        try:
+            import resource
+            rss = f" | maxrss={resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0:.0f}MB"
+        except Exception:
+            pass
+        print(f"STARTUP: {parts} | {label} @ {total_ms:.0f}ms{rss}")
+
+startup = StartupTimer()
+
+with startup.phase("import"):
+    import pytz
+    import joblib
+    import numpy as np
+
+    from iris_forest import CompiledForest
+    from iris_labels import ambiguous_labels, rule_labels
+    from sc_async import AsyncWriter, run_io
+    from sc_batch import BatchStats, predict_batch
+    from sc_cache import PredictionCache
+    from sc_features import N_ROW_VALUES, FeaturePlan, SequencePlan, row_values, state_values, values_to_row
+    from sc_feed import FirebaseChangeFeed
+    from sc_metrics import Metrics
+    from sc_output import OutputStage
+    from sc_registry import ModelReloader, latest_version, load_probe, read_manifest
+    from sc_resample import StepResampler
+    from sc_state import StateStore
+    from sc_store import open_backend
+    from sc_transport import Backoff, BackendUnavailable, CircuitBreaker, ResilientBackend
 
 # =========================
 # KONFIG
 # ==========================
 DEVICE_ID = "esp32-iris-01"
 
-DB_URL = "https://smart-iris-default-rtdb.firebaseio.com"
+# "firebase" = RTDB asli (firebase_admin); "rest" = RTDB lewat pool HTTP sc_transport (juga untuk
+# fake server sc_fakedb); "memory" = stand-in di memori (replay / load-test, lihat sc_replay.py)
+STORAGE_BACKEND = os.environ.get("SC_STORAGE_BACKEND", "firebase")
+
+DB_URL = os.environ.get("SC_DB_URL", "https://smart-iris-default-rtdb.firebaseio.com")
 # jika console Anda pakai firebaseio.com, ganti ke:
 # DB_URL = "https://smart-iris-default-rtdb.firebaseioio.com"
 
+# transport RTDB (sc_transport). "rest" = pool koneksi keep-alive sendiri; timeout juga dipakai "firebase"
+TRANSPORT_POOL_SIZE = 16              # >= thread I/O paralel (ASYNC_IO_THREADS, FLEET_IO_THREADS)
+TRANSPORT_READ_TIMEOUT_SEC = 5.0
+TRANSPORT_WRITE_TIMEOUT_SEC = 10.0
+TRANSPORT_RETRIES = 2                # retry per call untuk error transient (timeout, 5xx, 429)
+TRANSPORT_BACKOFF_BASE_SEC = 0.2     # exponential backoff + jitter antar retry
+TRANSPORT_BACKOFF_CAP_SEC = 2.0
+TRANSPORT_CALL_BUDGET_SEC = 8.0      # total waktu satu call termasuk retry
+TRANSPORT_STATS_SEC = 300
+# circuit breaker: N call gagal berturut-turut -> open (call langsung ditolak) selama
+# RESET detik, lalu satu probe; probe gagal -> RESET berlipat sampai MAX_RESET
+BREAKER_FAILURES = 5
+BREAKER_RESET_SEC = 5.0
+BREAKER_MAX_RESET_SEC = 60.0
+# loop yang error: jeda exponential + jitter (bukan sleep tetap)
+LOOP_BACKOFF_BASE_SEC = 1.0
+LOOP_BACKOFF_CAP_SEC = 60.0
+# selama backend tidak tersedia: keputusan dari controls/state terakhir (maks umur ini)
+# dengan engine ini; forecast ditunda, tulisan menumpuk di OutputStage sampai pulih
+DEGRADED_MAX_STATE_AGE_SEC = 120
+DEGRADED_DECISION_ENGINE = "rules"
+
 TZ = pytz.timezone("Asia/Makassar")
 
 LOOP_SEC = 1
 FORECAST_INTERVAL_SEC = 10
 STEP_MINUTES = 10
 
+# mode streaming: pakai listener RTDB, bukan polling tiap LOOP_SEC
+STREAM_MODE = False
+STREAM_COALESCE_SEC = 0.2
+
+# mode async: read RTDB paralel, predict di executor, write fire-and-forget
+ASYNC_MODE = False
+ASYNC_IO_THREADS = 8
+ASYNC_CPU_THREADS = 1
+ASYNC_MAX_IN_FLIGHT_WRITES = 8
+ASYNC_STATS_SEC = 300
+
+# mode fleet: satu proses melayani banyak device di /devices
+FLEET_MODE = False
+FLEET_DEVICE_IDS = []          # kosong = discover otomatis dari key /devices
+FLEET_DISCOVERY_SEC = 60
+FLEET_MAX_FORECASTS_PER_TICK = 4
+# batas waktu gather per tick; makin besar -> batch makin besar, latency makin tinggi
+FLEET_BATCH_DEADLINE_SEC = 0.5
+# read /controls + /state semua device dikirim bersamaan di pool ini (latency RTDB ~50-150ms per GET)
+FLEET_IO_THREADS = 16
+FLEET_STATS_SEC = 60
+
 SOIL_IRRIGATE_THRESHOLD = 60.0
 
+# window forecast dari telemetry di-resample ke bin STEP_MINUTES berdasarkan "ts" server
+# (sesuai data training); False = pakai titik mentah terakhir seperti sebelumnya
+TELEMETRY_RESAMPLE = True
+TELEMETRY_AGG = "mean"           # mean | last | first | max | min
+TELEMETRY_GAP_FILL = "ffill"     # ffill | linear | none
+# interval push ESP32 (FIREBASE_POST_MS di IRIS_Program.ino), untuk ukuran seed query
+TELEMETRY_PUSH_SEC = 5
+
+# sumber label keputusan:
+#   "model"  = selalu decision_model.predict (perilaku lama)
+#   "rules"  = selalu label threshold (tanpa model)
+#   "hybrid" = label threshold, model hanya dipanggil jika ada nilai di pita ambigu dekat batas bin
+DECISION_ENGINE = "model"
+AMBIGUITY_BANDS = {
+    "label_suhu": 0.5,
+    "label_rh": 1.0,
+    "label_soil": 1.0,
+    "label_lux": 10.0,
+    "label_uv": 0.2,
+}
+DECISION_STATS_SEC = 300
+
+# cache hasil forecast per window input (LRU, dipakai bersama semua device); 0 = nonaktif
+FORECAST_CACHE_SIZE = 1024
+# nilai window dibulatkan ke kelipatan ini sebelum di-hash
+FORECAST_CACHE_QUANTUM = 0.01
+FORECAST_CACHE_STATS_SEC = 300
+
+# output stage: perubahan angka <= OUTPUT_TOLERANCE tidak ditulis ulang;
+# node yang tidak berubah tetap ditulis ulang tiap OUTPUT_HEARTBEAT_SEC (refresh ts)
+OUTPUT_TOLERANCE = 0.5
+OUTPUT_HEARTBEAT_SEC = 300
+
+# instrumentasi per stage (sc_metrics): p50/p95/p99 dari METRICS_WINDOW sampel terakhir per stage
+METRICS_ENABLED = True
+METRICS_WINDOW = 1024
+METRICS_PORT = int(os.environ.get("SC_METRICS_PORT", "0"))        # >0 = endpoint /metrics (Prometheus)
+METRICS_SNAPSHOT_SEC = 300                                        # snapshot JSON berkala (0 = nonaktif)
+METRICS_SNAPSHOT_PATH = os.environ.get("SC_METRICS_SNAPSHOT", "")  # kosong = print ke log
+METRICS_DEVICE_NODE = False                                       # ringkasan per device ke /devices/{id}/ai/metrics
+METRICS_DEVICE_NODE_SEC = 60
+
 # mapping label legacy -> aksi pompa (jika model Anda mengeluarkan label seperti ini)
 LABEL_MAP = {
     "kurang_air": True,
@@ -39,6 +188,8 @@ LABEL_MAP = {
 }
 
 warnings.filterwarnings("ignore", message="X has feature names, but .* was fitted without feature names")
+# buffer fitur berupa ndarray; urutan kolom sudah dijamin oleh feature plan
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
 
 # =========================
 # PATH FILE
@@ -49,6 +200,33 @@ SERVICE_ACCOUNT_PATH = BASE_DIR / "serviceAccountKey.json"
 DECISION_MODEL_PATH = BASE_DIR / "2tomato_decision_multilabel_model.joblib"
 FORECAST_MODEL_PATH = BASE_DIR / "2tomato_forecast_model.joblib"
 
+# hasil export_compiled() dari iris_model.py (flat array, jauh lebih cepat di-load & predict)
+USE_COMPILED_MODELS = True
+DECISION_COMPILED_PATH = BASE_DIR / "2tomato_decision_multilabel_model.compiled.joblib"
+FORECAST_COMPILED_PATH = BASE_DIR / "2tomato_forecast_model.compiled.joblib"
+# array node model terkompilasi di-mmap (read-only, dibagi lewat page cache antar proses)
+MODEL_MMAP = True
+
+# registry model (sc_registry): satu subdirektori per versi; jika ada versi, dipakai
+# menggantikan file di BASE_DIR dan versi baru di-hot-swap tanpa restart
+MODEL_REGISTRY_DIR = Path(os.environ.get("SC_MODEL_REGISTRY", str(BASE_DIR / "models")))
+MODEL_PINNED_VERSION = os.environ.get("SC_MODEL_VERSION", "")   # kosong = versi terbaru
+MODEL_RELOAD_POLL_SEC = 30                                      # 0 = reloader nonaktif
+# validasi versi baru sebelum swap (probe.npz dari notebook, atau probe rule jika tidak ada)
+MODEL_PROBE_MIN_ACC = 0.9          # rata-rata akurasi label decision minimal
+MODEL_PROBE_MAX_MAE = 10.0         # MAE forecast maksimal (soil %), jika probe punya forecast_y
+MODEL_PROBE_MAX_REGRESSION = 0.02  # akurasi boleh turun maksimal segini dibanding model aktif
+MODEL_PROBE_ROWS = 256             # jumlah baris probe rule bawaan
+
+# checkpoint state per device (sc_state, SQLite): window telemetry, last_pump,
+# last_forecast_ts, output terakhir. Restart melanjutkan dari sini lalu hanya
+# mengambil telemetry setelah checkpoint. SC_STATE_PATH kosong = nonaktif.
+STATE_PATH = os.environ.get("SC_STATE_PATH", str(BASE_DIR / "sc_state.sqlite"))
+STATE_CHECKPOINT_SEC = 30
+STATE_MAX_AGE_SEC = 24 * 3600      # checkpoint lebih tua diabaikan (cold start)
+# dtype buffer fitur ("float32" cukup untuk pohon sklearn, yang membandingkan split dalam float32)
+FEATURE_DTYPE = "float64"
+
 # versi kolom ala device (ESP32)
 FEATURES_5 = ["soil_percent", "tempC", "humRH", "light_percent", "uv_uvi"]
 FEATURES_6 = FEATURES_5 + ["hour"]
@@ -61,159 +239,243 @@ MODEL_FEATURES_6 = MODEL_FEATURES_5 + ["hour"]
 # DEBUG START
 # =========================
 def debug_start():
-    import os
     print("=== SC WORKER START ===")
     print("CWD              :", os.getcwd())
     print("BASE_DIR         :", str(BASE_DIR))
     print("SERVICE_ACCOUNT  :", str(SERVICE_ACCOUNT_PATH), "| exists =", SERVICE_ACCOUNT_PATH.exists())
     print("DECISION_MODEL   :", str(DECISION_MODEL_PATH), "| exists =", DECISION_MODEL_PATH.exists())
     print("FORECAST_MODEL   :", str(FORECAST_MODEL_PATH), "| exists =", FORECAST_MODEL_PATH.exists())
+    print("DECISION_COMPILED:", str(DECISION_COMPILED_PATH), "| exists =", DECISION_COMPILED_PATH.exists())
+    print("FORECAST_COMPILED:", str(FORECAST_COMPILED_PATH), "| exists =", FORECAST_COMPILED_PATH.exists())
+    print("MODEL_REGISTRY   :", str(MODEL_REGISTRY_DIR), "| exists =", MODEL_REGISTRY_DIR.exists())
+    print("STORAGE_BACKEND  :", STORAGE_BACKEND)
     print("DB_URL           :", DB_URL)
     print("DEVICE_ID        :", DEVICE_ID)
     print("=======================")
 
 debug_start()
 
-if not SERVICE_ACCOUNT_PATH.exists():
+if STORAGE_BACKEND == "firebase" and not SERVICE_ACCOUNT_PATH.exists():
     raise FileNotFoundError(f"serviceAccountKey.json tidak ditemukan di: {SERVICE_ACCOUNT_PATH}")
-if not DECISION_MODEL_PATH.exists():
-    raise FileNotFoundError(f"Decision model tidak ditemukan di: {DECISION_MODEL_PATH}")
-if not FORECAST_MODEL_PATH.exists():
-    raise FileNotFoundError(f"Forecast model tidak ditemukan di: {FORECAST_MODEL_PATH}")
+# RestBackend tidak punya listen (stream SSE): gagal di sini, sebelum model & storage dimuat
+if STREAM_MODE and not (FLEET_MODE or ASYNC_MODE) and STORAGE_BACKEND == "rest":
+    raise ValueError("STREAM_MODE butuh listener RTDB, SC_STORAGE_BACKEND=rest tidak mendukungnya. "
+                     "Pakai SC_STORAGE_BACKEND=firebase atau mode polling/async/fleet.")
+
+def pick_model_path(sklearn_path: Path, compiled_path: Path) -> Path:
+    if USE_COMPILED_MODELS and compiled_path.exists():
+        return compiled_path
+    return sklearn_path
+
+def model_paths(model_dir: Path) -> tuple[Path, Path]:
+    """Path bundle decision & forecast di satu direktori (BASE_DIR atau versi registry)."""
+    return (
+        pick_model_path(model_dir / DECISION_MODEL_PATH.name, model_dir / DECISION_COMPILED_PATH.name),
+        pick_model_path(model_dir / FORECAST_MODEL_PATH.name, model_dir / FORECAST_COMPILED_PATH.name),
+    )
+
+MODEL_VERSION = latest_version(MODEL_REGISTRY_DIR, MODEL_PINNED_VERSION)
+if MODEL_PINNED_VERSION and MODEL_VERSION is None:
+    raise FileNotFoundError(f"Versi model {MODEL_PINNED_VERSION!r} tidak ada di registry: {MODEL_REGISTRY_DIR}")
+if MODEL_VERSION:
+    DECISION_LOAD_PATH, FORECAST_LOAD_PATH = model_paths(MODEL_REGISTRY_DIR / MODEL_VERSION)
+else:
+    MODEL_VERSION = "base"
+    DECISION_LOAD_PATH, FORECAST_LOAD_PATH = model_paths(BASE_DIR)
+
+if not DECISION_LOAD_PATH.exists():
+    raise FileNotFoundError(f"Decision model tidak ditemukan di: {DECISION_LOAD_PATH}")
+if not FORECAST_LOAD_PATH.exists():
+    raise FileNotFoundError(f"Forecast model tidak ditemukan di: {FORECAST_LOAD_PATH}")
 
 # =========================
-# INIT FIREBASE
+# INIT STORAGE
 # =========================
-cred = credentials.Certificate(str(SERVICE_ACCOUNT_PATH))
-if not firebase_admin._apps:
-    firebase_admin.initialize_app(cred, {"databaseURL": DB_URL})
+def init_storage():
+    """Buka storage backend (import + init firebase_admin); jalan di thread agar overlap dengan load model."""
+    with startup.phase(STORAGE_BACKEND):
+        inner = open_backend(
+            STORAGE_BACKEND, SERVICE_ACCOUNT_PATH, DB_URL,
+            timeout=TRANSPORT_WRITE_TIMEOUT_SEC, pool_size=TRANSPORT_POOL_SIZE,
+            read_timeout=TRANSPORT_READ_TIMEOUT_SEC, write_timeout=TRANSPORT_WRITE_TIMEOUT_SEC,
+        )
+    breaker = CircuitBreaker(BREAKER_FAILURES, BREAKER_RESET_SEC, BREAKER_MAX_RESET_SEC, on_change=_breaker_changed)
+    return ResilientBackend(
+        inner, breaker, retries=TRANSPORT_RETRIES,
+        backoff=Backoff(TRANSPORT_BACKOFF_BASE_SEC, TRANSPORT_BACKOFF_CAP_SEC),
+        call_budget_sec=TRANSPORT_CALL_BUDGET_SEC,
+    )
+
+def _breaker_changed(old: str, new: str):
+    print(f"TRANSPORT breaker {old} -> {new}" + (" (degraded: rule-only, forecast ditunda)" if new == "open" else ""))
+    if backend.metrics is not None:
+        backend.metrics.inc("breaker_transitions", state=new)
+
+_startup_pool = ThreadPoolExecutor(max_workers=1)
+_backend_future = _startup_pool.submit(init_storage)
 
 # =========================
 # LOAD MODELS (unwrap dict bundle)
 # =========================
 def unwrap_joblib(loaded_obj):
     """
-    Mendukung 2 format:
+    Mendukung 3 format:
       1) joblib berisi model langsung (punya .predict)
       2) joblib berisi dict bundle: {"model": ..., "sensor_cols": ..., "target_label_cols": ...}
+      3) bundle terkompilasi (iris_forest.export_compiled): {"compiled": {...}, "sensor_cols": ...}
     """
     if isinstance(loaded_obj, dict):
+        if "compiled" in loaded_obj:
+            return CompiledForest(loaded_obj["compiled"]), loaded_obj
         model = loaded_obj.get("model") or loaded_obj.get("estimator") or loaded_obj.get("pipeline")
         return model, loaded_obj
     return loaded_obj, {}
 
-_dec_loaded = joblib.load(str(DECISION_MODEL_PATH))
-decision_model, DEC_META = unwrap_joblib(_dec_loaded)
+def load_model_file(path: Path):
+    # mmap hanya untuk bundle terkompilasi (array numpy besar); pickle sklearn tetap load biasa
+    mmap_mode = "r" if MODEL_MMAP and path.name.endswith(".compiled.joblib") else None
+    return joblib.load(str(path), mmap_mode=mmap_mode)
+
+with startup.phase("load_decision"):
+    _dec_loaded = load_model_file(DECISION_LOAD_PATH)
+    decision_model, DEC_META = unwrap_joblib(_dec_loaded)
 
-_for_loaded = joblib.load(str(FORECAST_MODEL_PATH))
-forecast_model, FOR_META = unwrap_joblib(_for_loaded)
+with startup.phase("load_forecast"):
+    _for_loaded = load_model_file(FORECAST_LOAD_PATH)
+    forecast_model, FOR_META = unwrap_joblib(_for_loaded)
 
+print("MODEL_VERSION:", MODEL_VERSION)
 print("DECISION_MODEL type:", type(decision_model), "| meta keys:", list(DEC_META.keys()))
 print("FORECAST_MODEL type:", type(forecast_model), "| meta keys:", list(FOR_META.keys()))
 
-if decision_model is None or not hasattr(decision_model, "predict"):
-    raise TypeError("DECISION_MODEL tidak valid: tidak ada .predict() (cek isi joblib, pastikan ada key 'model').")
-if forecast_model is None or not hasattr(forecast_model, "predict"):
-    raise TypeError("FORECAST_MODEL tidak valid: tidak ada .predict() (cek isi joblib, pastikan ada key 'model').")
+def model_version(path: Path, meta: dict) -> str:
+    """Versi model untuk key cache: meta["version"] jika ada, kalau tidak nama + mtime + ukuran file."""
+    if meta.get("version"):
+        return str(meta["version"])
+    st = path.stat()
+    return f"{path.name}@{st.st_mtime_ns}:{st.st_size}"
+
+def check_models(decision, forecast):
+    if decision is None or not hasattr(decision, "predict"):
+        raise TypeError("DECISION_MODEL tidak valid: tidak ada .predict() (cek isi joblib, pastikan ada key 'model').")
+    if forecast is None or not hasattr(forecast, "predict"):
+        raise TypeError("FORECAST_MODEL tidak valid: tidak ada .predict() (cek isi joblib, pastikan ada key 'model').")
+
+check_models(decision_model, forecast_model)
+
+forecast_cache = PredictionCache(
+    "forecast",
+    maxsize=FORECAST_CACHE_SIZE,
+    quantum=FORECAST_CACHE_QUANTUM,
+    version=f"{MODEL_VERSION}/{model_version(FORECAST_LOAD_PATH, FOR_META)}",
+)
 
 # =========================
 # RTDB REFS
 # =========================
-base = db.reference(f"/devices/{DEVICE_ID}")
-ref_state = base.child("state")
-ref_controls = base.child("controls")
-ref_telemetry = base.child("telemetry")
+backend = _backend_future.result()
+_startup_pool.shutdown(wait=False)
+ref_devices = backend.reference("/devices")
+
+class DeviceRefs:
+    """Kumpulan ref RTDB untuk satu device: /devices/{device_id}/..."""
 
-ref_ai = base.child("ai")
-ref_ai_now = ref_ai.child("now")
-ref_ai_forecast = ref_ai.child("forecast")
+    def __init__(self, device_id: str):
+        self.base = ref_devices.child(device_id)
+        self.state = self.base.child("state")
+        self.controls = self.base.child("controls")
+        self.telemetry = self.base.child("telemetry")
+
+        self.ai = self.base.child("ai")
+        self.ai_now = self.ai.child("now")
+        self.ai_forecast = self.ai.child("forecast")
 
 # =========================
 # LABEL THRESHOLD (sesuai Flutter)
 # =========================
-def suhu_ket_tomat_indoor(t: float) -> str:
-    if t != t:
-        return "-"
-    if t < 13:
-        return "Dingin"
-    if t < 18:
-        return "Sejuk"
-    if t <= 27:
-        return "Optimal"
-    if t <= 30:
-        return "Hangat"
-    if t <= 33:
-        return "Panas"
-    return "Bahaya panas"
-
-def rh_ket_tomat_indoor(rh: float) -> str:
-    if rh != rh:
-        return "-"
-    if rh < 40:
-        return "Terlalu kering"
-    if rh < 55:
-        return "Agak kering"
-    if rh <= 75:
-        return "Optimal"
-    if rh <= 85:
-        return "Terlalu lembap"
-    return "Sangat lembap (risiko jamur)"
-
-def soil_ket_tomat_indoor(sm: float) -> str:
-    if sm != sm:
-        return "-"
-    if sm < 30:
-        return "Kering (butuh air)"
-    if sm < 40:
-        return "Agak kering"
-    if sm <= 70:
-        return "Optimal"
-    if sm <= 85:
-        return "Basah (kurangi air)"
-    return "Terlalu basah (risiko busuk akar)"
-
-def lux_ket(lux: float) -> str:
-    if lux != lux:
-        return "-"
-    if lux < 200:
-        return "Rendah"
-    if lux < 600:
-        return "Sedang"
-    if lux < 900:
-        return "Tinggi"
-    return "Sangat tinggi"
-
-def uv_ket(uv: float) -> str:
-    if uv != uv:
-        return "-"
-    if uv <= 2:
-        return "Rendah"
-    if uv <= 5:
-        return "Sedang"
-    if uv <= 7:
-        return "Tinggi"
-    if uv <= 10:
-        return "Sangat tinggi"
-    return "Ekstrem"
-
-def rule_labels_from_row(row: dict) -> dict:
-    t = float(row.get("tempC", float("nan")))
-    rh = float(row.get("humRH", float("nan")))
-    sm = float(row.get("soil_percent", float("nan")))
+def rule_inputs_from_row(row: dict) -> dict:
     # gunakan lux asli jika tersedia, fallback ke light_intensity_lux
-    lux = float(row.get("light_intensity_lux", row.get("light_percent", 0.0) * 10.0))
-    uv = float(row.get("uv_uvi", float("nan")))
+    lux = row.get("light_intensity_lux", row.get("light_percent", 0.0) * 10.0)
     return {
-        "label_suhu": suhu_ket_tomat_indoor(t),
-        "label_rh": rh_ket_tomat_indoor(rh),
-        "label_soil": soil_ket_tomat_indoor(sm),
-        "label_lux": lux_ket(lux),
-        "label_uv": uv_ket(uv),
+        "air_temperature_c": row.get("tempC", float("nan")),
+        "air_humidity_pct": row.get("humRH", float("nan")),
+        "soil_moisture_pct": row.get("soil_percent", float("nan")),
+        "light_intensity_lux": lux,
+        "uv_index": row.get("uv_uvi", float("nan")),
     }
 
+def rule_labels_from_row(row: dict) -> dict:
+    return rule_labels(rule_inputs_from_row(row))
+
+class DecisionStats:
+    """Berapa sering label dilayani rule vs model, dan seberapa sering keduanya berbeda."""
+
+    def __init__(self):
+        self.rule_served = 0
+        self.model_served = 0
+        self.compared = 0
+        self.disagree_rows = 0
+        self.disagree = {}
+        self.last_report = time.time()
+
+    def record_model(self, model_labels: dict, rule_lbls: dict):
+        self.model_served += 1
+        self.compared += 1
+        diff = [k for k, v in rule_lbls.items() if k in model_labels and model_labels[k] != v]
+        if diff:
+            self.disagree_rows += 1
+            for k in diff:
+                self.disagree[k] = self.disagree.get(k, 0) + 1
+
+    def report(self):
+        total = max(1, self.rule_served + self.model_served)
+        rate = self.disagree_rows / max(1, self.compared)
+        print(
+            f"DECISION STATS: rule={self.rule_served} model={self.model_served} "
+            f"({100.0 * self.rule_served / total:.1f}% rule) | disagree={self.disagree_rows}/{self.compared} "
+            f"({100.0 * rate:.1f}%) per label={self.disagree}"
+        )
+
+    def maybe_report(self):
+        if time.time() - self.last_report >= DECISION_STATS_SEC:
+            self.report()
+            self.last_report = time.time()
+
+decision_stats = DecisionStats()
+
+# stage: read, features, decision_predict, decision (prepare -> apply), telemetry,
+# forecast_features, forecast_predict, write, checkpoint, tick
+metrics = Metrics(prefix="sc", enabled=METRICS_ENABLED, window=METRICS_WINDOW, per_device=METRICS_DEVICE_NODE)
+# backend dibuka sebelum metrics ada (overlap dengan load model)
+backend.metrics = metrics
+
+def open_state_store() -> StateStore | None:
+    if not STATE_PATH:
+        return None
+    with startup.phase("state"):
+        try:
+            store = StateStore(STATE_PATH, max_age_sec=STATE_MAX_AGE_SEC)
+            n = len(store.load_all())
+        except Exception as e:
+            print("STATE nonaktif:", repr(e))
+            return None
+    print(f"STATE: {STATE_PATH} | checkpoint {n} device | load={store.load_ms:.1f}ms")
+    return store
+
+state_store = open_state_store()
+# worker hidup (untuk checkpoint terakhir saat shutdown)
+_live_workers = weakref.WeakSet()
+
 # =========================
 # UTIL
 # =========================
+def clock() -> float:
+    """Waktu sekarang (detik epoch) untuk jadwal & timestamp output; replay menggantinya dengan jam simulasi."""
+    return time.time()
+
+def now_local() -> datetime:
+    return datetime.fromtimestamp(clock(), TZ)
+
 def infer_n_features(model):
     if hasattr(model, "n_features_in_"):
         return int(model.n_features_in_)
@@ -226,53 +488,14 @@ def infer_n_features(model):
 def build_row_from_state(state: dict, now: datetime) -> dict:
     """
     Ambil state device + buat alias fitur sesuai model training.
+    Field ESP32 (soil_percent, tempC, ...) dan alias training menunjuk nilai
+    yang sama; lihat sc_features.ROW_FIELDS.
     """
-    soil = state.get("soil", {}).get("percent", None)
-    temp = state.get("env", {}).get("tempC", None)
-    hum  = state.get("env", {}).get("humRH", None)
-
-    light_obj = state.get("light", {}) or {}
-    light_percent = light_obj.get("percent", 0)
-
-    # jika ada lux asli dari device, pakai
-    light_lux = light_obj.get("lux", None)
-    if light_lux is None:
-        # fallback kasar: 0–100% -> 0–1000 lux
-        try:
-            light_lux = float(light_percent) * 10.0
-        except Exception:
-            light_lux = 0.0
-
-    uv_obj = state.get("uv", {}) or {}
-    uv_uvi = uv_obj.get("uvi", 0.0)
-
-    if soil is None or temp is None or hum is None:
-        raise ValueError("State belum lengkap: pastikan /state/soil/percent dan /state/env/tempC|humRH sudah ada.")
-
-    # versi field ESP32
-    row = {
-        "soil_percent": float(soil),
-        "tempC": float(temp),
-        "humRH": float(hum),
-        "light_percent": float(light_percent),
-        "uv_uvi": float(uv_uvi),
-        "hour": int(now.hour),
-    }
-
-    # alias untuk model training (yang muncul di error)
-    row.update({
-        "soil_moisture_pct": row["soil_percent"],
-        "air_temperature_c": row["tempC"],
-        "air_humidity_pct": row["humRH"],
-        "light_intensity_lux": float(light_lux),
-        "uv_index": row["uv_uvi"],
-    })
+    return values_to_row(state_values(state, now))
 
-    return row
-
-def make_X_single_step_for(model, row: dict, meta: dict | None = None) -> pd.DataFrame:
+def compile_feature_plan(model, meta: dict | None = None) -> FeaturePlan:
     """
-    Pilih urutan kolom fitur yang benar untuk model.
+    Resolve urutan kolom fitur single-step SEKALI per model.
     Prioritas:
       1) model.feature_names_in_
       2) meta["sensor_cols"] / meta["feature_cols"]
@@ -280,20 +503,12 @@ def make_X_single_step_for(model, row: dict, meta: dict | None = None) -> pd.Dat
     """
     cols = getattr(model, "feature_names_in_", None)
     if cols is not None:
-        cols = list(cols)
-        missing = [c for c in cols if c not in row]
-        if missing:
-            raise ValueError(f"Fitur kurang untuk model (feature_names_in_): {missing}")
-        return pd.DataFrame([[row[c] for c in cols]], columns=cols)
+        return FeaturePlan(list(cols), "feature_names_in_", dtype=FEATURE_DTYPE)
 
     if meta:
         meta_cols = meta.get("sensor_cols") or meta.get("feature_cols")
         if meta_cols:
-            cols = list(meta_cols)
-            missing = [c for c in cols if c not in row]
-            if missing:
-                raise ValueError(f"Fitur kurang untuk model (meta sensor_cols): {missing}")
-            return pd.DataFrame([[row[c] for c in cols]], columns=cols)
+            return FeaturePlan(list(meta_cols), "meta sensor_cols", dtype=FEATURE_DTYPE)
 
     # fallback berdasarkan jumlah fitur
     n = infer_n_features(model)
@@ -302,20 +517,146 @@ def make_X_single_step_for(model, row: dict, meta: dict | None = None) -> pd.Dat
         cols = MODEL_FEATURES_5
     else:
         cols = MODEL_FEATURES_6
-    missing = [c for c in cols if c not in row]
-    if missing:
+    plan = FeaturePlan(cols, "n_features_in_", dtype=FEATURE_DTYPE)
+    if plan.missing:
         # fallback ke versi ESP32 jika ternyata itu yang dibutuhkan
-        cols = FEATURES_6 if len(cols) == 6 else FEATURES_5
-    return pd.DataFrame([[row[c] for c in cols]], columns=cols)
+        plan = FeaturePlan(FEATURES_6 if len(cols) == 6 else FEATURES_5, "n_features_in_", dtype=FEATURE_DTYPE)
+    return plan
+
+def compile_forecast_plan(model, meta: dict | None = None):
+    """Forecast dengan <= 6 fitur = single-step; selebihnya sequence telemetry 5/6 fitur per step."""
+    n_in = infer_n_features(model)
+    if not n_in or n_in <= 6:
+        return compile_feature_plan(model, meta)
+    return SequencePlan(n_in, {5: MODEL_FEATURES_5, 6: MODEL_FEATURES_6}, STEP_MINUTES, dtype=FEATURE_DTYPE)
+
+class ModelSet:
+    """
+    Model decision + forecast beserta meta dan feature plan-nya (urutan kolom
+    di-resolve sekali; tiap tick cukup isi buffer numpy). Dipakai sebagai satu
+    kesatuan: hot-swap mengganti global `models` dengan satu assignment, dan
+    tiap pending menyimpan set yang dipakai saat fitur dibangun, jadi satu tick
+    tidak pernah mencampur plan lama dengan model baru.
+    """
+
+    def __init__(self, version: str, decision, dec_meta: dict, forecast, for_meta: dict, forecast_path: Path):
+        self.version = version
+        self.decision = decision
+        self.dec_meta = dec_meta
+        self.forecast = forecast
+        self.for_meta = for_meta
+        self.dec_plan = compile_feature_plan(decision, dec_meta)
+        self.for_plan = compile_forecast_plan(forecast, for_meta)
+        # key cache forecast ikut versi registry -> hasil model lama tidak pernah terpakai model baru
+        self.forecast_version = f"{version}/{model_version(forecast_path, for_meta)}"
+
+models = ModelSet(MODEL_VERSION, decision_model, DEC_META, forecast_model, FOR_META, FORECAST_LOAD_PATH)
+
+def load_model_set(model_dir: Path, version: str) -> ModelSet:
+    """Load bundle di `model_dir` (dipanggil dari thread reloader, model aktif tetap melayani)."""
+    dec_path, for_path = model_paths(Path(model_dir))
+    decision, dec_meta = unwrap_joblib(load_model_file(dec_path))
+    forecast, for_meta = unwrap_joblib(load_model_file(for_path))
+    check_models(decision, forecast)
+    return ModelSet(version, decision, dec_meta, forecast, for_meta, for_path)
+
+def install_models(new: ModelSet) -> ModelSet:
+    """Swap atomik: satu assignment referensi. Return set lama."""
+    global models, decision_model, forecast_model, DEC_META, FOR_META
+    old, models = models, new
+    # nama lama tetap menunjuk model aktif (dibaca kode lain / sesi interaktif)
+    decision_model, forecast_model, DEC_META, FOR_META = new.decision, new.forecast, new.dec_meta, new.for_meta
+    forecast_cache.set_version(new.forecast_version)
+    metrics.inc("model_swaps")
+    return old
+
+def _rule_probe(n: int, seed: int = 0) -> np.ndarray:
+    """Vektor nilai baris acak (rentang sensor wajar) untuk probe bawaan."""
+    rng = np.random.default_rng(seed)
+    values = np.zeros((n, N_ROW_VALUES), dtype=np.float64)
+    lo = np.array([0.0, 15.0, 30.0, 0.0, 0.0, 0.0, 0.0])
+    hi = np.array([100.0, 40.0, 95.0, 2000.0, 11.0, 23.0, 100.0])
+    values[:] = lo + rng.random((n, N_ROW_VALUES)) * (hi - lo)
+    values[:, 5] = np.floor(values[:, 5])
+    values[:, 6] = values[:, 3] / 20.0
+    return values
+
+def _label_accuracy(m: ModelSet, X: np.ndarray, y: np.ndarray) -> float:
+    pred = np.asarray(m.decision.predict(X)).astype(str)
+    if pred.ndim == 1:
+        pred = pred.reshape(-1, 1)
+    return float(np.mean(pred == np.asarray(y).astype(str).reshape(pred.shape)))
+
+def rule_probe_set(m: ModelSet, n: int) -> dict:
+    """Probe tanpa data held-out: label rule threshold untuk decision, sequence state konstan untuk forecast."""
+    values = _rule_probe(n)
+    label_cols = [str(c) for c in (m.dec_meta.get("target_label_cols") or m.dec_meta.get("label_cols")
+                                   or ["label_suhu", "label_rh", "label_soil", "label_lux", "label_uv"])]
+    dec_X = np.vstack([m.dec_plan.fill_values(v, m.dec_plan.empty()) for v in values])
+    rules = [rule_labels_from_row(values_to_row(v)) for v in values]
+    dec_y = np.array([[r.get(c, "") for c in label_cols] for r in rules], dtype=str)
+    plan = m.for_plan
+    if isinstance(plan, FeaturePlan):
+        for_X = np.vstack([plan.fill_values(v, plan.empty()) for v in values])
+    else:
+        for_X = np.tile(values[:, plan.index], (1, plan.steps)).astype(plan.dtype)
+    return {"decision_X": dec_X, "decision_y": dec_y, "forecast_X": for_X}
 
-def decode_multioutput_prediction(pred_row) -> dict:
+def validate_models(new: ModelSet, model_dir: Path) -> tuple[bool, dict]:
+    """
+    Gate sebelum swap. probe.npz dari notebook (held-out set): akurasi label
+    >= MODEL_PROBE_MIN_ACC dan MAE forecast <= MODEL_PROBE_MAX_MAE. Tanpa
+    probe.npz: kesesuaian dengan rule threshold. Keduanya: akurasi tidak boleh
+    turun lebih dari MODEL_PROBE_MAX_REGRESSION dibanding model aktif, dan
+    output forecast harus finite di rentang soil.
+    """
+    cur = models
+    probe = load_probe(model_dir)
+    source = "npz" if probe else "rule"
+    if not probe:
+        probe = rule_probe_set(new, MODEL_PROBE_ROWS)
+    report = {"probe": source, "manifest": read_manifest(model_dir).get("version", "")}
+    errors = []
+
+    dec_X, dec_y = probe.get("decision_X"), probe.get("decision_y")
+    if dec_X is not None and dec_y is not None:
+        if dec_X.shape[1] != new.dec_plan.n_features:
+            errors.append(f"decision_X {dec_X.shape[1]} kolom, model butuh {new.dec_plan.n_features}")
+        else:
+            acc = report["decision_acc"] = _label_accuracy(new, dec_X, dec_y)
+            if cur.dec_plan.cols == new.dec_plan.cols:
+                report["decision_acc_current"] = _label_accuracy(cur, dec_X, dec_y)
+                if acc < report["decision_acc_current"] - MODEL_PROBE_MAX_REGRESSION:
+                    errors.append(f"akurasi turun {report['decision_acc_current']:.3f} -> {acc:.3f}")
+            if source == "npz" and acc < MODEL_PROBE_MIN_ACC:
+                errors.append(f"akurasi {acc:.3f} < {MODEL_PROBE_MIN_ACC}")
+
+    for_X = probe.get("forecast_X")
+    if for_X is not None:
+        if for_X.shape[1] != new.for_plan.n_features:
+            errors.append(f"forecast_X {for_X.shape[1]} kolom, model butuh {new.for_plan.n_features}")
+        else:
+            y = np.asarray(new.forecast.predict(for_X), dtype=np.float64)
+            if not np.all(np.isfinite(y)) or y.min() < -50.0 or y.max() > 150.0:
+                errors.append("output forecast di luar rentang soil")
+            elif probe.get("forecast_y") is not None:
+                mae = report["forecast_mae"] = float(np.mean(np.abs(y - np.asarray(probe["forecast_y"], dtype=np.float64).reshape(y.shape))))
+                if mae > MODEL_PROBE_MAX_MAE:
+                    errors.append(f"MAE forecast {mae:.2f} > {MODEL_PROBE_MAX_MAE}")
+
+    report = {k: (round(v, 4) if isinstance(v, float) else v) for k, v in report.items()}
+    if errors:
+        report["errors"] = errors
+    return not errors, report
+
+def decode_multioutput_prediction(pred_row, meta: dict | None = None) -> dict:
     """
     MultiOutputClassifier -> pred_row biasanya array label.
     """
-    import numpy as np
+    meta = models.dec_meta if meta is None else meta
     label_cols = (
-        DEC_META.get("target_label_cols")
-        or DEC_META.get("label_cols")
+        meta.get("target_label_cols")
+        or meta.get("label_cols")
         or ["label_suhu", "label_rh", "label_soil", "label_lux", "label_uv"]
     )
 
@@ -359,7 +700,18 @@ def interpret_decision_to_pump(pred_row, row: dict, labels_dict: dict | None = N
 
     return float(row.get("soil_percent", 100.0)) < SOIL_IRRIGATE_THRESHOLD
 
-def _extract_points_from_telemetry(raw) -> list:
+def _telemetry_key_fn(k):
+    # push key RTDB urut leksikografis; key numerik diurutkan sebagai angka lebih dulu
+    try:
+        return (0, int(str(k)), "")
+    except Exception:
+        return (1, 0, str(k))
+
+def _extract_items_from_telemetry(raw) -> list:
+    """
+    Return list (key, point) terurut berdasarkan key.
+    Untuk bentuk list, key = index.
+    """
     if raw is None:
         return []
     if isinstance(raw, dict):
@@ -368,23 +720,17 @@ def _extract_points_from_telemetry(raw) -> list:
         elif "series" in raw:
             raw = raw["series"]
 
-    points = []
+    items = []
     if isinstance(raw, list):
-        points = raw
+        items = list(enumerate(raw))
     elif isinstance(raw, dict):
         items = list(raw.items())
+        items.sort(key=lambda item: _telemetry_key_fn(item[0]))
 
-        def key_fn(item):
-            k = item[0]
-            try:
-                return int(str(k))
-            except Exception:
-                return str(k)
-
-        items.sort(key=key_fn)
-        points = [v for _, v in items]
+    return [(k, p) for k, p in items if isinstance(p, dict)]
 
-    return [p for p in points if isinstance(p, dict)]
+def _extract_points_from_telemetry(raw) -> list:
+    return [p for _, p in _extract_items_from_telemetry(raw)]
 
 def _normalize_point(p: dict, now: datetime) -> dict | None:
     """
@@ -434,61 +780,235 @@ def _normalize_point(p: dict, now: datetime) -> dict | None:
     except Exception:
         return None
 
-def build_X_sequence_for_forecast(model, state: dict, now: datetime, meta: dict | None = None) -> pd.DataFrame:
-    """
-    Jika forecast model butuh banyak fitur, bentuk sequence dari telemetry.
-    """
-    n_in = infer_n_features(model)
-    if not n_in or n_in <= 6:
-        row = build_row_from_state(state, now)
-        return make_X_single_step_for(model, row, meta=meta)
-
-    # per-step features berdasarkan n_in
-    if n_in % 5 == 0:
-        per = 5
-        feats = MODEL_FEATURES_5
-        steps = n_in // 5
-    elif n_in % 6 == 0:
-        per = 6
-        feats = MODEL_FEATURES_6
-        steps = n_in // 6
-    else:
-        raise ValueError(f"Forecast model n_features_in_={n_in} tidak bisa dipetakan ke 5/6 fitur per step.")
-
-    raw_tel = ref_telemetry.get()
-    pts = _extract_points_from_telemetry(raw_tel)
+def _point_ts(p: dict, now: datetime) -> float:
+    """Timestamp titik (detik). "ts" dari ServerValue.TIMESTAMP berupa milidetik."""
+    ts = p.get("ts")
+    if isinstance(ts, (int, float)) and not isinstance(ts, bool) and ts > 0:
+        return ts / 1000.0 if ts > 1e11 else float(ts)
+    return now.timestamp()
 
-    rows = []
-    for pt in pts[-(steps * 3):]:
-        r = _normalize_point(pt, now)
-        if r is not None:
-            rows.append(r)
-
-    current_row = build_row_from_state(state, now)
-    if len(rows) < steps:
-        pad_needed = steps - len(rows)
-        rows = ([current_row] * pad_needed) + rows
+# =========================
+# TELEMETRY CACHE
+# =========================
+class TelemetryWindow:
+    """
+    Ring-buffer titik telemetry yang sudah dinormalisasi, disimpan sebagai
+    array (maxlen, N_ROW_VALUES) agar bisa langsung disalin ke buffer fitur.
 
-    rows = rows[-steps:]
+    Seed sekali dengan query terbatas (order_by_key + limit_to_last), lalu
+    refresh berikutnya hanya mengambil key baru (start_at key terakhir).
+    Biaya per forecast jadi konstan walau /telemetry terus bertambah.
+    """
 
-    # set hour per step kalau butuh
-    if per == 6:
-        base_time = now - timedelta(minutes=(steps - 1) * STEP_MINUTES)
-        for i in range(steps):
-            t = base_time + timedelta(minutes=i * STEP_MINUTES)
-            rows[i]["hour"] = int(t.hour)
+    def __init__(self, ref, maxlen: int):
+        self.ref = ref
+        self.maxlen = int(maxlen)
+        self._clear_buffer()
+        self.last_key = None
+        self.seeded = False
+        # False jika node bukan bentuk push-key (mis. {"history": [...]}) -> full get
+        self.incremental = True
+
+    def _clear_buffer(self):
+        self.values = np.empty((self.maxlen, N_ROW_VALUES), dtype=np.float64)
+        self.count = 0
+        self.head = 0
+
+    def append(self, values):
+        if self.maxlen <= 0:
+            return
+        self.values[self.head] = values
+        self.head = (self.head + 1) % self.maxlen
+        self.count = min(self.count + 1, self.maxlen)
+
+    def _add(self, pt: dict, row: dict, now: datetime):
+        self.append(row_values(row))
+
+    def _append_items(self, items, now: datetime) -> int:
+        added = 0
+        last = _telemetry_key_fn(self.last_key) if self.last_key is not None else None
+        for k, pt in items:
+            if last is not None and _telemetry_key_fn(k) <= last:
+                continue
+            r = _normalize_point(pt, now)
+            if r is not None:
+                self._add(pt, r, now)
+                added += 1
+            self.last_key = k
+            last = _telemetry_key_fn(k)
+        return added
+
+    def refresh(self, now: datetime) -> int:
+        """Ambil titik baru dari RTDB. Return jumlah titik yang ditambahkan."""
+        if not self.seeded:
+            raw = self.ref.order_by_key().limit_to_last(self.maxlen).get()
+            self.seeded = True
+            if isinstance(raw, list) or (isinstance(raw, dict) and ("history" in raw or "series" in raw)):
+                self.incremental = False
+                return self._reload(raw, now)
+            return self._append_items(_extract_items_from_telemetry(raw), now)
+
+        if not self.incremental:
+            return self._reload(self.ref.get(), now)
+
+        if self.last_key is None:
+            raw = self.ref.order_by_key().limit_to_last(self.maxlen).get()
+        else:
+            # +1 karena start_at ikut mengembalikan key terakhir yang sudah ada
+            raw = self.ref.order_by_key().start_at(str(self.last_key)).limit_to_last(self.maxlen + 1).get()
+        return self._append_items(_extract_items_from_telemetry(raw), now)
+
+    def _reload(self, raw, now: datetime) -> int:
+        self._clear_buffer()
+        self.last_key = None
+        return self._append_items(_extract_items_from_telemetry(raw)[-self.maxlen:], now)
+
+    def resize(self, maxlen: int):
+        """Ubah kapasitas; jika membesar, seed ulang agar window terisi penuh."""
+        maxlen = int(maxlen)
+        if maxlen == self.maxlen:
+            return
+        grow = maxlen > self.maxlen
+        keep = self.tail(maxlen)
+        self.maxlen = maxlen
+        self._clear_buffer()
+        if grow:
+            self.last_key = None
+            self.seeded = False
+            return
+        for v in keep:
+            self.append(v)
+
+    def tail(self, n: int | None = None) -> np.ndarray:
+        """Salinan n titik terakhir (lama -> baru), shape (k, N_ROW_VALUES)."""
+        k = self.count if n is None else min(int(n), self.count)
+        idx = (self.head - k + np.arange(k)) % max(1, self.maxlen)
+        return self.values[idx]
+
+    def require(self, steps: int):
+        """Pastikan window cukup untuk `steps` step forecast."""
+        self.resize(steps * 3)
+
+    def hours(self, steps: int):
+        """Jam per step jika titik ber-timestamp; None = dihitung mundur dari now."""
+        return None
 
-    flat = []
-    for r in rows:
-        for f in feats:
-            flat.append(float(r[f]))
+    def rows(self) -> list:
+        return [values_to_row(v) for v in self.tail()]
+
+    # ---------- checkpoint (sc_state) ----------
+    def snapshot(self) -> tuple[dict, dict]:
+        meta = {"kind": type(self).__name__, "maxlen": self.maxlen, "last_key": self.last_key,
+                "seeded": self.seeded, "incremental": self.incremental}
+        return meta, {"values": self.tail()}
+
+    def restore(self, meta: dict, arrays: dict) -> bool:
+        """Pulihkan window; refresh berikutnya hanya mengambil key setelah last_key."""
+        if meta.get("kind") != type(self).__name__ or not meta.get("seeded"):
+            return False
+        self.maxlen = int(meta["maxlen"])
+        self._clear_buffer()
+        for v in arrays["values"][-self.maxlen:]:
+            self.append(v)
+        self.last_key = meta.get("last_key")
+        self.seeded = True
+        self.incremental = bool(meta.get("incremental", True))
+        return True
+
+class ResampledTelemetryWindow(TelemetryWindow):
+    """
+    TelemetryWindow yang mengumpulkan titik ke bin STEP_MINUTES (StepResampler)
+    memakai "ts" server, bukan menyimpan titik mentah. Query RTDB tetap sama
+    (seed terbatas lalu inkremental); ukuran seed = jumlah push ESP32 yang
+    menutupi `steps` bin.
+    """
 
-    return pd.DataFrame([flat])
+    def __init__(self, ref, steps: int = 1):
+        self.resampler = StepResampler(
+            STEP_MINUTES * 60, steps, N_ROW_VALUES, agg=TELEMETRY_AGG, fill=TELEMETRY_GAP_FILL
+        )
+        self._end_bin = None
+        self._now_sec = None
+        super().__init__(ref, self._seed_points(steps))
+
+    @staticmethod
+    def _seed_points(steps: int) -> int:
+        # +1 bin: bin yang sedang berjalan belum lengkap dan tidak masuk window
+        return int((steps + 1) * STEP_MINUTES * 60 / max(1, TELEMETRY_PUSH_SEC)) + 1
+
+    def _clear_buffer(self):
+        self.resampler.reset()
+
+    def _add(self, pt: dict, row: dict, now: datetime):
+        self.resampler.add(_point_ts(pt, now), row_values(row))
+
+    def require(self, steps: int):
+        if steps == self.resampler.steps and self.seeded:
+            return
+        if steps > self.resampler.steps:
+            self.last_key = None
+            self.seeded = False
+        self.resampler.resize(steps)
+        self.maxlen = self._seed_points(steps)
+        if not self.seeded:
+            self.resampler.reset()
+
+    def refresh(self, now: datetime) -> int:
+        self._now_sec = now.timestamp()
+        return super().refresh(now)
+
+    def tail(self, n: int | None = None) -> np.ndarray:
+        now_sec = self._now_sec if self._now_sec is not None else clock()
+        values, self._end_bin = self.resampler.window(n or self.resampler.steps, now_sec)
+        return values
+
+    def hours(self, steps: int):
+        if self._end_bin is None:
+            return None
+        return self.resampler.bin_hours(self._end_bin, steps, TZ)
+
+    def snapshot(self) -> tuple[dict, dict]:
+        meta = {"kind": type(self).__name__, "maxlen": self.maxlen, "last_key": self.last_key,
+                "seeded": self.seeded, "incremental": self.incremental}
+        r_meta, arrays = self.resampler.snapshot()
+        meta["resampler"] = r_meta
+        return meta, arrays
+
+    def restore(self, meta: dict, arrays: dict) -> bool:
+        if meta.get("kind") != type(self).__name__ or not meta.get("seeded"):
+            return False
+        if not self.resampler.restore(meta.get("resampler") or {}, arrays):
+            return False
+        self.maxlen = int(meta["maxlen"])
+        self.last_key = meta.get("last_key")
+        self.seeded = True
+        self.incremental = bool(meta.get("incremental", True))
+        return True
+
+def build_X_sequence_for_forecast(plan, state: dict, now: datetime, out,
+                                  window: TelemetryWindow | None = None, device_id: str | None = None):
+    """
+    Isi buffer fitur forecast. SequencePlan: bentuk sequence dari telemetry
+    (diambil dari TelemetryWindow milik device); FeaturePlan: satu baris state.
+    """
+    if isinstance(plan, FeaturePlan):
+        with metrics.timer("forecast_features", device_id):
+            return plan.fill(state, now, out)
+
+    if plan.error:
+        raise ValueError(plan.error)
+    if window is None:
+        raise ValueError("Forecast model butuh sequence telemetry, tapi TelemetryWindow tidak diberikan.")
+    with metrics.timer("telemetry", device_id):
+        window.require(plan.steps)
+        window.refresh(now)
+        history = window.tail(plan.steps)
+    with metrics.timer("forecast_features", device_id):
+        return plan.fill(history, state, now, out, hours=window.hours(plan.steps))
 
 def interpret_forecast_output(y_pred, threshold: float) -> tuple[list, str, int | None]:
     soil_future = []
     try:
-        import numpy as np
         if isinstance(y_pred, np.ndarray):
             soil_future = [float(x) for x in y_pred.flatten().tolist()]
         elif isinstance(y_pred, (list, tuple)):
@@ -522,96 +1042,710 @@ def interpret_forecast_output(y_pred, threshold: float) -> tuple[list, str, int
     return soil_future, text, minutes
 
 # =========================
-# LOOP
+# DEVICE WORKER
 # =========================
-last_pump = None
-last_forecast_ts = 0
+class DeviceWorker:
+    """
+    State runtime per device. Model (ModelSet global `models`) dipakai bersama
+    oleh semua device; tiap pending membawa set yang dipakai membangun fiturnya.
+    """
 
-while True:
-    try:
-        controls = ref_controls.get() or {}
+    def __init__(self, device_id: str):
+        self.device_id = device_id
+        self.refs = DeviceRefs(device_id)
+        self.last_pump = None
+        self.last_forecast_ts = 0
+        self.last_metrics_ts = 0
+        if TELEMETRY_RESAMPLE:
+            self.telemetry = ResampledTelemetryWindow(self.refs.telemetry)
+        else:
+            self.telemetry = TelemetryWindow(self.refs.telemetry, 0)
+        # buffer fitur milik device (diisi ulang tiap tick, tanpa alokasi DataFrame);
+        # dialokasikan ulang hanya jika versi model baru punya plan berbeda
+        self._buf_models = models
+        self.dec_X = models.dec_plan.empty()
+        self.for_X = models.for_plan.empty()
+        self.out = OutputStage(self.refs.base, tolerance=OUTPUT_TOLERANCE, heartbeat_sec=OUTPUT_HEARTBEAT_SEC)
+        self.last_checkpoint = time.time()
+        # (controls, state, waktu baca) terakhir yang berhasil, untuk mode degraded
+        self.last_inputs = None
+        self.restored = self.restore_state()
+        _live_workers.add(self)
+
+    # ---------- checkpoint (sc_state) ----------
+    def snapshot(self) -> tuple[dict, dict]:
+        window_meta, arrays = self.telemetry.snapshot()
+        meta = {
+            "last_pump": self.last_pump,
+            "last_forecast_ts": self.last_forecast_ts,
+            "last_metrics_ts": self.last_metrics_ts,
+            "telemetry": window_meta,
+            "output": self.out.snapshot(),
+        }
+        return meta, arrays
+
+    def restore_state(self) -> bool:
+        """Lanjutkan dari checkpoint: last_pump tidak lagi None (pompa tidak di-flip saat restart)."""
+        snap = state_store.get(self.device_id) if state_store is not None else None
+        if snap is None:
+            return False
+        meta, arrays = snap
+        self.last_pump = meta.get("last_pump")
+        self.last_forecast_ts = int(meta.get("last_forecast_ts") or 0)
+        self.last_metrics_ts = int(meta.get("last_metrics_ts") or 0)
+        self.out.restore_written(meta.get("output") or {})
+        window_ok = self.telemetry.restore(meta.get("telemetry") or {}, arrays)
+        print(f"STATE [{self.device_id}] restore: last_pump={self.last_pump} "
+              f"window={'delta sejak ' + str(self.telemetry.last_key) if window_ok else 'seed ulang'}")
+        return True
+
+    def checkpoint_due(self) -> bool:
+        return state_store is not None and time.time() - self.last_checkpoint >= STATE_CHECKPOINT_SEC
+
+    def maybe_checkpoint(self, force: bool = False):
+        if not (force and state_store is not None) and not self.checkpoint_due():
+            return
+        self.last_checkpoint = time.time()
+        try:
+            with metrics.timer("checkpoint", self.device_id):
+                state_store.save(self.device_id, *self.snapshot())
+        except Exception as e:
+            print(f"STATE error [{self.device_id}]:", repr(e))
+
+    def buffers(self, m: ModelSet) -> tuple[np.ndarray, np.ndarray]:
+        if m is not self._buf_models:
+            if self.dec_X.shape != m.dec_plan.empty().shape:
+                self.dec_X = m.dec_plan.empty()
+            if self.for_X.shape != m.for_plan.empty().shape:
+                self.for_X = m.for_plan.empty()
+            self._buf_models = m
+        return self.dec_X, self.for_X
+
+    def poll(self) -> tuple[dict, dict]:
+        with metrics.timer("read", self.device_id):
+            try:
+                controls = self.refs.controls.get() or {}
+                state = self.refs.state.get() or {}
+            except BackendUnavailable:
+                return self.last_known_inputs()
+        return self.remember_inputs(controls, state)
+
+    def remember_inputs(self, controls: dict, state: dict) -> tuple[dict, dict]:
+        self.last_inputs = (controls, state, time.time())
+        return controls, state
+
+    def last_known_inputs(self) -> tuple[dict, dict]:
+        """Controls/state terakhir selama backend tidak tersedia; terlalu tua -> BackendUnavailable."""
+        if self.last_inputs is None or time.time() - self.last_inputs[2] > DEGRADED_MAX_STATE_AGE_SEC:
+            raise BackendUnavailable(f"RTDB tidak tersedia dan tidak ada state lokal yang cukup baru [{self.device_id}]")
+        metrics.inc("degraded_reads")
+        return self.last_inputs[0], self.last_inputs[1]
+
+    def prepare_decision(self, controls: dict, state: dict, now: datetime) -> dict | None:
+        """Bangun input decision. Return None jika mode bukan auto."""
         mode = str(controls.get("mode", "auto")).lower()
         power = bool(controls.get("power", True))
 
-        state = ref_state.get() or {}
-        now = datetime.now(TZ)
-
-        # ---------- DECISION ----------
-        if mode == "auto":
-            row = build_row_from_state(state, now)
-            Xd = make_X_single_step_for(decision_model, row, meta=DEC_META)
-
-            pred = decision_model.predict(Xd)
-            pred_row = pred[0]
-            pred_labels = decode_multioutput_prediction(pred_row)
+        if mode != "auto":
+            return None
+
+        t0 = time.perf_counter()
+        with metrics.timer("features", self.device_id):
+            values = state_values(state, now)
+            row = values_to_row(values)
+            rule_lbls = rule_labels_from_row(row)
+            m = models
+            pending = {"mode": mode, "power": power, "row": row, "rule_labels": rule_lbls, "X": None,
+                       "now": now, "t0": t0, "models": m}
+
+            engine = DECISION_ENGINE
+            if backend.degraded:
+                pending["degraded"] = True
+                engine = DEGRADED_DECISION_ENGINE
+            if engine == "rules":
+                return pending
+            if engine == "hybrid" and not ambiguous_labels(rule_inputs_from_row(row), AMBIGUITY_BANDS):
+                return pending
+
+            pending["X"] = m.dec_plan.fill_values(values, self.buffers(m)[0])
+        return pending
+
+    def apply_decision(self, pending: dict, pred_row=None):
+        """pred_row None = label dilayani langsung dari rule threshold (tanpa model)."""
+        mode, power, row, now = pending["mode"], pending["power"], pending["row"], pending["now"]
+        rule_labels = pending["rule_labels"]
+
+        if pred_row is None:
+            source = "rule"
+            pred_labels = dict(rule_labels)
+            pred_row = list(pred_labels.values())
+            decision_stats.rule_served += 1
+        else:
+            source = "model"
+            pred_labels = decode_multioutput_prediction(pred_row, pending["models"].dec_meta)
+            decision_stats.record_model(pred_labels, rule_labels)
 
-            rule_labels = rule_labels_from_row(row)
+        pump_auto = interpret_decision_to_pump(pred_row, row, labels_dict=pred_labels)
+        if not power:
+            pump_auto = False
 
-            pump_auto = interpret_decision_to_pump(pred_row, row, labels_dict=pred_labels)
-            if not power:
-                pump_auto = False
+        if self.last_pump is None or pump_auto != self.last_pump:
+            self.out.patch("controls", {"pump_auto": pump_auto})
 
-            if last_pump is None or pump_auto != last_pump:
-                ref_controls.update({"pump_auto": pump_auto})
+            now_node = {
+                "pump_auto": pump_auto,
+                "mode": mode,
+                "power": power,
 
-                ref_ai_now.set({
-                    "pump_auto": pump_auto,
-                    "mode": mode,
-                    "power": power,
+                "row": row,
 
-                    "row": row,
+                # hasil AI (multioutput)
+                "labels": pred_labels,
+                "label": pred_labels.get("label_soil") or pred_labels.get("label") or "",
 
-                    # hasil AI (multioutput)
-                    "labels": pred_labels,
-                    "label": pred_labels.get("label_soil") or pred_labels.get("label") or "",
+                # hasil rule threshold untuk konsistensi UI
+                "rule_labels": rule_labels,
+                "source": source,
 
-                    # hasil rule threshold untuk konsistensi UI
-                    "rule_labels": rule_labels,
+                "ts": int(clock()),
+                "iso": now.isoformat(),
+            }
+            if pending.get("degraded"):
+                # diputuskan dari state lokal saat RTDB tidak tersedia
+                now_node["degraded"] = True
+            self.out.put("ai/now", now_node)
+
+            print(f"DECISION [{self.device_id}] -> pump_auto =", pump_auto, "| labels =", pred_labels)
+            self.last_pump = pump_auto
+
+        metrics.observe("decision", time.perf_counter() - pending["t0"], self.device_id)
+        startup.report()
+
+    def run_decision(self, controls: dict, state: dict, now: datetime):
+        pending = self.prepare_decision(controls, state, now)
+        if pending is None:
+            return
+        if pending["X"] is None:
+            self.apply_decision(pending)
+            return
+        with metrics.timer("decision_predict", self.device_id):
+            pred = pending["models"].decision.predict(pending["X"])
+        self.apply_decision(pending, pred[0])
+
+    def forecast_due(self, now_ts: int) -> bool:
+        # forecast butuh read /telemetry: ditunda selama backend degraded
+        if backend.degraded:
+            return False
+        return now_ts - self.last_forecast_ts >= FORECAST_INTERVAL_SEC
+
+    def prepare_forecast(self, state: dict, now: datetime) -> dict:
+        m = models
+        row = build_row_from_state(state, now)
+        Xf = build_X_sequence_for_forecast(m.for_plan, state, now, self.buffers(m)[1], window=self.telemetry,
+                                           device_id=self.device_id)
+        return {"row": row, "X": Xf, "now": now, "ts": int(clock()), "models": m}
+
+    def apply_forecast(self, pending: dict, y_pred):
+        row, now, now_ts = pending["row"], pending["now"], pending["ts"]
+
+        soil_future, forecast_text, next_min = interpret_forecast_output(
+            y_pred,
+            threshold=SOIL_IRRIGATE_THRESHOLD
+        )
+
+        self.out.put("ai/forecast", {
+            "soil_future": soil_future,
+            "threshold": SOIL_IRRIGATE_THRESHOLD,
+            "step_minutes": STEP_MINUTES,
+            "text": forecast_text,
+            "next_irrigation_min": next_min,
+            "row_now": row,
+            "ts": now_ts,
+            "iso": now.isoformat(),
+        })
 
-                    "ts": int(time.time()),
-                    "iso": now.isoformat(),
-                })
+        self.out.patch("controls", {
+            "forecast_text": forecast_text,
+            "forecast_next_min": next_min if next_min is not None else -1,
+            "forecast_soil_now": float(row["soil_percent"]),
+            "forecast_soil_min_horizon": float(min(soil_future)) if soil_future else float(row["soil_percent"]),
+        })
 
-                print("DECISION -> pump_auto =", pump_auto, "| labels =", pred_labels)
-                last_pump = pump_auto
+        print(f"FORECAST [{self.device_id}] ->", forecast_text, "| len =", len(soil_future))
+        self.last_forecast_ts = now_ts
+
+    def stage_metrics(self):
+        """Stage ringkasan metrics device ke ai/metrics tiap METRICS_DEVICE_NODE_SEC (jika diaktifkan)."""
+        if not METRICS_DEVICE_NODE:
+            return
+        now_ts = int(clock())
+        if now_ts - self.last_metrics_ts < METRICS_DEVICE_NODE_SEC:
+            return
+        self.out.put("ai/metrics", metrics.device_snapshot(self.device_id, ts=now_ts))
+        self.last_metrics_ts = now_ts
+
+    def flush(self) -> dict:
+        """Tulis semua output tick ini dalam satu multi-path update (hanya yang berubah)."""
+        self.stage_metrics()
+        suppressed = self.out.paths_suppressed
+        try:
+            with metrics.timer("write", self.device_id):
+                return self.out.flush()
+        except BackendUnavailable:
+            # delta tetap pending; ditulis (nilai terbaru) begitu breaker close lagi
+            metrics.inc("writes_deferred", reason="unavailable")
+            return {}
+        except Exception:
+            # delta sudah dikembalikan ke pending -> dicoba lagi di flush berikutnya
+            metrics.inc("retries", kind="write")
+            raise
+        finally:
+            metrics.inc("writes_skipped", self.out.paths_suppressed - suppressed, reason="unchanged")
+
+    def run_forecast(self, state: dict, now: datetime):
+        if not self.forecast_due(int(clock())):
+            return
+        pending = self.prepare_forecast(state, now)
+        with metrics.timer("forecast_predict", self.device_id):
+            m = pending["models"]
+            y = forecast_cache.predict(m.forecast, pending["X"], version=m.forecast_version)
+        self.apply_forecast(pending, y)
 
-        # ---------- FORECAST ----------
-        now_ts = int(time.time())
-        if now_ts - last_forecast_ts >= FORECAST_INTERVAL_SEC:
-            row = build_row_from_state(state, now)
-            Xf = build_X_sequence_for_forecast(forecast_model, state, now, meta=FOR_META)
+# =========================
+# LOOP
+# =========================
+def report_stats():
+    decision_stats.maybe_report()
+    backend.maybe_report(TRANSPORT_STATS_SEC)
+    forecast_cache.maybe_report(FORECAST_CACHE_STATS_SEC)
+    metrics.maybe_snapshot(METRICS_SNAPSHOT_SEC, METRICS_SNAPSHOT_PATH)
+
+def loop_backoff() -> Backoff:
+    return Backoff(LOOP_BACKOFF_BASE_SEC, LOOP_BACKOFF_CAP_SEC)
+
+def run_polling(worker: DeviceWorker):
+    backoff = loop_backoff()
+    while True:
+        try:
+            t0 = time.perf_counter()
+            controls, state = worker.poll()
+            now = now_local()
+
+            worker.run_decision(controls, state, now)
+            worker.run_forecast(state, now)
+            worker.flush()
+            worker.maybe_checkpoint()
+            metrics.observe("tick", time.perf_counter() - t0, worker.device_id)
+            report_stats()
+            backoff.reset()
+
+            time.sleep(LOOP_SEC)
+
+        except Exception as e:
+            print("SC error:", repr(e))
+            metrics.inc("retries", kind="tick")
+            time.sleep(backoff.next_delay())
+
+def _decision_inputs(controls: dict, state: dict) -> tuple:
+    # hanya field yang mempengaruhi keputusan; tulisan worker sendiri ke /controls
+    # (pump_auto, forecast_*) tidak boleh memicu inferensi ulang
+    return (
+        str(controls.get("mode", "auto")).lower(),
+        bool(controls.get("power", True)),
+        state,
+    )
 
-            yhat = forecast_model.predict(Xf)
-            y_pred = yhat[0]
+def run_streaming(worker: DeviceWorker, feed=None):
+    """
+    Mode streaming: keputusan dihitung hanya saat /state atau /controls berubah.
+    Forecast tetap dijadwalkan per FORECAST_INTERVAL_SEC memakai snapshot lokal.
+    """
+    if feed is None:
+        feed = FirebaseChangeFeed({"state": worker.refs.state, "controls": worker.refs.controls})
+    feed.start()
 
-            soil_future, forecast_text, next_min = interpret_forecast_output(
-                y_pred,
-                threshold=SOIL_IRRIGATE_THRESHOLD
-            )
+    last_inputs = None
+    have_state = False
+    backoff = loop_backoff()
+    try:
+        while True:
+            try:
+                # belum ada /state -> tunggu event pertama tanpa batas waktu
+                wait_sec = None
+                if have_state:
+                    wait_sec = max(0.0, worker.last_forecast_ts + FORECAST_INTERVAL_SEC - clock())
+                feed.wait(wait_sec, coalesce_sec=STREAM_COALESCE_SEC)
+
+                t0 = time.perf_counter()
+                controls = feed.snapshot("controls") or {}
+                state = feed.snapshot("state") or {}
+                have_state = bool(state)
+                if not have_state:
+                    continue
+                now = now_local()
+
+                inputs = _decision_inputs(controls, state)
+                if inputs != last_inputs:
+                    worker.run_decision(controls, state, now)
+                    last_inputs = inputs
+
+                worker.run_forecast(state, now)
+                worker.flush()
+                worker.maybe_checkpoint()
+                metrics.observe("tick", time.perf_counter() - t0, worker.device_id)
+                report_stats()
+                backoff.reset()
+
+            except Exception as e:
+                print("SC error:", repr(e))
+                metrics.inc("retries", kind="tick")
+                time.sleep(backoff.next_delay())
+    finally:
+        feed.stop()
 
-            ref_ai_forecast.set({
-                "soil_future": soil_future,
-                "threshold": SOIL_IRRIGATE_THRESHOLD,
-                "step_minutes": STEP_MINUTES,
-                "text": forecast_text,
-                "next_irrigation_min": next_min,
-                "row_now": row,
-                "ts": now_ts,
-                "iso": now.isoformat(),
-            })
+# =========================
+# ASYNC
+# =========================
+async def _decide_async(worker: DeviceWorker, controls: dict, state: dict, now: datetime, cpu):
+    pending = worker.prepare_decision(controls, state, now)
+    if pending is None:
+        return
+    pred_row = None
+    if pending["X"] is not None:
+        with metrics.timer("decision_predict", worker.device_id):
+            pred = await run_io(cpu, pending["models"].decision.predict, pending["X"])
+        pred_row = pred[0]
+    worker.apply_decision(pending, pred_row)
+
+async def _forecast_async(worker: DeviceWorker, state: dict, now: datetime, io, cpu, writer: AsyncWriter):
+    try:
+        # prepare_forecast ikut membaca /telemetry -> pool I/O
+        pending = await run_io(io, worker.prepare_forecast, state, now)
+        with metrics.timer("forecast_predict", worker.device_id):
+            m = pending["models"]
+            y = await run_io(cpu, forecast_cache.predict, m.forecast, pending["X"], m.forecast_version)
+        worker.apply_forecast(pending, y)
+        writer.flush(worker.device_id, worker.out)
+    except Exception as e:
+        # jangan retry tiap tick
+        worker.last_forecast_ts = int(clock())
+        print(f"SC error [{worker.device_id}] forecast:", repr(e))
 
-            ref_controls.update({
-                "forecast_text": forecast_text,
-                "forecast_next_min": next_min if next_min is not None else -1,
-                "forecast_soil_now": float(row["soil_percent"]),
-                "forecast_soil_min_horizon": float(min(soil_future)) if soil_future else float(row["soil_percent"]),
-            })
+async def _device_loop_async(worker: DeviceWorker, io, cpu, writer: AsyncWriter):
+    """
+    Per tick: /controls dan /state dibaca paralel, keputusan dihitung (predict
+    di pool CPU), lalu output dikirim tanpa menunggu. Forecast berjalan sebagai
+    task terpisah sehingga telemetry/predict forecast yang lambat tidak menunda
+    keputusan pompa di tick berikutnya.
+    """
+    forecast_task = None
+    backoff = loop_backoff()
+    while True:
+        tick_start = time.time()
+        try:
+            t0 = time.perf_counter()
+            with metrics.timer("read", worker.device_id):
+                try:
+                    controls, state = await asyncio.gather(
+                        run_io(io, worker.refs.controls.get),
+                        run_io(io, worker.refs.state.get),
+                    )
+                    controls, state = worker.remember_inputs(controls or {}, state or {})
+                except BackendUnavailable:
+                    controls, state = worker.last_known_inputs()
+            now = now_local()
+
+            await _decide_async(worker, controls, state, now, cpu)
+
+            if (forecast_task is None or forecast_task.done()) and worker.forecast_due(int(clock())):
+                forecast_task = asyncio.create_task(_forecast_async(worker, state, now, io, cpu, writer))
+
+            worker.stage_metrics()
+            writer.flush(worker.device_id, worker.out)
+            # window telemetry hanya di-snapshot saat task forecast (pool I/O) tidak sedang mengisinya
+            if forecast_task is None or forecast_task.done():
+                worker.maybe_checkpoint()
+            metrics.observe("tick", time.perf_counter() - t0, worker.device_id)
+            report_stats()
+            backoff.reset()
+
+            await asyncio.sleep(max(0.0, LOOP_SEC - (time.time() - tick_start)))
+
+        except Exception as e:
+            print(f"SC error [{worker.device_id}]:", repr(e))
+            metrics.inc("retries", kind="tick")
+            await asyncio.sleep(backoff.next_delay())
+
+async def _stats_loop_async(writer: AsyncWriter):
+    while True:
+        await asyncio.sleep(ASYNC_STATS_SEC)
+        print("ASYNC writes:", writer.summary())
+
+async def _main_async(workers: list):
+    io = ThreadPoolExecutor(max_workers=ASYNC_IO_THREADS, thread_name_prefix="sc-io")
+    cpu = ThreadPoolExecutor(max_workers=ASYNC_CPU_THREADS, thread_name_prefix="sc-cpu")
+    writer = AsyncWriter(io, max_in_flight=ASYNC_MAX_IN_FLIGHT_WRITES, metrics=metrics)
+    try:
+        await asyncio.gather(
+            _stats_loop_async(writer),
+            *(_device_loop_async(w, io, cpu, writer) for w in workers),
+        )
+    finally:
+        await writer.drain()
+        io.shutdown(wait=False)
+        cpu.shutdown(wait=False)
+
+def run_async(workers: list):
+    asyncio.run(_main_async(workers))
 
-            print("FORECAST ->", forecast_text, "| len =", len(soil_future))
-            last_forecast_ts = now_ts
+# =========================
+# FLEET
+# =========================
+def discover_device_ids() -> list:
+    """Daftar device: FLEET_DEVICE_IDS jika diisi, kalau tidak baca key /devices (shallow)."""
+    if FLEET_DEVICE_IDS:
+        return list(FLEET_DEVICE_IDS)
+    keys = ref_devices.get(shallow=True) or {}
+    return sorted(str(k) for k in keys)
+
+def _sync_fleet(workers: dict, device_ids: list):
+    now_ts = int(clock())
+    for device_id in list(workers):
+        if device_id not in device_ids:
+            print("FLEET - device", device_id)
+            del workers[device_id]
+            metrics.forget_device(device_id)
+            if state_store is not None:
+                state_store.delete(device_id)
+
+    new_ids = [d for d in device_ids if d not in workers]
+    for i, device_id in enumerate(new_ids):
+        w = DeviceWorker(device_id)
+        # sebar jadwal forecast agar tidak semua device jatuh di tick yang sama
+        # (device dari checkpoint sudah punya jadwalnya sendiri)
+        if not w.restored:
+            w.last_forecast_ts = now_ts - FORECAST_INTERVAL_SEC + (i * FORECAST_INTERVAL_SEC) // max(1, len(new_ids))
+        workers[device_id] = w
+        print("FLEET + device", device_id)
+
+def checkpoint_workers(workers, force: bool = False) -> int:
+    """Checkpoint worker yang jatuh tempo (semua jika force) dalam satu transaksi SQLite."""
+    if state_store is None:
+        return 0
+    due = [w for w in workers if force or w.checkpoint_due()]
+    if not due:
+        return 0
+    now = time.time()
+    try:
+        with metrics.timer("checkpoint"):
+            state_store.save_many([(w.device_id, *w.snapshot()) for w in due])
+    except Exception as e:
+        print("STATE error:", repr(e))
+    for w in due:
+        w.last_checkpoint = now
+    return len(due)
+
+def _group_by_models(pendings: list, indices) -> list:
+    """[(ModelSet, [index pending])]; normalnya satu grup, dua jika swap terjadi di tengah gather."""
+    groups = {}
+    for i in indices:
+        m = pendings[i]["models"]
+        groups.setdefault(id(m), (m, []))[1].append(i)
+    return list(groups.values())
+
+def _scatter(workers: list, pendings: list, preds: list, apply_name: str):
+    for w, pending, pred_row in zip(workers, pendings, preds):
+        try:
+            getattr(w, apply_name)(pending, pred_row)
+        except Exception as e:
+            print(f"SC error [{w.device_id}]:", repr(e))
 
-        time.sleep(LOOP_SEC)
+def _poll_fleet(io, order: list, deadline: float) -> tuple[list, int, int]:
+    """
+    Kirim read /controls + /state semua device sekaligus ke pool `io`, tunggu
+    sampai `deadline` (device pertama selalu ditunggu). Read yang belum mulai
+    dibatalkan. Return ([(worker, controls, state)], jumlah device di awal
+    `order` yang terbaca berurutan (untuk rotasi round-robin), jumlah device
+    tanpa backend maupun state lokal).
+    """
+    if not order:
+        return [], 0, 0
+    reads = [(w, io.submit(w.refs.controls.get), io.submit(w.refs.state.get)) for w in order]
+    futures_wait(reads[0][1:])
+    futures_wait([f for _, fc, fs in reads[1:] for f in (fc, fs)], timeout=max(0.0, deadline - time.time()))
+
+    out, unavailable, served = [], 0, None
+    for i, (w, fc, fs) in enumerate(reads):
+        if not (fc.done() and fs.done()):
+            fc.cancel()
+            fs.cancel()
+            if served is None:
+                served = i
+            continue
+        try:
+            try:
+                controls, state = w.remember_inputs(fc.result() or {}, fs.result() or {})
+            except BackendUnavailable:
+                controls, state = w.last_known_inputs()
+        except BackendUnavailable:
+            unavailable += 1
+            continue
+        except Exception as e:
+            print(f"SC error [{w.device_id}]:", repr(e))
+            continue
+        out.append((w, controls, state))
+    return out, len(reads) if served is None else served, unavailable
+
+def run_fleet():
+    """
+    Satu proses untuk banyak device. Per tick:
+      - gather: read /controls + /state semua device dikirim bersamaan ke pool I/O
+        (urutan dirotasi / round-robin), ditunggu sampai FLEET_BATCH_DEADLINE_SEC;
+        device yang belum terbaca dilayani duluan di tick berikutnya
+      - decision semua device yang terkumpul diprediksi dalam SATU predict()
+      - forecast maksimal FLEET_MAX_FORECASTS_PER_TICK (paling lama menunggu duluan),
+        juga dalam satu predict()
+    Error satu device tidak menghentikan device lain.
+    """
+    workers = {}
+    last_discovery = 0.0
+    last_stats = time.time()
+    rr = 0
+    dec_stats = BatchStats("decision")
+    for_stats = BatchStats("forecast")
+    backoff = loop_backoff()
+    io = ThreadPoolExecutor(max_workers=FLEET_IO_THREADS, thread_name_prefix="sc-fleet-io")
+    try:
+        while True:
+            try:
+                tick_start = time.time()
+                if tick_start - last_discovery >= FLEET_DISCOVERY_SEC:
+                    try:
+                        _sync_fleet(workers, discover_device_ids())
+                    except BackendUnavailable:
+                        # backend down: layani device yang sudah dikenal, discovery dicoba lagi nanti
+                        if not workers:
+                            raise
+                    last_discovery = tick_start
+
+                order = list(workers.values())
+                if order:
+                    rr %= len(order)
+                    order = order[rr:] + order[:rr]
+
+                # ---------- GATHER ----------
+                states = {}
+                dec_workers, dec_pending = [], []
+                with metrics.timer("read"):
+                    polled_inputs, polled, unavailable = _poll_fleet(io, order, tick_start + FLEET_BATCH_DEADLINE_SEC)
+                for w, controls, state in polled_inputs:
+                    try:
+                        states[w.device_id] = state
+                        pending = w.prepare_decision(controls, state, now_local())
+                        if pending is not None:
+                            dec_workers.append(w)
+                            dec_pending.append(pending)
+                    except Exception as e:
+                        print(f"SC error [{w.device_id}]:", repr(e))
+                rr += max(1, polled)
+                gather_sec = time.time() - tick_start
+
+                # ---------- DECISION (batch) ----------
+                need_model = [i for i, p in enumerate(dec_pending) if p["X"] is not None]
+                preds = [None] * len(dec_pending)
+                # hot-swap di tengah gather -> satu batch per model set
+                for m, idx in _group_by_models(dec_pending, need_model):
+                    with metrics.timer("decision_predict"):
+                        batch = predict_batch(m.decision, [dec_pending[i]["X"] for i in idx], dec_stats,
+                                              wait_sec=gather_sec)
+                    for i, pred_row in zip(idx, batch):
+                        preds[i] = pred_row
+                _scatter(dec_workers, dec_pending, preds, "apply_decision")
+
+                # ---------- FORECAST (batch) ----------
+                now_ts = int(clock())
+                due = [w for w in order if w.device_id in states and w.forecast_due(now_ts)]
+                due.sort(key=lambda w: w.last_forecast_ts)
+                for_workers, for_pending = [], []
+                for w in due[:FLEET_MAX_FORECASTS_PER_TICK]:
+                    try:
+                        for_pending.append(w.prepare_forecast(states[w.device_id], now_local()))
+                        for_workers.append(w)
+                    except Exception as e:
+                        print(f"SC error [{w.device_id}]:", repr(e))
+                if for_pending:
+                    preds = [None] * len(for_pending)
+                    for m, idx in _group_by_models(for_pending, range(len(for_pending))):
+                        with metrics.timer("forecast_predict"):
+                            batch = forecast_cache.predict_batch(m.forecast, [for_pending[i]["X"] for i in idx],
+                                                                 for_stats, version=m.forecast_version)
+                        for i, y in zip(idx, batch):
+                            preds[i] = y
+                    _scatter(for_workers, for_pending, preds, "apply_forecast")
+
+                # ---------- OUTPUT (satu update per device) ----------
+                for w in order:
+                    try:
+                        w.flush()
+                    except Exception as e:
+                        print(f"SC error [{w.device_id}]:", repr(e))
+                checkpoint_workers(order)
+
+                if time.time() - last_stats >= FLEET_STATS_SEC:
+                    dec_stats.report()
+                    for_stats.report()
+                    dec_stats.reset()
+                    for_stats.reset()
+                    last_stats = time.time()
+                metrics.observe("tick", time.time() - tick_start)
+                report_stats()
+
+                if unavailable and not states:
+                    # tidak ada device yang terlayani (backend down, state lokal kedaluwarsa)
+                    print(f"SC fleet: backend tidak tersedia untuk {unavailable} device")
+                    time.sleep(backoff.next_delay())
+                    continue
+                backoff.reset()
+                time.sleep(max(0.0, LOOP_SEC - (time.time() - tick_start)))
+
+            except Exception as e:
+                print("SC error:", repr(e))
+                metrics.inc("retries", kind="tick")
+                time.sleep(backoff.next_delay())
+    finally:
+        io.shutdown(wait=False, cancel_futures=True)
+
+def start_model_reloader() -> ModelReloader | None:
+    """Poll registry di thread daemon; versi baru di-load + divalidasi di sana lalu di-swap."""
+    if MODEL_RELOAD_POLL_SEC <= 0 or not MODEL_REGISTRY_DIR.is_dir():
+        return None
+    return ModelReloader(
+        MODEL_REGISTRY_DIR, models.version,
+        load_fn=load_model_set, validate_fn=validate_models, install_fn=install_models,
+        poll_sec=MODEL_RELOAD_POLL_SEC, pinned=MODEL_PINNED_VERSION,
+    ).start()
+
+def shutdown_checkpoint():
+    n = checkpoint_workers(list(_live_workers), force=True)
+    if n:
+        print(f"STATE checkpoint {n} device sebelum keluar")
+
+def main():
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT)
+    start_model_reloader()
+    if state_store is not None:
+        atexit.register(shutdown_checkpoint)
+        # SIGTERM (docker stop / systemd) -> SystemExit -> atexit tetap jalan
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    if FLEET_MODE:
+        run_fleet()
+    elif ASYNC_MODE:
+        run_async([DeviceWorker(DEVICE_ID)])
+    elif STREAM_MODE:
+        run_streaming(DeviceWorker(DEVICE_ID))
+    else:
+        run_polling(DeviceWorker(DEVICE_ID))
 
-    except Exception as e:
-        print("SC error:", repr(e))
-        time.sleep(3)
+if __name__ == "__main__":
+    main()
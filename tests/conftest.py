@@ -0,0 +1,53 @@
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+SENSOR_COLS = ["soil_moisture_pct", "air_temperature_c", "air_humidity_pct", "light_intensity_lux", "uv_index"]
+
+
+def publish_toy_models(registry_dir: Path, version: str = "test-0001") -> Path:
+    """Bundle decision + forecast kecil (5 fitur sensor) di registry, cukup untuk menjalankan sc_worker."""
+    import joblib
+    from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+
+    from iris_labels import label_arrays
+    from sc_registry import publish
+
+    rng = np.random.default_rng(0)
+    X = np.column_stack([
+        rng.uniform(10, 95, 400), rng.uniform(10, 36, 400), rng.uniform(30, 95, 400),
+        rng.uniform(0, 1200, 400), rng.uniform(0, 12, 400),
+    ])
+    labels = label_arrays(dict(zip(SENSOR_COLS, X.T)))
+    label_cols = list(labels)
+    y = np.column_stack([labels[c] for c in label_cols])
+    decision = RandomForestClassifier(n_estimators=3, max_depth=4, random_state=0).fit(X, y)
+    forecast = RandomForestRegressor(n_estimators=3, max_depth=4, random_state=0).fit(X, X[:, [0, 0, 0]])
+
+    work = registry_dir.parent / "bundles"
+    work.mkdir(parents=True, exist_ok=True)
+    dec_path = work / "2tomato_decision_multilabel_model.joblib"
+    for_path = work / "2tomato_forecast_model.joblib"
+    joblib.dump({"model": decision, "sensor_cols": SENSOR_COLS, "target_label_cols": label_cols}, dec_path)
+    joblib.dump({"model": forecast, "sensor_cols": SENSOR_COLS}, for_path)
+    return publish(registry_dir, version, [dec_path, for_path])
+
+
+@pytest.fixture(scope="session")
+def sc_worker(tmp_path_factory):
+    """sc_worker dengan backend memori, model mainan di registry sementara, tanpa checkpoint state."""
+    registry = tmp_path_factory.mktemp("sc") / "models"
+    publish_toy_models(registry)
+    os.environ["SC_STORAGE_BACKEND"] = "memory"
+    os.environ["SC_STATE_PATH"] = ""
+    os.environ["SC_MODEL_REGISTRY"] = str(registry)
+    os.environ.pop("SC_MODEL_VERSION", None)
+    os.environ.pop("SC_METRICS_PORT", None)
+    import sc_worker as sc
+    return sc
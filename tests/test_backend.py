@@ -0,0 +1,146 @@
+import http.client
+import importlib.util
+import json
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from conftest import ROOT, SENSOR_COLS
+
+_spec = importlib.util.spec_from_file_location("iris_backend_app", ROOT / "backend" / "app.py")
+app = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(app)
+
+
+def _batcher(predict_fn, **kw):
+    args = dict(max_batch=64, max_wait_ms=20.0, queue_size=16, workers=1)
+    args.update(kw)
+    return app.MicroBatcher("test", predict_fn, **args)
+
+
+def test_batch_results_are_split_per_request():
+    b = _batcher(lambda X: X[:, 0] * 2)
+    futs = [b.submit(np.full((n, 2), float(n))) for n in (1, 2, 3)]
+    assert [f.result(timeout=2).tolist() for f in futs] == [[2.0], [4.0] * 2, [6.0] * 3]
+
+
+def test_timed_out_request_is_cancelled_and_skipped():
+    gate = threading.Event()
+    seen = []
+
+    def predict(X):
+        seen.append(X[:, 0].tolist())
+        gate.wait(2)
+        return X[:, 0]
+
+    b = _batcher(predict, max_wait_ms=0.0)
+    first = b.submit(np.array([[1.0]]))
+    time.sleep(0.05)  # worker sedang memproses `first`
+    with pytest.raises(TimeoutError):
+        b.predict(np.array([[2.0]]), timeout=0.05)
+    gate.set()
+    assert first.result(timeout=2).tolist() == [1.0]
+    assert b.predict(np.array([[3.0]]), timeout=2).tolist() == [3.0]
+    assert seen == [[1.0], [3.0]]
+    assert b.stats.summary()["cancelled"] == 1
+
+
+def test_failed_batch_falls_back_to_per_request_predict():
+    # mensimulasikan error MODEL pada satu request (mis. bug / input yang lolos validasi),
+    # bukan input buruk: NaN/inf sudah ditolak _float sebelum masuk antrian
+    gate = threading.Event()
+    poison = -12345.0
+
+    def predict(X):
+        gate.wait(2)
+        if (X == poison).any():
+            raise RuntimeError("model error")
+        return X[:, 0]
+
+    b = _batcher(predict)
+    blocker = b.submit(np.array([[0.0]]))
+    time.sleep(0.05)
+    good, bad, good2 = (b.submit(np.array([[v]])) for v in (1.0, poison, 3.0))
+    gate.set()
+    blocker.result(timeout=2)
+    assert good.result(timeout=2).tolist() == [1.0]
+    assert good2.result(timeout=2).tolist() == [3.0]
+    with pytest.raises(RuntimeError):
+        bad.result(timeout=2)
+    assert b.stats.summary()["fallbacks"] == 1
+
+
+def test_full_queue_is_rejected_and_counted():
+    gate = threading.Event()
+    b = _batcher(lambda X: gate.wait(2) and X[:, 0], queue_size=1, max_batch=1)
+    b.submit(np.array([[0.0]]))
+    time.sleep(0.05)
+    b.submit(np.array([[1.0]]))
+    with pytest.raises(app.Overloaded):
+        b.submit(np.array([[2.0]]))
+    gate.set()
+    assert b.stats.summary()["rejected"] == 1
+
+
+class _FakeService:
+    sensor_cols = SENSOR_COLS
+
+    def labels(self, body):
+        return app.InferenceService._rows_matrix(self, [body["row"]]).tolist()
+
+    def _row_vector(self, row):
+        return app.InferenceService._row_vector(self, row)
+
+    def decision(self, body):
+        raise ValueError("model error")
+
+    next_irrigation = decision
+
+    def forecast(self, body):
+        return {"threshold": app._float(body.get("threshold", app.IRRIGATION_THRESHOLD), "threshold")}
+
+    def stats(self):
+        return {}
+
+
+@pytest.fixture
+def client():
+    server = app.Server(("127.0.0.1", 0), app.make_handler(_FakeService()))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def post(path, raw: bytes):
+        conn = http.client.HTTPConnection(*server.server_address[:2], timeout=5)
+        conn.request("POST", path, body=raw, headers={"Content-Type": "application/json"})
+        resp = conn.getresponse()
+        out = resp.status, json.loads(resp.read())
+        conn.close()
+        return out
+
+    yield post
+    server.shutdown()
+    server.server_close()
+
+
+def test_status_codes(client):
+    row = dict(zip(SENSOR_COLS, [50, 24, 65, 300, 1]))
+    assert client("/v1/labels", json.dumps({"row": row}).encode())[0] == 200
+    assert client("/v1/labels", b"{not json")[0] == 400
+    assert client("/v1/labels", b"[1, 2]")[0] == 400
+    assert client("/v1/labels", json.dumps({"row": dict(row, uv_index="x")}).encode())[0] == 400
+    assert client("/v1/labels", json.dumps({"row": dict(row, uv_index=None)}).encode())[0] == 400
+    # non-finite dan bool: model menerima NaN/inf tanpa error, jadi harus ditolak di sini
+    for bad in ("nan", "inf", "-Infinity", True):
+        assert client("/v1/labels", json.dumps({"row": dict(row, uv_index=bad)}).encode())[0] == 400, bad
+    assert client("/v1/labels", json.dumps({"row": dict(row, uv_index=float("nan"))}).encode())[0] == 400
+    # 1e400 adalah JSON valid yang menjadi inf saat di-parse
+    overflow = json.dumps({"row": dict(row, uv_index=12345)}).replace("12345", "1e400").encode()
+    assert client("/v1/labels", overflow)[0] == 400
+    assert client("/v1/labels", json.dumps({"row": list(row.values())[:-1] + [float("inf")]}).encode())[0] == 400
+    assert client("/v1/forecast", json.dumps({"threshold": 25}).encode())[0] == 200
+    for bad in (True, "nan", float("inf")):
+        assert client("/v1/forecast", json.dumps({"threshold": bad}).encode())[0] == 400, bad
+    # ValueError dari model bukan kesalahan client
+    status, payload = client("/v1/decision", json.dumps({"row": row}).encode())
+    assert status == 500 and "model error" in payload["error"]
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+
+from conftest import SENSOR_COLS
+from iris_backfill import BackfillScorer, batch_to_arrow
+from iris_labels import label_arrays
+
+WINDOW, HORIZON = 3, 4
+
+
+def _models():
+    rng = np.random.default_rng(0)
+    X = np.column_stack([
+        rng.uniform(10, 95, 200), rng.uniform(10, 36, 200), rng.uniform(30, 95, 200),
+        rng.uniform(0, 1200, 200), rng.uniform(0, 12, 200),
+    ])
+    labels = label_arrays(dict(zip(SENSOR_COLS, X.T)))
+    decision = RandomForestClassifier(n_estimators=2, max_depth=3, random_state=0).fit(
+        X, np.column_stack(list(labels.values())))
+    Xw = rng.uniform(0, 100, (200, WINDOW * len(SENSOR_COLS)))
+    forecast = RandomForestRegressor(n_estimators=2, max_depth=3, random_state=0).fit(Xw, Xw[:, :HORIZON])
+    dec_meta = {"sensor_cols": SENSOR_COLS, "target_label_cols": list(labels)}
+    return decision, dec_meta, forecast
+
+
+def _frame(devices: dict) -> pd.DataFrame:
+    rng = np.random.default_rng(1)
+    parts = []
+    for device, n in devices.items():
+        part = pd.DataFrame(rng.uniform(10, 90, (n, len(SENSOR_COLS))), columns=SENSOR_COLS)
+        part.insert(0, "timestamp", pd.date_range("2026-01-01", periods=n, freq="10min"))
+        part.insert(0, "device_id", device)
+        parts.append(part)
+    return pd.concat(parts, ignore_index=True)
+
+
+@pytest.mark.parametrize("meta_horizon", [True, False])
+def test_horizon_known_at_startup(meta_horizon):
+    decision, dec_meta, forecast = _models()
+    for_meta = {"window": WINDOW, **({"horizon": HORIZON} if meta_horizon else {})}
+    assert BackfillScorer(decision, dec_meta, forecast, for_meta).horizon == HORIZON
+
+
+def test_unknown_horizon_raises():
+    decision, dec_meta, _ = _models()
+    wrong = RandomForestRegressor(n_estimators=1).fit(np.zeros((4, 2)), np.zeros((4, 2)))
+    with pytest.raises(ValueError, match="Horizon"):
+        BackfillScorer(decision, dec_meta, wrong, {"window": WINDOW})
+
+
+def test_parquet_schema_when_first_batch_has_no_forecast(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    decision, dec_meta, forecast = _models()
+    scorer = BackfillScorer(decision, dec_meta, forecast, {"window": WINDOW}, batch_rows=8)
+    # device "a" lebih pendek dari window -> batch pertama tanpa forecast sama sekali
+    df = _frame({"a": WINDOW - 1, "b": 20})
+    path = str(tmp_path / "scores.parquet")
+    assert scorer.write_parquet(df, path, group_col="device_id") == len(df)
+
+    table = pq.read_table(path)
+    assert table.schema.field("soil_future").type.list_size == HORIZON
+    assert table.schema.field("timeline").type.list_size == HORIZON
+    soil = table.column("soil_future").to_pylist()
+    assert soil[:WINDOW - 1] == [None] * (WINDOW - 1)
+    assert all(len(r) == HORIZON for r in soil[WINDOW - 1 + WINDOW - 1:])
+
+
+def test_parquet_soil_future_matches_score_frame_exactly(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    decision, dec_meta, forecast = _models()
+    scorer = BackfillScorer(decision, dec_meta, forecast, {"window": WINDOW, "horizon": HORIZON}, batch_rows=8)
+    df = _frame({"b": 20})
+    path = str(tmp_path / "scores.parquet")
+    scorer.write_parquet(df, path, group_col="device_id")
+
+    table = pq.read_table(path)
+    assert table.schema.field("soil_future").type.value_type == pa.float64()
+    expected = scorer.score_frame(df, group_col="device_id")
+    assert table.column("soil_future").to_pylist() == expected["soil_future"].tolist()
+    assert table.column("timeline").to_pylist() == expected["timeline"].tolist()
+
+
+def test_batch_to_arrow_rejects_mismatched_horizon():
+    pytest.importorskip("pyarrow")
+    batch = {"has_forecast": np.array([True]), "soil_future": np.zeros((1, HORIZON)),
+             "timeline": np.full((1, HORIZON), "Aman", dtype=object), "next_irrig_hours": np.array([np.nan])}
+    with pytest.raises(ValueError):
+        batch_to_arrow(batch, HORIZON + 1)
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from iris_data import DataCache, LABEL_SENSOR_COLS, compact_frame
+from iris_labels import LABEL_RULES, TARGET_LABEL_COLS, label_frame
+
+
+def _edge_csv(path):
+    """Nilai sensor tepat di, dan 1e-6-an di sekitar, tiap batas label (float32 membulatkan ke batas)."""
+    cols = {}
+    for sensor_col, rule in LABEL_RULES.values():
+        vals = []
+        for e, _ in rule.edges:
+            vals += [e, e - 9e-7 * max(1.0, e / 27), e + 9e-7 * max(1.0, e / 27)]
+        cols[sensor_col] = vals
+    n = max(len(v) for v in cols.values())
+    df = pd.DataFrame({c: (v * n)[:n] for c, v in cols.items()})
+    df.insert(0, "timestamp", pd.date_range("2026-01-01", periods=n, freq="10min").astype(str))
+    df["extra"] = np.linspace(0.0, 1.0, n)
+    df.to_csv(path, index=False, float_format="%.10f")
+    return path
+
+
+@pytest.mark.parametrize("fmt", ["npy", "arrow"])
+def test_cached_frame_keeps_labels(tmp_path, fmt):
+    if fmt == "arrow":
+        pytest.importorskip("pyarrow")
+    csv = _edge_csv(tmp_path / "edges.csv")
+    expected = label_frame(pd.read_csv(csv))[TARGET_LABEL_COLS]
+
+    cache = DataCache(str(tmp_path / "cache"), [str(tmp_path)], fmt=fmt)
+    df = cache.load(str(csv))
+    pd.testing.assert_frame_equal(label_frame(df)[TARGET_LABEL_COLS], expected)
+    assert all(df[c].dtype == np.float64 for c in LABEL_SENSOR_COLS)
+    assert df["extra"].dtype == np.float32
+
+
+def test_downcasting_sensor_columns_would_change_labels(tmp_path):
+    # sanity check: data uji memang mengenai batas yang bergeser di float32
+    csv = _edge_csv(tmp_path / "edges.csv")
+    expected = label_frame(pd.read_csv(csv))[TARGET_LABEL_COLS]
+    lossy = label_frame(compact_frame(pd.read_csv(csv), keep_cols=()))[TARGET_LABEL_COLS]
+    assert not lossy.equals(expected)
@@ -0,0 +1,111 @@
+import threading
+import time
+
+import pytest
+
+from sc_feed import FakeChangeFeed
+
+
+def _state(soil: float, ts: int) -> dict:
+    return {
+        "soil": {"percent": soil},
+        "env": {"tempC": 24.0, "humRH": 65.0},
+        "light": {"percent": 40},
+        "uv": {"uvi": 1.0},
+        "ts": ts,
+    }
+
+
+def test_burst_is_coalesced_into_one_wakeup():
+    feed = FakeChangeFeed(["state", "controls"])
+    feed.start()
+
+    def burst():
+        for i in range(5):
+            feed.put("state", _state(50.0 + i, i))
+            time.sleep(0.005)
+        feed.patch("controls", {"mode": "auto"})
+
+    t = threading.Thread(target=burst)
+    t.start()
+    changed = feed.wait(timeout=2.0, coalesce_sec=0.2)
+    t.join()
+
+    assert changed == {"state", "controls"}
+    assert feed.events == 6
+    # snapshot = nilai terakhir burst
+    assert feed.snapshot("state")["soil"]["percent"] == 54.0
+    assert feed.snapshot("controls") == {"mode": "auto"}
+    # semua event sudah terkonsumsi oleh satu wait
+    assert feed.wait(timeout=0.0) == set()
+
+
+def test_patch_and_delete_update_snapshot():
+    feed = FakeChangeFeed(["state"])
+    feed.put("state", _state(50.0, 1))
+    feed.patch("state", {"soil/percent": 42.0, "uv": None})
+    snap = feed.snapshot("state")
+    assert snap["soil"]["percent"] == 42.0
+    assert "uv" not in snap
+    assert feed.wait(timeout=0.0) == {"state"}
+
+
+class _Done(BaseException):
+    """Menghentikan loop run_streaming (lolos dari `except Exception`)."""
+
+
+class ScriptedFeed(FakeChangeFeed):
+    """Tiap wait() menerapkan satu burst event dari skrip; skrip habis -> _Done."""
+
+    def __init__(self, bursts):
+        super().__init__(["state", "controls"])
+        self.bursts = list(bursts)
+
+    def wait(self, timeout, coalesce_sec: float = 0.0) -> set:
+        if not self.bursts:
+            raise _Done
+        for name, event_type, data in self.bursts.pop(0):
+            if event_type == "put":
+                self.put(name, data)
+            else:
+                self.patch(name, data)
+        return super().wait(0.0, coalesce_sec=0.0)
+
+
+def test_streaming_runs_decision_once_per_changed_input(sc_worker, monkeypatch):
+    sc = sc_worker
+    monkeypatch.setattr(sc, "STREAM_COALESCE_SEC", 0.0)
+    worker = sc.DeviceWorker("feed-test")
+    # forecast tidak jatuh tempo selama test
+    worker.last_forecast_ts = 10 ** 12
+
+    calls = []
+    run_decision = worker.run_decision
+
+    def counting(controls, state, now):
+        calls.append(state["soil"]["percent"])
+        run_decision(controls, state, now)
+
+    worker.run_decision = counting
+
+    controls = {"mode": "auto", "power": True}
+    feed = ScriptedFeed([
+        # burst pertama: beberapa tulisan state -> satu keputusan dengan nilai terakhir
+        [("controls", "put", controls), ("state", "put", _state(50.0, 1)), ("state", "put", _state(51.0, 2))],
+        # tulisan worker sendiri ke /controls: input keputusan tidak berubah
+        [("controls", "patch", {"pump_auto": False, "forecast_text": "x"})],
+        # state identik ditulis ulang
+        [("state", "put", _state(51.0, 2))],
+        # tick tanpa event
+        [],
+        # state berubah -> keputusan baru
+        [("state", "put", _state(30.0, 3))],
+        # mode manual -> input berubah, keputusan dijalankan (prepare_decision mengembalikan None)
+        [("controls", "patch", {"mode": "manual"})],
+        [("controls", "patch", {"forecast_next_min": 10})],
+    ])
+
+    with pytest.raises(_Done):
+        sc.run_streaming(worker, feed=feed)
+
+    assert calls == [51.0, 30.0, 30.0]
@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesClassifier, ExtraTreesRegressor, RandomForestClassifier, RandomForestRegressor
+from sklearn.multioutput import MultiOutputClassifier, MultiOutputRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from iris_forest import CompiledForest, compile_model, export_compiled, load_compiled
+
+RNG = np.random.default_rng(0)
+X_TRAIN = np.column_stack([
+    RNG.uniform(10, 95, 300), RNG.uniform(10, 36, 300), RNG.uniform(30, 95, 300),
+    RNG.uniform(0, 1200, 300), RNG.uniform(0, 12, 300),
+])
+Y_CLASS = np.column_stack([
+    np.digitize(X_TRAIN[:, 0], [30, 40, 70]),
+    np.where(X_TRAIN[:, 1] > 27, "panas", "normal"),
+])
+Y_REG = np.column_stack([X_TRAIN[:, 0] * 0.9 + X_TRAIN[:, 4], X_TRAIN[:, 1] - X_TRAIN[:, 2] / 10.0])
+
+
+def _scaled(est):
+    return Pipeline([("scaler", StandardScaler()), ("model", est)])
+
+
+def _forests(model):
+    est = model.steps[-1][1] if hasattr(model, "steps") else model
+    return est.estimators_ if type(est).__name__.startswith("MultiOutput") else [est]
+
+
+def _edge_rows(model) -> np.ndarray:
+    """Baris dengan satu fitur tepat di threshold split (skala input asli) dan tepat di sebelahnya (float32)."""
+    scaler = model.steps[0][1] if hasattr(model, "steps") else None
+    rows = []
+    for forest in _forests(model):
+        for tree in forest.estimators_:
+            t = tree.tree_
+            for f, thr in zip(t.feature, t.threshold):
+                if f < 0:
+                    continue
+                for v in (thr, np.nextafter(np.float32(thr), np.float32(-np.inf)),
+                          np.nextafter(np.float32(thr), np.float32(np.inf))):
+                    x = X_TRAIN[RNG.integers(len(X_TRAIN))].copy()
+                    x[f] = float(v) * scaler.scale_[f] + scaler.mean_[f] if scaler is not None else float(v)
+                    rows.append(x)
+    return np.asarray(rows)
+
+
+CLASSIFIERS = {
+    "rf_single": lambda: RandomForestClassifier(n_estimators=8, random_state=0),
+    "et_single": lambda: ExtraTreesClassifier(n_estimators=8, random_state=0),
+    "rf_multioutput": lambda: MultiOutputClassifier(RandomForestClassifier(n_estimators=6, random_state=0)),
+    "et_multioutput": lambda: MultiOutputClassifier(ExtraTreesClassifier(n_estimators=6, random_state=0)),
+    "rf_multioutput_scaled": lambda: _scaled(MultiOutputClassifier(RandomForestClassifier(n_estimators=6, random_state=0))),
+}
+
+REGRESSORS = {
+    "rf_native": lambda: RandomForestRegressor(n_estimators=8, random_state=0),
+    "et_native": lambda: ExtraTreesRegressor(n_estimators=8, random_state=0),
+    "et_native_scaled": lambda: _scaled(ExtraTreesRegressor(n_estimators=8, random_state=0)),
+    "rf_multioutput": lambda: MultiOutputRegressor(RandomForestRegressor(n_estimators=6, random_state=0)),
+    "et_multioutput_scaled": lambda: _scaled(MultiOutputRegressor(ExtraTreesRegressor(n_estimators=6, random_state=0))),
+}
+
+
+@pytest.mark.parametrize("name", sorted(CLASSIFIERS))
+def test_classifier_matches_sklearn_exactly(name):
+    single = name.endswith("single")
+    model = CLASSIFIERS[name]().fit(X_TRAIN, Y_CLASS[:, 0] if single else Y_CLASS)
+    compiled = CompiledForest(compile_model(model))
+    for X in (X_TRAIN, _edge_rows(model)):
+        expected = model.predict(X)
+        got = compiled.predict(X)
+        assert got.shape == expected.shape
+        np.testing.assert_array_equal(got, expected)
+
+
+@pytest.mark.parametrize("name", sorted(REGRESSORS))
+def test_regressor_matches_sklearn(name):
+    model = REGRESSORS[name]().fit(X_TRAIN, Y_REG)
+    compiled = CompiledForest(compile_model(model))
+    for X in (X_TRAIN, _edge_rows(model)):
+        expected = model.predict(X)
+        got = compiled.predict(X)
+        assert got.shape == expected.shape
+        np.testing.assert_allclose(got, expected, rtol=1e-9, atol=1e-9)
+
+
+def test_single_output_regressor_shape():
+    model = RandomForestRegressor(n_estimators=4, random_state=0).fit(X_TRAIN, Y_REG[:, 0])
+    compiled = CompiledForest(compile_model(model))
+    assert compiled.predict(X_TRAIN[:5]).shape == (5,)
+
+
+def test_native_multioutput_classifier_rejected():
+    model = RandomForestClassifier(n_estimators=2, random_state=0).fit(X_TRAIN, Y_CLASS)
+    with pytest.raises(TypeError):
+        compile_model(model)
+
+
+def test_export_load_roundtrip_mmap(tmp_path):
+    model = _scaled(MultiOutputRegressor(ExtraTreesRegressor(n_estimators=4, random_state=0))).fit(X_TRAIN, Y_REG)
+    path = tmp_path / "fc.compiled.joblib"
+    export_compiled(model, str(path), {"window": 1})
+    compiled, meta = load_compiled(str(path), mmap=True)
+    assert meta["window"] == 1
+    np.testing.assert_allclose(compiled.predict(X_TRAIN), model.predict(X_TRAIN), rtol=1e-9, atol=1e-9)
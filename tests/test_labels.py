@@ -0,0 +1,132 @@
+import math
+
+import numpy as np
+import pytest
+
+from iris_labels import LABEL_RULES, label_arrays, label_frame, rule_labels
+
+
+# ---- if-chain lama (sebelum tabel LabelRule), disalin apa adanya sebagai acuan ----
+def _old_suhu(t):
+    if t != t:
+        return "-"
+    if t < 13:
+        return "Dingin"
+    if t < 18:
+        return "Sejuk"
+    if t <= 27:
+        return "Optimal"
+    if t <= 30:
+        return "Hangat"
+    if t <= 33:
+        return "Panas"
+    return "Bahaya panas"
+
+
+def _old_rh(rh):
+    if rh != rh:
+        return "-"
+    if rh < 40:
+        return "Terlalu kering"
+    if rh < 55:
+        return "Agak kering"
+    if rh <= 75:
+        return "Optimal"
+    if rh <= 85:
+        return "Terlalu lembap"
+    return "Sangat lembap (risiko jamur)"
+
+
+def _old_soil(sm):
+    if sm != sm:
+        return "-"
+    if sm < 30:
+        return "Kering (butuh air)"
+    if sm < 40:
+        return "Agak kering"
+    if sm <= 70:
+        return "Optimal"
+    if sm <= 85:
+        return "Basah (kurangi air)"
+    return "Terlalu basah (risiko busuk akar)"
+
+
+def _old_lux(lux):
+    if lux != lux:
+        return "-"
+    if lux < 200:
+        return "Rendah"
+    if lux < 600:
+        return "Sedang"
+    if lux < 900:
+        return "Tinggi"
+    return "Sangat tinggi"
+
+
+def _old_uv(uv):
+    if uv != uv:
+        return "-"
+    if uv <= 2:
+        return "Rendah"
+    if uv <= 5:
+        return "Sedang"
+    if uv <= 7:
+        return "Tinggi"
+    if uv <= 10:
+        return "Sangat tinggi"
+    return "Ekstrem"
+
+
+OLD = {
+    "label_suhu": _old_suhu,
+    "label_rh": _old_rh,
+    "label_soil": _old_soil,
+    "label_lux": _old_lux,
+    "label_uv": _old_uv,
+}
+
+
+def _edge_values(rule) -> np.ndarray:
+    """Tiap batas, tepat di sebelahnya (float64 dan float32), serta nilai jauh di luar rentang."""
+    vals = [-1e9, 1e9, math.nan]
+    for e, _ in rule.edges:
+        vals += [e, np.nextafter(e, -np.inf), np.nextafter(e, np.inf),
+                 float(np.nextafter(np.float32(e), np.float32(-np.inf))),
+                 float(np.nextafter(np.float32(e), np.float32(np.inf))),
+                 e - 0.5, e + 0.5]
+    return np.asarray(vals, dtype=np.float64)
+
+
+@pytest.mark.parametrize("label_col", sorted(LABEL_RULES))
+def test_table_matches_old_if_chain_at_edges(label_col):
+    sensor_col, rule = LABEL_RULES[label_col]
+    values = _edge_values(rule)
+    expected = [OLD[label_col](float(v)) for v in values]
+
+    assert [rule_labels({sensor_col: float(v)})[label_col] for v in values] == expected
+    assert label_arrays({sensor_col: values})[label_col].tolist() == expected
+    # input float32 (kolom cache) dilabeli sama dengan nilai float64-nya
+    v32 = values.astype(np.float32)
+    assert label_arrays({sensor_col: v32})[label_col].tolist() == [OLD[label_col](float(v)) for v in v32]
+
+
+def test_random_values_match_old_if_chain():
+    rng = np.random.default_rng(0)
+    cols = {sensor_col: rng.uniform(-10, 1500, 20_000) for sensor_col, _ in LABEL_RULES.values()}
+    got = label_arrays(cols)
+    for label_col, (sensor_col, _) in LABEL_RULES.items():
+        assert got[label_col].tolist() == [OLD[label_col](float(v)) for v in cols[sensor_col]]
+
+
+def test_label_frame_matches_label_arrays():
+    pd = pytest.importorskip("pandas")
+    sensor_cols = [c for c, _ in LABEL_RULES.values()]
+    df = pd.DataFrame({c: [27.0, 27.000000000000004, math.nan] for c in sensor_cols})
+    out = label_frame(df)
+    expected = label_arrays({c: df[c].to_numpy() for c in sensor_cols})
+    for label_col in LABEL_RULES:
+        assert out[label_col].tolist() == expected[label_col].tolist()
+
+
+def test_missing_sensor_is_dash():
+    assert set(rule_labels({}).values()) == {"-"}
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sc_resample import StepResampler
+
+STEP_SEC = 600.0
+T0 = 1_760_000_400.0  # kelipatan STEP_SEC
+
+
+def _telemetry(seed: int = 0):
+    """Titik ~5 detik dengan jitter, dua gap (bin kosong), urutan teracak di dalam tiap bin."""
+    rng = np.random.default_rng(seed)
+    ts = T0 + np.cumsum(rng.uniform(2.0, 8.0, 3000))
+    gaps = ((ts > T0 + 3000) & (ts < T0 + 4900)) | ((ts > T0 + 9000) & (ts < T0 + 9700))
+    ts = ts[~gaps]
+    values = np.column_stack([rng.uniform(20, 80, len(ts)), rng.normal(25, 3, len(ts))])
+    bins = np.floor(ts / STEP_SEC)
+    order = np.lexsort((rng.random(len(ts)), bins))  # urut per bin, acak di dalam bin
+    return ts[order], values[order]
+
+
+def _pandas_mean(ts, values) -> pd.DataFrame:
+    df = pd.DataFrame(values, index=pd.to_datetime(ts, unit="s"))
+    return df.resample(f"{int(STEP_SEC)}s", origin="epoch").mean()
+
+
+def _window(r: StepResampler, ts) -> tuple:
+    now = (np.floor(ts.max() / STEP_SEC) + 1) * STEP_SEC  # semua bin sudah lengkap
+    return r.window(10_000, now)
+
+
+@pytest.mark.parametrize("fill", ["none", "ffill", "linear"])
+def test_mean_matches_pandas_resample(fill):
+    ts, values = _telemetry()
+    r = StepResampler(STEP_SEC, steps=1000, n_values=2, agg="mean", fill=fill)
+    assert all(r.add(t, v) for t, v in zip(ts, values))
+
+    expected = _pandas_mean(ts, values)
+    assert expected.isna().any().any()  # data memang punya gap
+    if fill == "none":
+        expected = expected.dropna()
+    elif fill == "ffill":
+        expected = expected.ffill()
+    else:
+        expected = expected.interpolate(method="linear")
+
+    got, end_id = _window(r, ts)
+    assert end_id == int(expected.index[-1].timestamp() // STEP_SEC)
+    np.testing.assert_allclose(got, expected.to_numpy(), rtol=1e-12, atol=1e-9)
+
+
+def test_late_points_are_dropped_not_mixed_into_closed_bins():
+    ts, values = _telemetry(seed=1)
+    # tukar beberapa titik lintas batas bin: titik dari bin lama datang setelah bin berikutnya dibuka
+    late_idx = [i for i in range(1, len(ts)) if np.floor(ts[i] / STEP_SEC) != np.floor(ts[i - 1] / STEP_SEC)][:5]
+    order = np.arange(len(ts))
+    for i in late_idx:
+        order[i - 1], order[i] = order[i], order[i - 1]
+    ts, values = ts[order], values[order]
+
+    r = StepResampler(STEP_SEC, steps=1000, n_values=2, agg="mean", fill="none")
+    accepted = np.array([r.add(t, v) for t, v in zip(ts, values)])
+    assert r.late == (~accepted).sum() == len(late_idx)
+
+    # hasil = pandas atas titik yang diterima
+    expected = _pandas_mean(ts[accepted], values[accepted]).dropna()
+    got, _ = _window(r, ts)
+    np.testing.assert_allclose(got, expected.to_numpy(), rtol=1e-12, atol=1e-9)
@@ -0,0 +1,165 @@
+import random
+
+import pytest
+
+from sc_fakedb import FakeRTDBServer
+from sc_transport import Backoff, BackendUnavailable, CircuitBreaker, ResilientBackend, RestBackend
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+        self.slept = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, sec: float):
+        self.slept.append(sec)
+        self.now += sec
+
+
+@pytest.fixture
+def server():
+    srv = FakeRTDBServer(seed=0).start()
+    yield srv
+    srv.stop()
+
+
+def _resilient(server, clock, breaker=None, retries=2, backoff=None, call_budget_sec=10.0):
+    rest = RestBackend(server.url, pool_size=4, read_timeout=2.0, write_timeout=2.0)
+    return ResilientBackend(rest, breaker=breaker or CircuitBreaker(clock=clock), retries=retries,
+                            backoff=backoff or Backoff(0.2, 2.0, rng=random.Random(0)),
+                            call_budget_sec=call_budget_sec, clock=clock, sleep=clock.sleep)
+
+
+def test_breaker_state_machine():
+    clock = FakeClock()
+    changes = []
+    br = CircuitBreaker(failure_threshold=3, reset_sec=5.0, max_reset_sec=15.0,
+                        on_change=lambda old, new: changes.append(new), clock=clock)
+
+    for _ in range(2):
+        assert br.allow()
+        br.record_failure()
+    assert br.state == br.CLOSED
+    br.record_failure()
+    assert br.state == br.OPEN and br.degraded
+
+    clock.now += 4.9
+    assert not br.allow()
+    clock.now += 0.1
+    assert br.allow() and br.state == br.HALF_OPEN
+    assert not br.allow()  # hanya satu probe
+
+    # probe gagal -> open lagi, reset_sec berlipat (dibatasi max_reset_sec)
+    br.record_failure()
+    assert br.state == br.OPEN and br.reset_sec == 10.0
+    clock.now += 9.9
+    assert not br.allow()
+    clock.now += 0.1
+    assert br.allow()
+    br.record_failure()
+    assert br.reset_sec == 15.0
+
+    clock.now += 15.0
+    assert br.allow()
+    br.record_success()
+    assert br.state == br.CLOSED and br.reset_sec == 5.0 and br.failures == 0
+    assert changes == ["open", "half_open", "open", "half_open", "open", "half_open", "closed"]
+    assert br.summary()["opens"] == 3 and br.rejected == 3
+
+
+def test_breaker_opens_and_recovers_over_rest(server):
+    clock = FakeClock()
+    db = _resilient(server, clock, breaker=CircuitBreaker(failure_threshold=2, reset_sec=5.0, clock=clock))
+    ref = db.reference("/devices/a/state")
+    ref.set({"soil": 50})
+
+    server.error_rate = 1.0
+    for _ in range(2):
+        before = server.requests
+        with pytest.raises(BackendUnavailable):
+            ref.get()
+        assert server.requests - before == 3  # 1 + retries
+    assert db.breaker.state == CircuitBreaker.OPEN
+
+    # breaker open: gagal cepat tanpa menyentuh server
+    before = server.requests
+    with pytest.raises(BackendUnavailable):
+        ref.get()
+    assert server.requests == before
+
+    server.error_rate = 0.0
+    clock.now += 5.0
+    assert ref.get() == {"soil": 50}
+    assert db.breaker.state == CircuitBreaker.CLOSED
+    assert db.summary()["pool"]["reuse_rate"] > 0.5
+
+
+def test_failed_probe_doubles_reset(server):
+    clock = FakeClock()
+    db = _resilient(server, clock, breaker=CircuitBreaker(failure_threshold=1, reset_sec=2.0, clock=clock))
+    ref = db.reference("/x")
+    server.error_rate = 1.0
+    with pytest.raises(BackendUnavailable):
+        ref.get()
+    clock.now += 2.0
+    before = server.requests
+    with pytest.raises(BackendUnavailable):
+        ref.get()
+    # probe half-open tidak di-retry
+    assert server.requests - before == 1
+    assert db.breaker.state == CircuitBreaker.OPEN and db.breaker.reset_sec == 4.0
+
+
+def test_retries_stay_within_call_budget(server):
+    clock = FakeClock()
+    db = _resilient(server, clock, retries=50, backoff=Backoff(1.0, 8.0, rng=random.Random(0)),
+                    call_budget_sec=10.0)
+    server.error_rate = 1.0
+    start = clock.now
+    before = server.requests
+    with pytest.raises(BackendUnavailable):
+        db.reference("/x").get()
+    assert clock.now - start <= 10.0
+    assert server.requests - before == len(clock.slept) + 1 < 51
+    assert db.retried == len(clock.slept)
+
+
+def test_push_is_not_retried(server):
+    clock = FakeClock()
+    db = _resilient(server, clock, retries=3)
+    server.error_rate = 1.0
+    before = server.requests
+    with pytest.raises(BackendUnavailable):
+        db.reference("/telemetry").push({"soil": 1})
+    assert server.requests - before == 1 and clock.slept == []
+
+    before = server.requests
+    with pytest.raises(BackendUnavailable):
+        db.reference("/telemetry/k").set({"soil": 1})
+    assert server.requests - before == 4
+
+
+def test_stale_keepalive_connection_is_retried_once(server):
+    rest = RestBackend(server.url, pool_size=2)
+    ref = rest.reference("/devices/a")
+    ref.set({"soil": 1})
+    assert ref.get() == {"soil": 1}
+    assert rest.pool_stats()["created"] == 1
+
+    assert server.drop_connections() == 1
+    assert ref.get() == {"soil": 1}
+    stats = rest.pool_stats()
+    assert stats["stale_retries"] == 1 and stats["created"] == 2
+
+    # POST di koneksi basi tidak dikirim ulang (bisa membuat dua child)
+    server.drop_connections()
+    keys_before = set(rest.reference("/devices").get(shallow=True) or {})
+    server.drop_connections()
+    with pytest.raises(ConnectionError):
+        rest.reference("/devices").push({"soil": 2})
+    assert rest.pool_stats()["stale_retries"] == 2
+    assert set(rest.reference("/devices").get(shallow=True) or {}) == keys_before
+    rest.close()